@@ -0,0 +1,16 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from apiapp.infrastructure import lease
+from apiapp.modules.sensors.model import ROLLUP_MODELS, SENSOR_MODELS
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """MongoDB ในหน่วยความจำ (mongomock) แทน collection ของ sensor / rollup / lease"""
+    database = AsyncMongoMockClient()["aquasense_test"]
+    for model in [*SENSOR_MODELS.values(), *ROLLUP_MODELS.values()]:
+        collection = database[model.Settings.name]
+        monkeypatch.setattr(model, "get_motor_collection", classmethod(lambda cls, c=collection: c))
+    monkeypatch.setattr(lease, "get_database", lambda: database)
+    return database
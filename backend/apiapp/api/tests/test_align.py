@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from apiapp.modules.sensors import align
+from apiapp.modules.sensors.repository import SensorRepository
+from apiapp.modules.sensors.use_case import SensorUseCase
+
+START = datetime(2026, 1, 1)
+
+
+def rows(field, points):
+    return [{"timestamp": START + timedelta(seconds=t), field: value} for t, value in points]
+
+
+def brute_asof(points, t, max_age=None):
+    known = [(pt, value) for pt, value in points if pt <= t]
+    if not known or (max_age is not None and t - known[-1][0] > max_age):
+        return None
+    return known[-1][1]
+
+
+def test_asof_matches_last_known_value():
+    rng = np.random.default_rng(5)
+    times = np.sort(rng.choice(1000, 80, replace=False))
+    points = [(int(t), float(v)) for t, v in zip(times, rng.normal(size=80))]
+    series = align.to_series(rows("ph", points), "ph")
+    grid_seconds = np.arange(-5, 1010, 7)
+    grid = series[0][0] - points[0][0] * 1000 + grid_seconds * 1000.0
+
+    for max_age in (None, 20):
+        result = align.asof(series, grid, max_age * 1000.0 if max_age else None)
+        expected = [brute_asof(points, t, max_age) for t in grid_seconds]
+        assert align.to_json_column(result) == expected
+
+
+def test_build_frame_on_change_points():
+    series = {
+        "ph": align.to_series(rows("ph", [(0, 7.0), (30, 7.4)]), "ph"),
+        "temperature": align.to_series(rows("temperature", [(10, 25.0), (30, 26.0), (50, 27.0)]), "temperature"),
+    }
+    frame = align.build_frame(series, START, START + timedelta(seconds=40))
+    assert frame["timestamps"] == [START + timedelta(seconds=s) for s in (0, 10, 30)]
+    assert frame["columns"] == {"ph": [7.0, 7.0, 7.4], "temperature": [None, 25.0, 26.0]}
+    assert frame["summary"]["trend"]["ph"]["count"] == 3
+
+
+def test_build_frame_fixed_step_and_max_age():
+    series = {"ph": align.to_series(rows("ph", [(0, 7.0), (100, 8.0)]), "ph")}
+    frame = align.build_frame(series, START, START + timedelta(seconds=120), step_seconds=30,
+                              max_age_seconds=45, summary=False)
+    assert len(frame["timestamps"]) == 5
+    assert frame["columns"]["ph"] == [7.0, 7.0, None, None, 8.0]
+    assert "summary" not in frame
+
+
+def test_build_frame_rejects_too_many_rows():
+    with pytest.raises(ValueError):
+        align.build_frame({}, START, START + timedelta(hours=1), step_seconds=1, max_rows=100)
+
+
+def test_correlation_uses_rows_where_both_present():
+    x = np.array([1.0, 2.0, 3.0, np.nan, 5.0])
+    y = np.array([2.0, 4.0, 6.0, 1.0, np.nan])
+    result = align.correlation({"a": x, "b": y, "c": np.full(5, np.nan)})
+    assert result["a"]["b"] == pytest.approx(1.0)
+    assert result["a"]["c"] is None
+
+
+@pytest.mark.asyncio
+async def test_truncated_series_is_not_filled_from_before_start(mock_db):
+    repo = SensorRepository()
+    await repo.add_many("ph", [repo.build_record("ph", "pond1", 7.0 + i / 10, START + timedelta(seconds=10 * i))
+                               for i in range(-1, 8)])
+    use_case = SensorUseCase(repo, None, None, None, None, None, None, history_scan_limit=20)
+    frame = await use_case.get_aligned("pond1", START, START + timedelta(seconds=75), step=15,
+                                       sensors=["ph"], summary=False)
+    assert frame["truncated"] is False
+    assert frame["columns"]["ph"][0] == pytest.approx(7.0)
+
+    # อ่านได้แค่ 4 ตัวล่าสุด: ต้นช่วงไม่รู้ค่า (ไม่ใช่ค่าก่อน start ที่ค้างมา)
+    use_case.history_scan_limit = 4
+    frame = await use_case.get_aligned("pond1", START, START + timedelta(seconds=75), step=15,
+                                       sensors=["ph"], summary=False)
+    assert frame["truncated"] is True
+    assert frame["columns"]["ph"][:3] == [None, None, None]
+    assert frame["columns"]["ph"][-1] == pytest.approx(7.7)
@@ -0,0 +1,71 @@
+import random
+
+from apiapp.modules.sensors.anomaly import AnomalyState, build_detector
+
+
+def make_detector(flatline_seconds=600, cooldown=900):
+    return build_detector(
+        alpha=0.05, z_threshold=4.0, warmup=20, flatline_seconds=flatline_seconds,
+        min_stds={"ph": 0.02, "temperature": 0.1}, max_rates={"temperature": 1.0}, alert_cooldown=cooldown,
+    )
+
+
+def feed(detector, state, sensor_type, samples):
+    return [detector.check(state, sensor_type, t, value) for t, value in samples]
+
+
+def noisy(start, count, mean, spread, seed, step=10):
+    # noise แบบมีขอบเขต (uniform) ไม่มีหางยาวแบบ gauss ที่ทำให้ z เกินได้จริงเป็นครั้งคราว
+    rng = random.Random(seed)
+    return [(start + i * step, mean + rng.uniform(-spread, spread)) for i in range(count)]
+
+
+def test_noise_is_not_flagged():
+    detector = make_detector()
+    for seed in range(5):
+        flags = feed(detector, AnomalyState(), "ph", noisy(0, 2000, 7.2, 0.05, seed))
+        assert not any(flags)
+
+
+def test_spike_flagged_after_warmup_only():
+    detector = make_detector()
+    state = AnomalyState()
+    # ก่อนครบ warmup ไม่ตรวจ spike
+    assert "spike" not in detector.check(state, "ph", 0, 7.0)
+    assert "spike" not in detector.check(state, "ph", 10, 9.0)
+
+    state = AnomalyState()
+    feed(detector, state, "ph", noisy(0, 100, 7.2, 0.05, 1))
+    assert "spike" in detector.check(state, "ph", 1010, 5.0)
+
+
+def test_rate_uses_configured_limit_per_minute():
+    detector = make_detector()
+    state = AnomalyState()
+    feed(detector, state, "temperature", [(0, 25.0), (60, 25.5)])
+    # 1 องศาต่อนาที: 3 องศาใน 60 วินาทีเร็วเกินไป
+    assert "rate" in detector.check(state, "temperature", 120, 28.5)
+    # ช้ากว่าขีดจำกัด ไม่ถือว่าผิดปกติ
+    state = AnomalyState()
+    feed(detector, state, "temperature", [(0, 25.0)])
+    assert "rate" not in detector.check(state, "temperature", 600, 29.0)
+
+
+def test_flatline_reported_once_per_stuck_period():
+    detector = make_detector(flatline_seconds=600)
+    state = AnomalyState()
+    flags = feed(detector, state, "ph", [(t, 7.0) for t in range(0, 1500, 60)])
+    flagged = [i for i, f in enumerate(flags) if "flatline" in f]
+    assert flagged == [10]
+    # ค่าขยับแล้วค้างใหม่: แจ้งได้อีกครั้ง
+    flags = feed(detector, state, "ph", [(t, 7.1) for t in range(1500, 2200, 60)])
+    assert sum("flatline" in f for f in flags) == 1
+
+
+def test_unknown_sensor_and_alert_cooldown():
+    detector = make_detector(cooldown=900)
+    state = AnomalyState()
+    assert detector.check(state, "tds", 0, 1e9) == []
+    assert detector.should_alert(state, 1000) is True
+    assert detector.should_alert(state, 1500) is False
+    assert detector.should_alert(state, 1900) is True
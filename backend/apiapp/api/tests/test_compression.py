@@ -0,0 +1,68 @@
+import random
+from datetime import datetime, timedelta
+
+from apiapp.modules.sensors.compression import DeadbandPolicy, SwingingDoorPolicy
+from apiapp.modules.sensors.deadband import DeadbandState
+
+START = datetime(2026, 1, 1)
+
+
+def run_policy(policy, samples):
+    """ป้อน (t, value) ทีละตัว คืนจุดที่บันทึกทั้งหมด (รวมจุดที่ถือไว้ตอนจบ) เป็น (t, value)"""
+    state = DeadbandState()
+    saved = []
+    for t, value in samples:
+        decision = policy.offer(state, START + timedelta(seconds=t), t, value)
+        saved.extend(decision.points)
+    saved.extend(policy.flush(state))
+    return [((ts - START).total_seconds(), value) for ts, value in saved]
+
+
+def interpolate(points, t):
+    for (t0, v0), (t1, v1) in zip(points, points[1:]):
+        if t0 <= t <= t1:
+            return v0 if t1 == t0 else v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+    raise AssertionError(f"{t} outside archived range")
+
+
+def random_walk(count, seed):
+    rng = random.Random(seed)
+    value, t, samples = 7.0, 0.0, []
+    for _ in range(count):
+        t += rng.choice([1, 1, 2, 5])
+        value += rng.gauss(0, 0.05)
+        samples.append((t, value))
+    return samples
+
+
+def test_sdt_keeps_every_reading_within_error_bound():
+    bound = 0.1
+    for seed in range(20):
+        samples = random_walk(500, seed)
+        saved = run_policy(SwingingDoorPolicy(bound, heartbeat_seconds=3600), samples)
+
+        assert saved[0] == samples[0] and saved[-1] == samples[-1]
+        assert len(saved) < len(samples)
+        for t, value in samples:
+            assert abs(interpolate(saved, t) - value) <= bound + 1e-9
+
+
+def test_sdt_straight_line_keeps_only_endpoints():
+    samples = [(t, 1.0 + 0.01 * t) for t in range(100)]
+    saved = run_policy(SwingingDoorPolicy(0.05, heartbeat_seconds=3600), samples)
+    assert saved == [samples[0], samples[-1]]
+
+
+def test_sdt_heartbeat_records_after_gap():
+    policy = SwingingDoorPolicy(1.0, heartbeat_seconds=60)
+    state = DeadbandState()
+    assert policy.offer(state, START, 0, 5.0).reason == "first"
+    assert policy.offer(state, START + timedelta(seconds=10), 10, 5.0).reason == "suppressed"
+    decision = policy.offer(state, START + timedelta(seconds=100), 100, 5.0)
+    assert decision.reason == "heartbeat"
+    assert [value for _, value in decision.points] == [5.0, 5.0]
+
+
+def test_deadband_suppresses_small_changes():
+    saved = run_policy(DeadbandPolicy(0.5, heartbeat_seconds=3600), [(0, 7.0), (1, 7.2), (2, 7.6), (3, 7.5)])
+    assert saved == [(0, 7.0), (2, 7.6)]
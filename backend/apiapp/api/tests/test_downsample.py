@@ -0,0 +1,57 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from apiapp.modules.sensors.downsample import downsample, lttb_indices
+
+
+def reference_lttb(x, y, n):
+    """LTTB ตามต้นฉบับ (Steinarsson 2013) แบบ loop ธรรมดา ใช้เทียบกับเวอร์ชัน numpy"""
+    length = len(x)
+    if n >= length or length <= 2:
+        return list(range(length))
+    every = (length - 2) / (n - 2)
+    selected = [0]
+    a = 0
+    for i in range(n - 2):
+        avg_start = int(math.floor((i + 1) * every)) + 1
+        avg_end = min(int(math.floor((i + 2) * every)) + 1, length)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        start = int(math.floor(i * every)) + 1
+        stop = int(math.floor((i + 1) * every)) + 1
+        best, best_area = start, -1.0
+        for j in range(start, stop):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(length - 1)
+    return selected
+
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(7)
+    for length, n in [(10, 3), (100, 10), (1000, 37), (5000, 500), (257, 256)]:
+        x = np.cumsum(rng.integers(1, 5, length)).astype(np.float64)
+        y = np.cumsum(rng.normal(size=length))
+        assert lttb_indices(x, y, n).tolist() == reference_lttb(x.tolist(), y.tolist(), n)
+
+
+def test_lttb_small_inputs():
+    x = np.arange(5, dtype=np.float64)
+    assert lttb_indices(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(x, x, 2).tolist() == [0, 4]
+
+
+def test_downsample_keeps_spike():
+    start = datetime(2026, 1, 1)
+    docs = [{"timestamp": start + timedelta(seconds=i), "ph": 7.0} for i in range(1000)]
+    docs[613]["ph"] = 12.0
+    result = downsample(docs, "ph", 50)
+    assert len(result) == 50
+    assert result[0] is docs[0] and result[-1] is docs[-1]
+    assert docs[613] in result
+    assert [doc["timestamp"] for doc in result] == sorted(doc["timestamp"] for doc in result)
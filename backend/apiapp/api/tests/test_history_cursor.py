@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from apiapp.modules.sensors.hot_window import HotWindow
+from apiapp.modules.sensors.repository import SensorRepository, decode_cursor, encode_cursor
+
+START = datetime(2026, 1, 1)
+
+
+def test_cursor_round_trip():
+    object_id = ObjectId()
+    timestamp = START + timedelta(microseconds=123)
+    assert decode_cursor(encode_cursor(timestamp, object_id)) == (timestamp, object_id)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+async def read_all(repo, limit, **kwargs):
+    pages, cursor = [], None
+    while True:
+        items, next_cursor = await repo.get_history("ph", limit, cursor=decode_cursor(cursor) if cursor else None,
+                                                    **kwargs)
+        pages.append(items)
+        if next_cursor is None:
+            return pages
+        cursor = next_cursor
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_series_without_gaps_or_duplicates(mock_db):
+    repo = SensorRepository()
+    # หลาย reading เวลาเดียวกัน: keyset ต้องใช้ _id ตัดสินลำดับ
+    records = [
+        repo.build_record("ph", "pond1" if i % 3 else "pond2", 7.0, START + timedelta(seconds=i // 4))
+        for i in range(25)
+    ]
+    await repo.add_many("ph", records)
+    expected = sorted(records, key=lambda r: (r["timestamp"], r["_id"]), reverse=True)
+
+    pages = await read_all(repo, 7)
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert [item["id"] for page in pages for item in page] == [str(r["_id"]) for r in expected]
+
+    pages = await read_all(repo, 5, device_id="pond1", start=START + timedelta(seconds=1),
+                           end=START + timedelta(seconds=4))
+    items = [item for page in pages for item in page]
+    assert [item["id"] for item in items] == [
+        str(r["_id"]) for r in expected
+        if r["device_id"] == "pond1" and START + timedelta(seconds=1) <= r["timestamp"] <= START + timedelta(seconds=4)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_exact_multiple_of_limit_ends_with_empty_page(mock_db):
+    repo = SensorRepository()
+    await repo.add_many("ph", [repo.build_record("ph", "pond1", 7.0, START + timedelta(seconds=i)) for i in range(6)])
+    pages = await read_all(repo, 3, fields=["ph"])
+    assert [len(page) for page in pages] == [3, 3, 0]
+    assert set(pages[0][0]) == {"id", "ph", "timestamp"}
+
+
+@pytest.mark.asyncio
+async def test_hot_window_first_page_continues_into_db(mock_db):
+    repo = SensorRepository()
+    window = HotWindow(size=10, max_series=10)
+    records = []
+    for i in range(30):
+        device_id = "pond1" if i % 2 else "pond2"
+        timestamp = START + timedelta(seconds=i // 2)
+        window.add(device_id, "ph", 7.0 + i, timestamp)
+        # compression ตัดทิ้งทุกตัวที่ 3: อยู่ใน latest แต่ไม่อยู่ใน DB / history
+        if i % 3:
+            record = repo.build_record("ph", device_id, 7.0 + i, timestamp)
+            window.add_saved(device_id, "ph", record["_id"], 7.0 + i, timestamp)
+            records.append(record)
+    await repo.add_many("ph", records)
+
+    assert window.latest("ph")[2] == 7.0 + 29
+    first = window.history("ph", 6)
+    items, next_cursor = await repo.get_history("ph", 6)
+    assert [str(record_id) for _, _, record_id, _ in first] == [item["id"] for item in items]
+
+    _, last_ts, last_id, _ = first[-1]
+    from_window, _ = await repo.get_history("ph", 6, cursor=(last_ts, last_id))
+    from_db, _ = await repo.get_history("ph", 6, cursor=decode_cursor(next_cursor))
+    assert from_window == from_db
+
+    # ขอมากกว่าที่ window มี (series เต็มแล้วทิ้งของเก่า): ให้ไปอ่านจาก DB
+    assert window.history("ph", 6, device_id="pond1") is not None
+    assert window.history("ph", 11) is None
@@ -0,0 +1,8 @@
+from apiapp.modules.sensors.metrics import OTHER_DEVICE, DeviceLabels
+
+
+def test_device_labels_are_bounded():
+    labels = DeviceLabels(max_devices=2)
+    assert [labels(device) for device in ("pond1", "pond2", "pond3", "pond1", "pond4")] == [
+        "pond1", "pond2", OTHER_DEVICE, "pond1", OTHER_DEVICE,
+    ]
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from apiapp.modules.sensors.planner import Segment, TierPlanner
+
+DAY = 86400
+NOW = datetime(2026, 10, 18, 12, 34, 56)
+
+
+def make_planner():
+    return TierPlanner(10, {"raw": 7 * DAY, "minute": 90 * DAY, "hour": 730 * DAY})
+
+
+def test_choose_by_points():
+    planner = make_planner()
+    assert planner.choose(NOW - timedelta(hours=2), NOW, points=500) == "raw"
+    assert planner.choose(NOW - timedelta(days=3), NOW, points=1500) == "minute"
+    assert planner.choose(NOW - timedelta(days=30), NOW, points=500) == "hour"
+    assert planner.choose(NOW - timedelta(days=3000), NOW, points=10) == "hour"
+
+
+def test_choose_by_resolution():
+    planner = make_planner()
+    assert planner.choose(NOW - timedelta(days=1), NOW, resolution=5) == "raw"
+    assert planner.choose(NOW - timedelta(days=1), NOW, resolution=60) == "minute"
+    assert planner.choose(NOW - timedelta(days=1), NOW, resolution=600) == "minute"
+    assert planner.choose(NOW - timedelta(days=1), NOW, resolution=7200) == "hour"
+
+
+def test_plan_within_retention_is_single_segment():
+    start = NOW - timedelta(days=2, seconds=17)
+    assert make_planner().plan(start, NOW, NOW, "raw") == [Segment("raw", start, NOW)]
+    # tier rollup เริ่มที่ต้น bucket
+    assert make_planner().plan(start, NOW, NOW, "minute") == [
+        Segment("minute", start.replace(second=0, microsecond=0), NOW)
+    ]
+
+
+def test_plan_falls_back_to_coarser_tiers_without_overlap():
+    start = NOW - timedelta(days=400)
+    segments = make_planner().plan(start, NOW, NOW, "raw")
+    assert [segment.tier for segment in segments] == ["hour", "minute", "raw"]
+    assert segments[0].start == start.replace(minute=0, second=0, microsecond=0)
+    assert segments[-1].end == NOW
+
+    hour, minute, raw = segments
+    # ต่อกันพอดี (ห่างกัน 1 µs) ที่ขอบ bucket ของ tier ที่หยาบกว่า bucket จึงไม่ทับกัน
+    assert minute.start - hour.end == raw.start - minute.end == timedelta(microseconds=1)
+    assert minute.start == minute.start.replace(minute=0, second=0, microsecond=0)
+    assert raw.start == raw.start.replace(second=0, microsecond=0)
+    # ขอบอยู่หลังจุดหมดอายุของ tier ที่ละเอียดกว่า ไม่เกิน 1 bucket
+    assert NOW - timedelta(days=7) <= raw.start < NOW - timedelta(days=7, minutes=-1)
+    assert NOW - timedelta(days=90) <= minute.start < NOW - timedelta(days=90, hours=-1)
+
+
+def test_plan_range_entirely_older_than_raw_retention():
+    start, end = NOW - timedelta(days=20), NOW - timedelta(days=10)
+    segments = make_planner().plan(start, end, NOW, "raw")
+    assert segments == [Segment("minute", start.replace(second=0, microsecond=0), end)]
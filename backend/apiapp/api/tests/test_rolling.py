@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from apiapp.modules.sensors.rolling import RollingStats, RollingWindow
+
+
+def brute_force(samples):
+    values = [value for _, value in samples]
+    n = len(values)
+    mean = sum(values) / n
+    variance = sum((value - mean) ** 2 for value in values) / n
+    slope = None
+    if n >= 2:
+        mean_t = sum(t for t, _ in samples) / n
+        denominator = sum((t - mean_t) ** 2 for t, _ in samples)
+        if denominator > 0:
+            slope = sum((t - mean_t) * (value - mean) for t, value in samples) / denominator * 3600
+    return {"count": n, "mean": mean, "variance": variance, "min": min(values), "max": max(values),
+            "slope_per_hour": slope}
+
+
+def test_rolling_window_matches_brute_force():
+    rng = random.Random(3)
+    for _ in range(100):
+        span, cap = rng.choice([5, 30, 300]), rng.randint(1, 40)
+        window = RollingWindow(span, cap)
+        t, kept = 1_780_000_000.0, []
+        for _ in range(300):
+            t += rng.choice([0, 0, 1, 2, 7])
+            value = rng.randint(0, 9) + rng.random()
+            window.add(t, value)
+            kept = [sample for sample in (kept + [(t, value)])[-cap:] if sample[0] >= t - span]
+
+            stats, expected = window.stats(), brute_force(kept)
+            assert stats["count"] == expected["count"]
+            assert stats["min"] == expected["min"] and stats["max"] == expected["max"]
+            assert stats["mean"] == pytest.approx(expected["mean"])
+            assert stats["variance"] == pytest.approx(expected["variance"], abs=1e-6)
+            if expected["slope_per_hour"] is None:
+                assert stats["slope_per_hour"] is None
+            else:
+                assert stats["slope_per_hour"] == pytest.approx(expected["slope_per_hour"], rel=1e-6, abs=1e-6)
+
+
+def test_cap_eviction_with_equal_timestamps():
+    window = RollingWindow(300, 2)
+    for t, value in [(100, 5), (101, 2), (101, 1), (102, 3)]:
+        window.add(t, value)
+    stats = window.stats()
+    assert (stats["count"], stats["min"], stats["max"]) == (2, 1, 3)
+
+
+def test_expire_and_out_of_order():
+    stats = RollingStats({"5m": 300, "1h": 3600}, max_samples=100)
+    stats.add("pond1", "ph", 1000, 7.0)
+    stats.add("pond1", "ph", 1200, 8.0)
+    stats.add("pond1", "ph", 1100, 1.0)  # มาช้ากว่าตัวล่าสุด: ข้ามทุก window
+    assert stats.dropped == 1
+
+    snapshot = stats.snapshot("ph", now=1400)["pond1"]
+    assert snapshot["5m"]["count"] == 1 and snapshot["5m"]["min"] == 8.0
+    assert snapshot["1h"]["count"] == 2 and snapshot["1h"]["mean"] == pytest.approx(7.5)
+    assert stats.snapshot("ph", now=5000)["pond1"]["1h"]["count"] == 0
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from apiapp.modules.rules.engine import DEFAULT_RULES, CompiledRules, RuleEngine
+from apiapp.modules.rules.use_case import RuleUseCase
+
+SENSORS = ("ph", "temperature", "turbidity", "tds")
+
+
+def rules_with_hysteresis():
+    rules = [dict(rule) for rule in DEFAULT_RULES]
+    for rule in rules:
+        rule["hysteresis"] = {"ph": 0.3, "temperature": 1.0, "turbidity": 0.5, "tds": 0.0}[rule["sensor_type"]]
+    rules.append({"name": "ph_low", "sensor_type": "ph", "operator": "lt", "threshold": 7.0,
+                  "severity": "warning", "message": "pH ต่ำ ({value:.1f})", "device_id": "pond1"})
+    rules.append({"name": "tds_high", "sensor_type": "tds", "operator": "gt", "threshold": 400,
+                  "message": "TDS", "device_id": "pond1", "enabled": False})
+    return rules
+
+
+def random_columns(rng, length):
+    columns = {
+        "ph": rng.normal(7.5, 1.0, length),
+        "temperature": rng.normal(25, 6, length),
+        "turbidity": rng.normal(5, 1, length),
+        "tds": rng.normal(400, 30, length),
+    }
+    for values in columns.values():
+        values[rng.random(length) < 0.15] = np.nan
+    return columns
+
+
+def evaluate_sequential(compiled, columns, device_id, active):
+    levels, issues = [], []
+    length = len(next(iter(columns.values())))
+    for i in range(length):
+        values = {sensor: None if np.isnan(columns[sensor][i]) else float(columns[sensor][i]) for sensor in SENSORS}
+        status, _, _, row_issues = compiled.evaluate(values, device_id, active, update=True)
+        levels.append({"Good": 0, "Warning": 1, "Critical": 2}[status])
+        issues.append(row_issues)
+    return levels, issues
+
+
+def test_evaluate_batch_matches_sequential_evaluate():
+    compiled = CompiledRules(rules_with_hysteresis())
+    rng = np.random.default_rng(11)
+    for device_id in (None, "pond1"):
+        sequential_active, batch_active = set(), set()
+        # หลาย batch ต่อกัน: สถานะ hysteresis ต้องต่อเนื่องข้าม batch เหมือนประเมินทีละแถว
+        for length in (1, 50, 0, 200, 3):
+            columns = random_columns(rng, length)
+            levels, issues = evaluate_sequential(compiled, columns, device_id, sequential_active)
+            result = compiled.evaluate_batch(columns, device_id, batch_active, issues=True)
+            assert result["level"].tolist() == levels
+            assert result["issues"] == issues
+            assert batch_active == sequential_active
+
+
+def test_evaluate_is_read_only_unless_update():
+    compiled = CompiledRules(rules_with_hysteresis())
+    active = set()
+    compiled.evaluate({"turbidity": 6.0}, active=active)
+    assert active == set()
+    compiled.evaluate({"turbidity": 6.0}, active=active, update=True)
+    assert active == {"turbidity_high"}
+    # ยังอยู่ในช่วง hysteresis: ยังเตือน แต่ไม่แก้สถานะ
+    assert compiled.evaluate({"turbidity": 4.7}, active=active)[0] == "Warning"
+    assert compiled.evaluate({"turbidity": 4.7})[0] == "Good"
+    assert active == {"turbidity_high"}
+
+
+def test_rule_engine_advance_and_device_overrides():
+    engine = RuleEngine(rules_with_hysteresis())
+    assert engine.advance({"turbidity": 6.0}, "pond1")[0] == "Warning"
+    assert engine.evaluate({"turbidity": 4.7}, "pond1")[0] == "Warning"
+    # สถานะแยกต่อบ่อ
+    assert engine.evaluate({"turbidity": 4.7}, "pond2")[0] == "Good"
+    assert engine.advance({"turbidity": 4.4}, "pond1")[0] == "Good"
+    assert engine.evaluate({"turbidity": 4.7}, "pond1")[0] == "Good"
+
+    # override ของ pond1: ph ต่ำกว่า 7 เป็น warning และปิดกฎ tds
+    assert engine.evaluate({"ph": 6.8, "tds": 500}, "pond1")[0] == "Warning"
+    assert engine.evaluate({"ph": 6.8, "tds": 500})[0] == "Critical"
+
+
+class FakeReports:
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = []
+
+    async def iter_logs(self, start, end, batch_size):
+        for i in range(0, len(self.rows), batch_size):
+            yield self.rows[i:i + batch_size]
+
+    async def update_classifications(self, updates):
+        self.updates.extend(updates)
+        return len(updates)
+
+
+@pytest.mark.asyncio
+async def test_reclassify_uses_device_overrides():
+    start = datetime(2026, 10, 1)
+    rows = [
+        {"_id": i, "timestamp": start + timedelta(hours=i), "device_id": device_id, "ph": 6.8,
+         "status": "Good", "issues": []}
+        for i, device_id in enumerate(["pond1", "pond2", None, "pond1"])
+    ]
+    reports = FakeReports(rows)
+    use_case = RuleUseCase(None, RuleEngine(rules_with_hysteresis()), None, reports, 60, reclassify_batch_size=3)
+
+    result = await use_case.reclassify(start, start + timedelta(days=1))
+    # pond1 มี override (pH ต่ำกว่า 7 เป็น warning) ที่เหลือใช้กฎกลาง (6.8 ยังปกติ)
+    assert [(_id, status) for _id, status, _ in reports.updates] == [(0, "Warning"), (3, "Warning")]
+    assert result["scanned"] == 4 and result["updated"] == 2
+    assert result["statuses"]["Good"] == 2
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from apiapp.infrastructure.lease import MongoLease
+from apiapp.modules.sensors import snapshot
+from apiapp.modules.sensors.snapshot import HourlySnapshotScheduler
+
+pytestmark = pytest.mark.asyncio
+
+SLOT = datetime(2026, 10, 18, 9)
+HOUR = timedelta(hours=1)
+
+
+class FakeUseCase:
+    def __init__(self, failures: int = 0):
+        self.calls = []
+        self.failures = failures
+
+    async def run_hourly_snapshot(self, at, catch_up):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo down")
+        self.calls.append((at, catch_up))
+
+
+def set_now(monkeypatch, now):
+    monkeypatch.setattr(snapshot, "now_thai", lambda: now)
+
+
+async def test_lease_is_exclusive_and_slot_runs_once(mock_db):
+    first = MongoLease("hourly_snapshot", 300, owner="a")
+    second = MongoLease("hourly_snapshot", 300, owner="b")
+
+    assert await first.acquire(SLOT) is True
+    assert await second.acquire(SLOT) is False  # ยังถืออยู่และยังไม่หมดอายุ
+    await first.complete(SLOT)
+    assert await second.last_slot() == SLOT
+    # slot เดิมเสร็จแล้ว: ไม่มีใครทำซ้ำ แต่ slot ถัดไปได้
+    assert await second.acquire(SLOT) is False
+    assert await second.acquire(SLOT + HOUR) is True
+
+
+async def test_expired_or_released_lease_can_be_taken_over(mock_db):
+    dead = MongoLease("hourly_snapshot", 0, owner="dead")
+    other = MongoLease("hourly_snapshot", 300, owner="other")
+    assert await dead.acquire(SLOT) is True
+    # ttl 0: process ที่ตายระหว่างทำ lock หมดอายุทันที
+    assert await other.acquire(SLOT) is True
+    await other.release()
+    assert await other.last_slot() is None
+    assert await dead.acquire(SLOT) is True
+
+
+async def test_tick_catches_up_missing_hours(mock_db, monkeypatch):
+    use_case = FakeUseCase()
+    scheduler = HourlySnapshotScheduler(use_case, MongoLease("hourly_snapshot", 300, owner="a"), catchup_hours=3)
+
+    set_now(monkeypatch, SLOT + timedelta(minutes=5))
+    assert await scheduler.tick() == 1
+    assert await scheduler.tick() == 0  # ชั่วโมงเดิมไม่บันทึกซ้ำ
+
+    # หยุดไป 10 ชั่วโมง: ย้อนทำไม่เกิน catchup_hours ก่อนชั่วโมงปัจจุบัน
+    set_now(monkeypatch, SLOT + 10 * HOUR + timedelta(minutes=1))
+    assert await scheduler.tick() == 4
+    assert use_case.calls == [
+        (SLOT, False),
+        (SLOT + 7 * HOUR, True),
+        (SLOT + 8 * HOUR, True),
+        (SLOT + 9 * HOUR, True),
+        (SLOT + 10 * HOUR, False),
+    ]
+
+
+async def test_failed_slot_is_released_and_retried(mock_db, monkeypatch):
+    use_case = FakeUseCase(failures=1)
+    scheduler = HourlySnapshotScheduler(use_case, MongoLease("hourly_snapshot", 300, owner="a"), catchup_hours=3)
+    other = HourlySnapshotScheduler(use_case, MongoLease("hourly_snapshot", 300, owner="b"), catchup_hours=3)
+    set_now(monkeypatch, SLOT)
+
+    with pytest.raises(ConnectionError):
+        await scheduler.tick()
+    # ปล่อย lock แล้ว: worker อื่นทำ slot นั้นต่อได้ทันที
+    assert await other.tick() == 1
+    assert await scheduler.tick() == 0
+    assert use_case.calls == [(SLOT, False)]
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from apiapp.modules.sensors.stream import SensorStreamBroker
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_broker(server=None):
+    redis = FakeAsyncRedis(server=server) if server else None
+    return SensorStreamBroker(queue_size=10, max_subscribers=5, heartbeat_seconds=15, max_seconds=60, redis=redis)
+
+
+def parse(message):
+    event, data = message.strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+async def wait_for_subscribers(broker, count=1):
+    for _ in range(100):
+        numsub = dict(await broker.redis.pubsub_numsub(broker.channel))
+        if numsub.get(broker.channel.encode(), 0) >= count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("subscription not ready")
+
+
+async def test_local_only_broker_skips_work_without_clients():
+    broker = make_broker()
+    assert broker.active is False
+    broker.publish("reading", {"value": 1})
+    assert broker.published == 0
+
+    queue = broker.subscribe()
+    assert broker.active is True
+    broker.publish("reading", {"value": 2})
+    assert parse(queue.get_nowait()) == ("reading", {"value": 2})
+
+
+async def test_events_reach_clients_of_other_processes():
+    server = FakeServer()
+    api, ingest = make_broker(server), make_broker(server)
+    await api.start()
+    await ingest.start()
+    try:
+        await wait_for_subscribers(api, 2)
+        client = api.subscribe()
+        # ingest ไม่มี client ของตัวเองแต่ยังต้องสร้าง event ให้ process อื่น
+        assert ingest.active is True
+        ingest.publish("reading", {"device_id": "pond1", "readings": [{"type": "ph", "value": 7.1}]})
+        message = await asyncio.wait_for(client.get(), timeout=2)
+        assert parse(message)[1]["device_id"] == "pond1"
+        assert api.relayed == 1
+
+        # event ของตัวเองที่วนกลับมาจาก Redis ไม่ส่งซ้ำ
+        api.publish("analysis", {"status": "Good"})
+        assert parse(client.get_nowait()) == ("analysis", {"status": "Good"})
+        await asyncio.sleep(0.1)
+        assert client.empty()
+    finally:
+        await api.stop()
+        await ingest.stop()
@@ -0,0 +1,118 @@
+from datetime import datetime
+
+import arq.worker
+import pytest
+from arq import Retry
+from arq.connections import ArqRedis
+from arq.worker import Worker, func
+from fakeredis import FakeAsyncRedis
+from loguru import logger
+
+from apiapp.core.container import Container
+from apiapp.infrastructure.jobs import JobQueue
+from apiapp.modules.notification.service import LineBotService
+from apiapp.modules.sensors.snapshot import HourlySnapshotScheduler
+from apiapp.modules.sensors.use_case import SensorUseCase
+from apiapp.worker import tasks
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeScheduler:
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    async def tick(self) -> int:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo down")
+        return 1
+
+
+class FakeLineService:
+    def __init__(self):
+        self.sent = []
+
+    async def send_alert(self, message: str):
+        self.sent.append(message)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    # fakeredis ไม่มีคำสั่ง INFO ที่ worker ใช้ log ตอนเริ่ม
+    async def skip_info(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(arq.worker, "log_redis_info", skip_info)
+    return ArqRedis(connection_pool=FakeAsyncRedis().connection_pool)
+
+
+@pytest.fixture
+def queue(redis):
+    queue = JobQueue("redis://localhost:6379/0")
+    queue._pool = redis
+    return queue
+
+
+def make_container(**instances) -> Container:
+    container = Container()
+    for key, instance in instances.items():
+        container.register_instance({"scheduler": HourlySnapshotScheduler, "line": LineBotService}[key], instance)
+    return container
+
+
+async def test_hourly_snapshot_retries_with_backoff():
+    ctx = {"container": make_container(scheduler=FakeScheduler(failures=1)), "job_try": 2}
+    with pytest.raises(Retry) as error:
+        await tasks.hourly_snapshot(ctx)
+    assert error.value.defer_score == 120_000
+
+    ctx["job_try"] = 3
+    assert await tasks.hourly_snapshot(ctx) == {"snapshots": 1}
+
+
+async def test_critical_alert_sent_once_per_hour(redis, queue):
+    line = FakeLineService()
+    job_id = SensorUseCase._critical_alert_id(datetime(2026, 10, 18, 9, 0, 5))
+    assert job_id == SensorUseCase._critical_alert_id(datetime(2026, 10, 18, 9, 59, 59))
+
+    # API หลาย process ส่งแจ้งเตือนวิกฤตชั่วโมงเดียวกัน: รับเข้าคิวครั้งเดียว
+    assert await queue.enqueue("send_line_alert", "🚨 pH", job_id=job_id) is True
+    assert await queue.enqueue("send_line_alert", "🚨 pH", job_id=job_id) is False
+
+    worker = Worker(
+        functions=[func(tasks.send_line_alert, name="send_line_alert")],
+        redis_pool=redis,
+        burst=True,
+        poll_delay=0,
+        handle_signals=False,
+        ctx={"container": make_container(line=line)},
+    )
+    try:
+        await worker.main()
+    finally:
+        await worker.close()
+    assert line.sent == ["🚨 pH"]
+
+    # ทำเสร็จแล้วแต่ยังเก็บผลไว้: ชั่วโมงเดิมยังไม่ส่งซ้ำ ชั่วโมงถัดไปส่งได้
+    assert await queue.enqueue("send_line_alert", "🚨 pH", job_id=job_id) is False
+    next_hour = SensorUseCase._critical_alert_id(datetime(2026, 10, 18, 10, 0))
+    assert await queue.enqueue("send_line_alert", "🚨 pH", job_id=next_hour) is True
+
+
+async def test_enqueue_warns_without_worker_heartbeat(redis, queue):
+    warnings = []
+    handler = logger.add(warnings.append, level="WARNING", format="{message}")
+    try:
+        assert await queue.enqueue("send_line_alert", "a") is True
+        assert await queue.enqueue("send_line_alert", "b") is True
+        assert len(warnings) == 1  # เตือนไม่เกิน 1 ครั้งต่อ warn_interval
+        assert await queue.worker_alive() is False
+
+        await redis.set(queue.health_check_key, "ok", ex=60)
+        queue._last_warning = float("-inf")
+        assert await queue.enqueue("send_line_alert", "c") is True
+        assert len(warnings) == 1
+        assert await queue.worker_alive() is True
+    finally:
+        logger.remove(handler)
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from apiapp.modules.sensors.repository import SensorRepository
+from apiapp.modules.sensors.write_buffer import SensorWriteBuffer
+
+pytestmark = pytest.mark.asyncio
+
+START = datetime(2026, 1, 1)
+
+
+class FakeRepository(SensorRepository):
+    """เก็บ record ในหน่วยความจำ จำลอง DB ล่ม / insert ได้แค่บางก้อน / unique _id"""
+
+    def __init__(self, unique_ids: bool = True):
+        self.rows = []
+        self.down = False
+        self.accept_calls = None  # จำนวน insert ที่ยังสำเร็จได้ก่อน DB ล่ม (None = ไม่จำกัด)
+        self.unique_ids = unique_ids
+
+    async def add_many(self, sensor_type, records, ordered=True):
+        if self.down or self.accept_calls == 0:
+            raise ConnectionError("mongo down")
+        if self.accept_calls is not None:
+            self.accept_calls -= 1
+        stored = {row["_id"] for row in self.rows}
+        duplicates = [record for record in records if self.unique_ids and record["_id"] in stored]
+        self.rows.extend(record for record in records if record not in duplicates)
+        if duplicates:
+            raise BulkWriteError({"writeErrors": [{"code": 11000} for _ in duplicates]})
+        return len(records)
+
+    async def existing_ids(self, sensor_type, records):
+        stored = {row["_id"] for row in self.rows}
+        return {record["_id"] for record in records if record["_id"] in stored}
+
+
+def make_records(repo, count, sensor_type="ph"):
+    return [repo.build_record(sensor_type, "pond1", 7.0 + i / 100, START + timedelta(seconds=i)) for i in range(count)]
+
+
+def spill_lines(buffer):
+    with open(buffer.spill_path, encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+@pytest.fixture
+def repo():
+    return FakeRepository()
+
+
+@pytest.fixture
+def buffer(repo, tmp_path):
+    return SensorWriteBuffer(repo, flush_interval=0.05, max_docs=10, flush_timeout=1.0,
+                             spill_path=tmp_path / "spill.jsonl")
+
+
+async def test_flush_spills_when_db_is_down(repo, buffer):
+    repo.down = True
+    buffer.add("ph", make_records(repo, 15))
+    assert await buffer.flush() is False
+    assert buffer.flushed_docs == 0
+    assert buffer.spill_depth == spill_lines(buffer) == 15
+
+    repo.down = False
+    buffer.add("ph", make_records(repo, 3))
+    assert await buffer.flush() is True
+    assert buffer.flushed_docs == 3
+
+
+async def test_replay_drains_in_chunks_and_keeps_failed_remainder(repo, buffer):
+    records = make_records(repo, 45)
+    await buffer._spill("ph", records)
+
+    # 2 ก้อนแรกสำเร็จ แล้ว DB ล่ม: ที่เหลือกลับไปรอในไฟล์ spill
+    repo.accept_calls = 2
+    await buffer.replay()
+    assert len(repo.rows) == 20
+    assert buffer.spill_depth == spill_lines(buffer) == 25
+    assert not buffer._replay_path.exists()
+
+    repo.accept_calls = None
+    await buffer.replay()
+    assert [row["_id"] for row in repo.rows] == [record["_id"] for record in records]
+    assert buffer.spill_depth == 0 and buffer.replayed_docs == 45
+    assert not buffer.spill_path.exists()
+
+
+async def test_replay_skips_duplicates_and_broken_lines(repo, buffer):
+    records = make_records(repo, 5)
+    await repo.add_many("ph", records[:3])
+    await buffer._spill("ph", records)
+    buffer._append_spill(['{"sensor_type": "ph", "doc": {"id"'])  # บรรทัดที่เขียนไม่ครบ
+    buffer.spill_depth += 1
+
+    await buffer.replay()
+    assert len(repo.rows) == 5
+    assert buffer.replayed_docs == 2 and buffer.spill_depth == 0
+
+
+async def test_timeseries_replay_filters_existing_ids(tmp_path):
+    repo = FakeRepository(unique_ids=False)
+    buffer = SensorWriteBuffer(repo, 0.05, 10, 1.0, tmp_path / "spill.jsonl", dedupe_replay=True)
+    records = make_records(repo, 12)
+    # flush ที่ timeout บันทึกไปแล้วบางส่วนก่อนถูก spill ทั้งก้อน
+    await repo.add_many("ph", records[:7])
+    await buffer._spill("ph", records)
+
+    await buffer.replay()
+    assert len(repo.rows) == 12
+    assert buffer.replayed_docs == 5
+
+
+async def test_start_counts_and_replays_leftover_spill(repo, tmp_path):
+    first = SensorWriteBuffer(repo, 0.05, 10, 1.0, tmp_path / "spill.jsonl")
+    await first._spill("tds", make_records(repo, 4, "tds"))
+
+    second = SensorWriteBuffer(repo, 0.05, 10, 1.0, tmp_path / "spill.jsonl")
+    await second.start()
+    try:
+        assert len(repo.rows) == 4 and second.spill_depth == 0
+    finally:
+        await second.stop()
+
+
+async def test_insert_or_spill_retries_then_spills(repo, buffer):
+    records = make_records(repo, 5)
+    # ล้มเหลว 1 ครั้งแล้ว DB กลับมา: บันทึกได้ในรอบที่ลองใหม่
+    failures = [ConnectionError("mongo down")]
+    original = repo.add_many
+
+    async def flaky(sensor_type, records, ordered=True):
+        if failures:
+            raise failures.pop()
+        return await original(sensor_type, records, ordered)
+
+    repo.add_many = flaky
+    assert await buffer.insert_or_spill("ph", records, retries=2, backoff=0.01) is True
+    assert len(repo.rows) == 5 and buffer.spill_depth == 0
+
+    repo.down = True
+    more = make_records(repo, 3)
+    assert await buffer.insert_or_spill("ph", more, retries=2, backoff=0.01) is False
+    assert buffer.spill_depth == spill_lines(buffer) == 3
+
+    repo.down = False
+    await buffer.replay()
+    assert len(repo.rows) == 8
@@ -0,0 +1,53 @@
+import asyncio
+
+from loguru import logger
+
+from apiapp.core.config import get_settings
+from apiapp.infrastructure.container import init_container
+from apiapp.infrastructure.database import init_beanie
+from apiapp.infrastructure.jobs import JobQueue
+from apiapp.modules.rules.use_case import RuleUseCase
+from apiapp.modules.sensors.mqtt_ingest import SensorMQTTSubscriber
+from apiapp.modules.sensors.rollup import SensorRollupBuffer
+from apiapp.modules.sensors.stream import SensorStreamBroker
+from apiapp.modules.sensors.use_case import SensorUseCase
+from apiapp.modules.sensors.write_buffer import SensorWriteBuffer
+
+
+async def run_ingest():
+    settings = get_settings()
+    settings.configure_logging()
+    await init_beanie(settings)
+    container = init_container(settings)
+    use_case = container.resolve(SensorUseCase)
+    sensor_write_buffer = container.resolve(SensorWriteBuffer)
+    sensor_rollups = container.resolve(SensorRollupBuffer)
+    rule_use_case = container.resolve(RuleUseCase)
+    sensor_stream = container.resolve(SensorStreamBroker)
+    await use_case.warm_start_deadband()
+    await rule_use_case.start()
+    if settings.SENSOR_WRITE_BUFFER_ENABLED:
+        await sensor_write_buffer.start()
+    else:
+        # record ที่ spill ไว้ตอน insert ตรงล้มเหลว (ดู SensorUseCase._write)
+        await sensor_write_buffer.replay()
+    if settings.SENSOR_ROLLUP_ENABLED:
+        await sensor_rollups.start()
+    # hot window / rolling stats อยู่ในหน่วยความจำของ process นี้ API อ่านค่าล่าสุดจาก DB แทน
+    # ส่วน /sensors/stream ของ API เห็น reading จากที่นี่เฉพาะเมื่อกระจายผ่าน Redis
+    await sensor_stream.start()
+    if not settings.SENSOR_STREAM_FANOUT:
+        logger.warning("⚠️ SENSOR_STREAM_FANOUT is off: /sensors/stream clients of the API won't see these readings")
+    try:
+        await SensorMQTTSubscriber(settings, use_case).run_forever()
+    finally:
+        await use_case.flush_pending()
+        await sensor_write_buffer.stop()
+        await sensor_rollups.stop()
+        await rule_use_case.stop()
+        await sensor_stream.stop()
+        await container.resolve(JobQueue).close()
+
+
+def main():
+    asyncio.run(run_ingest())
@@ -30,10 +30,107 @@ class Settings(BaseSettings):
     DATABASE_URI: str = ""
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # arq worker (scripts/run-worker): Snapshot รายชั่วโมง, ตรวจคุณภาพน้ำ และส่ง LINE
+    # เปิด (True) เมื่อรัน worker แล้ว: API แค่ enqueue งาน
+    # ปิด (ค่าเริ่มต้น): API รัน scheduler และส่ง LINE เอง ไม่ต้องมี worker / Redis
+    WORKER_ENABLED: bool = False
+    WORKER_ALERT_CHECK_MINUTES: int = 5  # ตรวจค่าล่าสุดและแจ้งเตือนวิกฤตทุกกี่นาที
+    WORKER_HEALTH_CHECK_SECONDS: int = 60  # worker เขียน heartbeat ลง Redis ทุกกี่วินาที (API เตือนเมื่อไม่มี)
+
     MQTT_BROKER: str = "broker.hivemq.com"
     MQTT_PORT: int = 1883
     MQTT_USERNAME: str = ""
     MQTT_PASSWORD: str = ""
+    MQTT_CLIENT_ID: str = ""
+
+    # MQTT sensor ingest (subscriber)
+    MQTT_INGEST_ENABLED: bool = False  # เปิดเพื่อรัน subscriber ใน API process
+    MQTT_SENSOR_TOPIC: str = "aquasense/sensors/#"
+    MQTT_INGEST_QOS: int = 1
+    MQTT_INGEST_QUEUE_SIZE: int = 10000
+    # insert ตรง (write buffer ไม่ได้เปิด) ล้มเหลว: ลองใหม่แบบ exponential backoff แล้ว spill ลงไฟล์ของ write buffer
+    MQTT_INGEST_WRITE_RETRIES: int = 3
+    MQTT_INGEST_RETRY_BACKOFF_MS: int = 500
+
+    # Sensor write-behind buffer (group commit + spill file เมื่อ DB ช้า/ล่ม)
+    SENSOR_WRITE_BUFFER_ENABLED: bool = True
+    SENSOR_WRITE_BUFFER_FLUSH_MS: int = 500
+    SENSOR_WRITE_BUFFER_MAX_DOCS: int = 500
+    SENSOR_WRITE_BUFFER_FLUSH_TIMEOUT_MS: int = 5000
+    SENSOR_WRITE_BUFFER_SPILL_PATH: str = "data/sensor_spill.jsonl"
+
+    # Deadband: จำนวน (device_id, sensor_type) สูงสุดที่เก็บสถานะไว้ในหน่วยความจำ
+    SENSOR_DEADBAND_MAX_ENTRIES: int = 10000
+    # จำนวน device สูงสุดที่มี label device_id ของตัวเองใน /metrics (ที่เกินรวมเป็น "other")
+    SENSOR_METRICS_MAX_DEVICES: int = 100
+
+    # Compression policy ต่อ sensor: "sdt" (swinging-door) หรือ "deadband" (แบบเดิม)
+    SENSOR_COMPRESSION: str = "sdt"
+    SENSOR_COMPRESSION_OVERRIDES: Dict[str, str] = {}  # เช่น {"ph_voltage": "deadband"}
+    SENSOR_COMPRESSION_ERROR_BOUNDS: Dict[str, float] = {}  # ค่าที่ไม่ระบุใช้ THRESHOLDS ใน SensorUseCase
+    SENSOR_HEARTBEAT_SECONDS: int = 1800
+
+    # Anomaly detection ต่อ reading (EWMA z-score / rate / flatline) reading ที่ผิดปกติบันทึกเสมอ
+    SENSOR_ANOMALY_ENABLED: bool = True
+    SENSOR_ANOMALY_ALPHA: float = 0.05
+    SENSOR_ANOMALY_Z_THRESHOLD: float = 4.0
+    SENSOR_ANOMALY_WARMUP: int = 20  # sample ก่อนเริ่มตรวจ spike
+    SENSOR_ANOMALY_FLATLINE_SECONDS: int = 1800  # 0 = ไม่ตรวจ
+    SENSOR_ANOMALY_MAX_RATES: Dict[str, float] = {}  # ต่อนาที, ค่าที่ไม่ระบุใช้ DEFAULT_MAX_RATES ใน anomaly.py
+    SENSOR_ANOMALY_ALERT_COOLDOWN_SECONDS: int = 900
+
+    # Hot window: reading ล่าสุดต่อ (device_id, sensor_type) ในหน่วยความจำ
+    SENSOR_HOT_WINDOW_SIZE: int = 120  # sample ต่อ series
+    SENSOR_HOT_WINDOW_MAX_SERIES: int = 2000  # จำนวน series สูงสุด (LRU)
+
+    # /sensors/stats: สถิติ sliding window ในหน่วยความจำ (อัปเดตทุก reading)
+    SENSOR_ROLLING_ENABLED: bool = True
+    SENSOR_ROLLING_WINDOWS: Dict[str, int] = {}  # ชื่อ -> วินาที, ว่าง = DEFAULT_WINDOWS ใน rolling.py
+    SENSOR_ROLLING_MAX_SAMPLES: int = 20000  # ต่อ window ต่อ series
+
+    # Rollup รายนาที/รายชั่วโมง (อัปเดตจาก reading ที่รับเข้ามา เก็บนานกว่าข้อมูลดิบ 7 วัน)
+    SENSOR_ROLLUP_ENABLED: bool = True
+    SENSOR_ROLLUP_FLUSH_SECONDS: int = 10
+    SENSOR_ROLLUP_FLUSH_TIMEOUT_SECONDS: int = 10
+    SENSOR_ROLLUP_MINUTE_RETENTION_DAYS: int = 90
+    SENSOR_ROLLUP_HOUR_RETENTION_DAYS: int = 730
+
+    # /sensors/history?points=N|resolution=...: เลือก raw/minute/hour ตามช่วงเวลา แล้วลดด้วย LTTB
+    SENSOR_HISTORY_SCAN_LIMIT: int = 200_000  # document สูงสุดที่อ่านต่อ segment
+    SENSOR_HISTORY_DEFAULT_HOURS: int = 24  # ช่วงเวลาเมื่อไม่ระบุ start
+    SENSOR_RAW_INTERVAL_SECONDS: int = 10  # ระยะห่างโดยประมาณของ reading ดิบ (ใช้ประมาณจำนวนจุด)
+
+    # ผลวิเคราะห์คุณภาพน้ำ (memo): อายุสูงสุดเมื่อบางค่ามาจาก DB แทน hot window
+    SENSOR_ANALYSIS_CACHE_TTL_SECONDS: float = 5.0
+
+    # Snapshot คุณภาพน้ำรายชั่วโมง (ตรง hh:00, lease ใน Mongo กันบันทึกซ้ำจากหลาย worker)
+    # รันใน arq worker (cron) ถ้า WORKER_ENABLED ไม่อย่างนั้นรันใน API process
+    SENSOR_SNAPSHOT_CATCHUP_HOURS: int = 168  # ย้อนบันทึกชั่วโมงที่พลาดหลังระบบหยุด (ไม่เกินอายุข้อมูลดิบ)
+    SENSOR_SNAPSHOT_LEASE_SECONDS: int = 300  # worker ที่ตายระหว่างบันทึก lock หมดอายุหลังจากนี้
+
+    # กฎคุณภาพน้ำ (/rules): ตรวจว่ามีการแก้ไขจาก process อื่นทุกกี่วินาที
+    SENSOR_RULES_RELOAD_SECONDS: float = 30.0
+    # จำนวน Snapshot ต่อ batch ของ job จัดระดับย้อนหลัง (forge rules reclassify / worker)
+    REPORT_RECLASSIFY_BATCH_SIZE: int = 5000
+
+    # /sensors/aligned: จำนวนแถวสูงสุดของตาราง as-of (รวม /rules/preview)
+    SENSOR_ALIGN_MAX_ROWS: int = 10000
+
+    # /sensors/export: จำนวนแถวต่อ batch ที่อ่านจาก cursor แล้วส่งออก
+    SENSOR_EXPORT_BATCH_SIZE: int = 5000
+
+    # Live stream (SSE) ของ /sensors/stream
+    SENSOR_STREAM_MAX_SUBSCRIBERS: int = 500  # ต่อ worker
+    SENSOR_STREAM_QUEUE_SIZE: int = 100  # event ที่ค้างได้ต่อ client ก่อนสั่ง resync
+    SENSOR_STREAM_HEARTBEAT_SECONDS: int = 15
+    SENSOR_STREAM_MAX_SECONDS: int = 300  # อายุสูงสุดของ 1 connection (client เชื่อมต่อใหม่เอง)
+    # กระจาย event ผ่าน Redis (REDIS_URL): ต้องเปิดเมื่อรัน ingest แยก process หรือ uvicorn หลาย worker
+    # ไม่เปิด = client เห็นเฉพาะ reading ที่รับเข้ามาใน process เดียวกับที่เชื่อมต่ออยู่
+    SENSOR_STREAM_FANOUT: bool = False
+
+    # เก็บข้อมูล sensor เป็น MongoDB time-series collection (ต้อง migrate ก่อนเปิด)
+    # _id ไม่ unique: write buffer จะตรวจ _id ที่บันทึกแล้วก่อน replay ไฟล์ spill
+    SENSOR_TIMESERIES: bool = False
 
     # auth
     SECRET_KEY: str = "secret_key"
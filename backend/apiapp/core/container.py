@@ -0,0 +1,69 @@
+"""
+Application-scoped dependency container
+"""
+
+import threading
+from typing import Any, Callable, Dict, Type, TypeVar
+
+
+T = TypeVar("T")
+
+
+class Container:
+    """
+    Registry ของ singleton ระดับ application (repository, use case, external client)
+
+    - register(key, factory): factory รับ container แล้วคืน instance (สร้างครั้งแรกที่ resolve)
+    - resolve(key): คืน instance เดิมทุกครั้ง สร้างแบบ lazy และ thread-safe
+    - provider(key): async dependency สำหรับ FastAPI Depends (ไม่สร้าง object ต่อ request
+      และไม่ต้องกระโดดไป threadpool เหมือน sync dependency)
+    """
+
+    def __init__(self):
+        self._factories: Dict[Any, Callable[["Container"], Any]] = {}
+        self._instances: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+
+    def register(self, key: Type[T], factory: Callable[["Container"], T]) -> None:
+        with self._lock:
+            self._factories[key] = factory
+            self._instances.pop(key, None)
+
+    def register_instance(self, key: Type[T], instance: T) -> None:
+        with self._lock:
+            self._instances[key] = instance
+
+    def resolve(self, key: Type[T]) -> T:
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+        with self._lock:
+            # เช็คซ้ำหลังได้ lock (อาจมี thread อื่นสร้างไปแล้ว)
+            instance = self._instances.get(key)
+            if instance is None:
+                factory = self._factories.get(key)
+                if factory is None:
+                    raise LookupError(f"{getattr(key, '__name__', key)} is not registered in the container")
+                instance = factory(self)
+                self._instances[key] = instance
+            return instance
+
+    def provider(self, key: Type[T]) -> Callable[[], Any]:
+        async def provide() -> T:
+            return self.resolve(key)
+
+        provide.__name__ = f"provide_{getattr(key, '__name__', 'dependency')}"
+        return provide
+
+    def is_registered(self, key: Any) -> bool:
+        return key in self._factories or key in self._instances
+
+    def reset(self) -> None:
+        """ล้าง instance และ factory ทั้งหมด (ตอน shutdown หรือใน test)"""
+        with self._lock:
+            self._factories.clear()
+            self._instances.clear()
+
+
+# Global container instance (ลงทะเบียน provider ใน infrastructure/container.py ตอน lifespan)
+container = Container()
@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from ..core.config import Settings
+from ..core.container import Container, container
+from ..modules.auth.use_case import AuthUseCase
+from ..modules.devices.use_case import DeviceUseCase
+from ..modules.notification.service import LineBotService
+from ..modules.reports.repository import ReportRepository
+from ..modules.reports.use_case import ReportUseCase
+from ..modules.rules.engine import RuleEngine
+from ..modules.rules.repository import RuleRepository
+from ..modules.rules.use_case import RuleUseCase
+from ..modules.sensors.anomaly import build_detector
+from ..modules.sensors.compression import build_policies
+from ..modules.sensors.deadband import DeadbandStore
+from ..modules.sensors.hot_window import HotWindow
+from ..modules.sensors.metrics import device_label, register_buffer_collector
+from ..modules.sensors.model import SECONDS_TO_EXPIRE
+from ..modules.sensors.planner import TierPlanner
+from ..modules.sensors.rolling import DEFAULT_WINDOWS, RollingStats
+from ..modules.sensors.snapshot import HourlySnapshotScheduler
+from ..modules.sensors.repository import SensorRepository
+from ..modules.sensors.rollup import SensorRollupBuffer
+from ..modules.sensors.stream import SensorStreamBroker
+from ..modules.sensors.use_case import SensorUseCase
+from ..modules.sensors.write_buffer import SensorWriteBuffer
+from ..modules.user.repository import UserRepository
+from ..modules.user.use_case import UserUseCase
+from .jobs import JobQueue
+from .lease import MongoLease
+
+
+def init_container(settings: Settings, target: Container = container) -> Container:
+    """
+    ลงทะเบียน singleton ทั้งหมดของ application (เรียกครั้งเดียวจาก lifespan / cmd)
+    ทุกตัวสร้างแบบ lazy ครั้งแรกที่ resolve แล้วใช้ instance เดิมตลอดอายุ process
+    """
+    # 🔌 External clients
+    target.register(LineBotService, lambda c: LineBotService())
+    target.register(JobQueue, lambda c: JobQueue(settings.REDIS_URL))
+
+    # 💾 Repositories
+    target.register(UserRepository, lambda c: UserRepository())
+    target.register(ReportRepository, lambda c: ReportRepository())
+    target.register(SensorRepository, lambda c: SensorRepository())
+    target.register(RuleRepository, lambda c: RuleRepository())
+
+    # 🧠 สถานะของ ingest pipeline (อายุเท่ากับ process)
+    target.register(
+        DeadbandStore, lambda c: DeadbandStore(settings.SENSOR_DEADBAND_MAX_ENTRIES)
+    )
+    target.register(
+        HotWindow,
+        lambda c: HotWindow(settings.SENSOR_HOT_WINDOW_SIZE, settings.SENSOR_HOT_WINDOW_MAX_SERIES),
+    )
+    target.register(
+        SensorStreamBroker,
+        lambda c: SensorStreamBroker(
+            settings.SENSOR_STREAM_QUEUE_SIZE,
+            settings.SENSOR_STREAM_MAX_SUBSCRIBERS,
+            settings.SENSOR_STREAM_HEARTBEAT_SECONDS,
+            settings.SENSOR_STREAM_MAX_SECONDS,
+            redis=Redis.from_url(settings.REDIS_URL) if settings.SENSOR_STREAM_FANOUT else None,
+        ),
+    )
+    # กฎคุณภาพน้ำที่ compile แล้ว (ใช้กฎเริ่มต้นจนกว่า RuleUseCase.start จะโหลดจาก DB)
+    target.register(RuleEngine, lambda c: RuleEngine())
+    target.register(
+        SensorRollupBuffer,
+        lambda c: SensorRollupBuffer(
+            c.resolve(SensorRepository),
+            settings.SENSOR_ROLLUP_FLUSH_SECONDS,
+            settings.SENSOR_ROLLUP_FLUSH_TIMEOUT_SECONDS,
+        ),
+    )
+    target.register(
+        SensorWriteBuffer,
+        lambda c: SensorWriteBuffer.from_settings(settings, c.resolve(SensorRepository)),
+    )
+
+    # 🧩 Use cases
+    target.register(UserUseCase, lambda c: UserUseCase(c.resolve(UserRepository)))
+    target.register(AuthUseCase, lambda c: AuthUseCase(c.resolve(UserRepository)))
+    target.register(ReportUseCase, lambda c: ReportUseCase(c.resolve(ReportRepository)))
+    target.register(DeviceUseCase, lambda c: DeviceUseCase())
+    target.register(
+        SensorUseCase,
+        lambda c: SensorUseCase(
+            repo=c.resolve(SensorRepository),
+            line_service=c.resolve(LineBotService),
+            deadband=c.resolve(DeadbandStore),
+            # error bound = THRESHOLDS ถ้าไม่ได้ override ใน config
+            policies=build_policies(
+                settings.SENSOR_COMPRESSION,
+                settings.SENSOR_COMPRESSION_OVERRIDES,
+                {**SensorUseCase.THRESHOLDS, **settings.SENSOR_COMPRESSION_ERROR_BOUNDS},
+                settings.SENSOR_HEARTBEAT_SECONDS,
+            ),
+            hot_window=c.resolve(HotWindow),
+            write_buffer=c.resolve(SensorWriteBuffer),
+            stream=c.resolve(SensorStreamBroker),
+            rollups=c.resolve(SensorRollupBuffer),
+            # min stddev ของ z-score = ความละเอียดของ sensor (THRESHOLDS)
+            anomaly=build_detector(
+                settings.SENSOR_ANOMALY_ALPHA,
+                settings.SENSOR_ANOMALY_Z_THRESHOLD,
+                settings.SENSOR_ANOMALY_WARMUP,
+                settings.SENSOR_ANOMALY_FLATLINE_SECONDS,
+                SensorUseCase.THRESHOLDS,
+                settings.SENSOR_ANOMALY_MAX_RATES,
+                settings.SENSOR_ANOMALY_ALERT_COOLDOWN_SECONDS,
+            ) if settings.SENSOR_ANOMALY_ENABLED else None,
+            rolling=RollingStats(
+                settings.SENSOR_ROLLING_WINDOWS or DEFAULT_WINDOWS,
+                settings.SENSOR_HOT_WINDOW_MAX_SERIES,
+                settings.SENSOR_ROLLING_MAX_SAMPLES,
+            ) if settings.SENSOR_ROLLING_ENABLED else None,
+            jobs=c.resolve(JobQueue) if settings.WORKER_ENABLED else None,
+            planner=TierPlanner(
+                settings.SENSOR_RAW_INTERVAL_SECONDS,
+                {
+                    "raw": SECONDS_TO_EXPIRE,
+                    "minute": settings.SENSOR_ROLLUP_MINUTE_RETENTION_DAYS * 86400,
+                    "hour": settings.SENSOR_ROLLUP_HOUR_RETENTION_DAYS * 86400,
+                },
+            ),
+            rules=c.resolve(RuleEngine),
+            history_scan_limit=settings.SENSOR_HISTORY_SCAN_LIMIT,
+            history_default_span=timedelta(hours=settings.SENSOR_HISTORY_DEFAULT_HOURS),
+            export_batch_size=settings.SENSOR_EXPORT_BATCH_SIZE,
+            align_max_rows=settings.SENSOR_ALIGN_MAX_ROWS,
+            analysis_cache_ttl=settings.SENSOR_ANALYSIS_CACHE_TTL_SECONDS,
+        ),
+    )
+
+    target.register(
+        RuleUseCase,
+        lambda c: RuleUseCase(
+            c.resolve(RuleRepository),
+            c.resolve(RuleEngine),
+            c.resolve(SensorUseCase),
+            c.resolve(ReportRepository),
+            settings.SENSOR_RULES_RELOAD_SECONDS,
+            settings.REPORT_RECLASSIFY_BATCH_SIZE,
+        ),
+    )
+
+    target.register(
+        HourlySnapshotScheduler,
+        lambda c: HourlySnapshotScheduler(
+            c.resolve(SensorUseCase),
+            MongoLease("hourly_snapshot", settings.SENSOR_SNAPSHOT_LEASE_SECONDS),
+            settings.SENSOR_SNAPSHOT_CATCHUP_HOURS,
+        ),
+    )
+
+    # 📈 ค่าของ write buffer ใน /metrics
+    register_buffer_collector(target.resolve(SensorWriteBuffer))
+    device_label.max_devices = settings.SENSOR_METRICS_MAX_DEVICES
+
+    logger.info("🧩 Dependency container initialized")
+    return target
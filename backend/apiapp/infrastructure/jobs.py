@@ -0,0 +1,75 @@
+import asyncio
+import time
+from typing import Optional
+
+from arq import create_pool
+from arq.connections import ArqRedis, RedisSettings
+from arq.constants import default_queue_name, health_check_key_suffix
+from loguru import logger
+
+
+class JobQueue:
+    """
+    ส่งงานไปให้ arq worker ทำ (apiapp/worker) แทนการรันใน event loop ของ API
+
+    - สร้าง connection pool ครั้งแรกที่ enqueue (API ที่ไม่เคยส่งงานไม่ต้องต่อ Redis)
+    - job_id ซ้ำกับงานที่ยังค้างหรือเพิ่งเสร็จ arq จะไม่รับซ้ำ (ใช้กันส่งแจ้งเตือนซ้ำข้าม process)
+    - enqueue ไม่สำเร็จ (Redis ล่ม) log แล้วคืน False ไม่ทำให้ request ล้ม
+    - enqueue ได้แต่ไม่มี heartbeat ของ worker ใน Redis (worker ไม่ได้รัน) log เตือน
+      ไม่เกิน 1 ครั้งต่อ warn_interval วินาที (งานจะค้างในคิวจนกว่า worker จะเริ่ม)
+    """
+
+    def __init__(self, redis_url: str, queue_name: str = default_queue_name, warn_interval: float = 300):
+        self.redis_settings = RedisSettings.from_dsn(redis_url)
+        self.queue_name = queue_name
+        self.health_check_key = queue_name + health_check_key_suffix
+        self.warn_interval = warn_interval
+        self._pool: Optional[ArqRedis] = None
+        self._lock = asyncio.Lock()
+        self._last_warning = float("-inf")
+
+    async def _get_pool(self) -> ArqRedis:
+        if self._pool is None:
+            async with self._lock:
+                if self._pool is None:
+                    self._pool = await create_pool(self.redis_settings)
+        return self._pool
+
+    async def enqueue(self, function: str, *args, job_id: Optional[str] = None, **kwargs) -> bool:
+        try:
+            pool = await self._get_pool()
+            job = await pool.enqueue_job(function, *args, _job_id=job_id, _queue_name=self.queue_name, **kwargs)
+        except Exception as e:
+            logger.error(f"❌ Enqueue {function} failed: {e}")
+            return False
+        if job is None:
+            logger.debug(f"⏭️ Job {job_id} already queued")
+            return False
+        await self._check_worker(pool, function)
+        return True
+
+    async def worker_alive(self) -> bool:
+        """มี worker เขียน heartbeat (arq health check) ภายใน health_check_interval ล่าสุดหรือไม่"""
+        pool = await self._get_pool()
+        return bool(await pool.exists(self.health_check_key))
+
+    async def _check_worker(self, pool: ArqRedis, function: str):
+        now = time.monotonic()
+        if now - self._last_warning < self.warn_interval:
+            return
+        try:
+            alive = bool(await pool.exists(self.health_check_key))
+        except Exception as e:
+            logger.error(f"❌ Worker health check failed: {e}")
+            return
+        if not alive:
+            self._last_warning = now
+            logger.warning(
+                f"⚠️ Enqueued {function} but no arq worker heartbeat ({self.health_check_key}) "
+                "- start scripts/run-worker or set WORKER_ENABLED=false"
+            )
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
@@ -0,0 +1,79 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .database import get_database
+
+LEASE_COLLECTION = "scheduler_leases"
+
+
+def default_owner() -> str:
+    """ชื่อเจ้าของ lease ที่ไม่ซ้ำกันระหว่าง process / เครื่อง"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class MongoLease:
+    """
+    Lock แบบมีอายุ (lease) ใน MongoDB สำหรับงานตามรอบเวลาที่ต้องทำครั้งเดียวจากหลาย worker
+
+    1 document ต่อชื่องาน: {_id: name, owner, expires_at, last_slot}
+    - acquire(slot): ได้ lock เมื่อไม่มีใครถืออยู่ (หรือหมดอายุ) และ slot นั้นยังไม่เสร็จ (last_slot < slot)
+    - complete(slot): บันทึกว่า slot นั้นเสร็จแล้วและปล่อย lock
+    - process ที่ตายระหว่างทำ lock จะหมดอายุเอง แล้ว process อื่นทำ slot นั้นต่อ
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, owner: Optional[str] = None):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner = owner or default_owner()
+
+    @property
+    def _collection(self):
+        return get_database()[LEASE_COLLECTION]
+
+    @staticmethod
+    def _now() -> datetime:
+        # เทียบเวลาหมดอายุด้วย UTC (ไม่ขึ้นกับ timezone ของเครื่อง)
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    async def last_slot(self) -> Optional[datetime]:
+        doc = await self._collection.find_one({"_id": self.name}, {"last_slot": 1})
+        return doc.get("last_slot") if doc else None
+
+    async def acquire(self, slot: datetime) -> bool:
+        now = self._now()
+        query = {
+            "_id": self.name,
+            "$and": [
+                {"$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {"$or": [{"last_slot": {"$lt": slot}}, {"last_slot": None}]},
+            ],
+        }
+        try:
+            doc = await self._collection.find_one_and_update(
+                query,
+                {"$set": {"owner": self.owner, "expires_at": now + self.ttl, "slot": slot}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # มี document อยู่แล้วแต่ไม่ตรงเงื่อนไข (คนอื่นถืออยู่ หรือ slot นี้เสร็จแล้ว) -> upsert ชน _id
+            return False
+        return doc is not None and doc["owner"] == self.owner
+
+    async def complete(self, slot: datetime):
+        await self._collection.update_one(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"last_slot": slot, "expires_at": self._now()}},
+        )
+
+    async def release(self):
+        """ปล่อย lock โดยไม่บันทึกว่าเสร็จ (ทำไม่สำเร็จ ให้รอบถัดไป/process อื่นลองใหม่)"""
+        await self._collection.update_one(
+            {"_id": self.name, "owner": self.owner}, {"$set": {"expires_at": self._now()}}
+        )
@@ -1,12 +1,12 @@
 import datetime
 import typing as t
-from fastapi import Depends
 from fastapi.security import OAuth2PasswordRequestForm
 
 from ...core import security
 from ...core.config import settings
+from ...core.container import container
 from ...core.exceptions import AuthError
-from ..user.repository import UserRepository, get_user_repository
+from ..user.repository import UserRepository
 from ..user.model import User
 from . import schemas
 
@@ -113,7 +113,5 @@ class AuthUseCase:
         )
 
 # Dependency Injection
-async def get_auth_use_case(
-    repository: UserRepository = Depends(get_user_repository),
-) -> AuthUseCase:
-    return AuthUseCase(repository)
\ No newline at end of file
+async def get_auth_use_case() -> AuthUseCase:
+    return container.resolve(AuthUseCase)
\ No newline at end of file
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends
+from apiapp.core.container import container
 from .schemas import DeviceCommandResponse
 from .use_case import DeviceUseCase
 
 # สร้าง Router ชื่อ Control
 router = APIRouter(prefix="/control", tags=["Control (Devices)"])
 
-def get_use_case():
-    return DeviceUseCase()
+get_use_case = container.provider(DeviceUseCase)
 
 # สร้าง API แบบ POST หรือ GET ก็ได้ (แต่ Control นิยมใช้ POST)
 # URL จะเป็น: /control/pump1/on
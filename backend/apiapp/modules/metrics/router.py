@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", summary="Prometheus Metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Prometheus text format: ingest counters, latency histograms
+    and write buffer state.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
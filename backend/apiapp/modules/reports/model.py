@@ -1,5 +1,6 @@
 # app/modules/reports/model.py
 from beanie import Document
+from pymongo import ASCENDING, IndexModel
 from datetime import datetime
 from pydantic import Field
 from typing import List, Optional
@@ -12,12 +13,19 @@ def now_thai():
     tz_thai = timezone(timedelta(hours=7))
     return datetime.now(tz_thai)
 
+# ค่า sensor ที่เก็บใน Snapshot (ชื่อเดียวกับ sensor_type ของกฎคุณภาพน้ำ)
+ANALYSIS_VALUE_FIELDS = ("ph", "ph_voltage", "turbidity", "nh3", "temperature", "tds")
+
 class WaterAnalysisLog(Document):
     """
     เก็บผลวิเคราะห์รายชั่วโมง (Snapshot)
     ย้ายมาอยู่ที่ Reports เพราะเน้นใช้ทำรายงาน
     """
     timestamp: datetime = Field(default_factory=now_thai)
+    # ต้นชั่วโมงของ Snapshot ที่บันทึกตามรอบ (unique กันบันทึกซ้ำจากหลาย worker)
+    slot: Optional[datetime] = None
+    # บ่อที่ใช้ override ของกฎตอนจัดระดับ (None = กฎกลาง / ค่ามาจากหลายบ่อ) ใช้ซ้ำตอน reclassify
+    device_id: Optional[str] = None
     status: str                 
     issues: List[str] = []      
     
@@ -29,4 +37,13 @@ class WaterAnalysisLog(Document):
     tds: Optional[float] = None
 
     class Settings:
-        name = "water_analysis"
\ No newline at end of file
+        name = "water_analysis"
+        # รายงานและ job จัดระดับย้อนหลังอ่านตามช่วงเวลา
+        indexes = [
+            IndexModel([("timestamp", ASCENDING)]),
+            IndexModel(
+                [("slot", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"slot": {"$type": "date"}},
+            ),
+        ]
\ No newline at end of file
@@ -1,6 +1,8 @@
 from datetime import datetime
-from typing import List
-from .model import WaterAnalysisLog
+from typing import AsyncIterator, List, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from .model import ANALYSIS_VALUE_FIELDS, WaterAnalysisLog
 
 class ReportRepository:
     
@@ -13,4 +15,32 @@ class ReportRepository:
         return await WaterAnalysisLog.find(
             WaterAnalysisLog.timestamp >= start,
             WaterAnalysisLog.timestamp <= end
-        ).to_list()
\ No newline at end of file
+        ).to_list()
+
+    async def iter_logs(self, start: datetime, end: datetime, batch_size: int) -> AsyncIterator[List[dict]]:
+        """ อ่าน Snapshot ในช่วงเวลาเป็น batch เรียงตามเวลา (dict ดิบ เฉพาะ field ที่ใช้จัดระดับ) """
+        projection = {"timestamp": 1, "device_id": 1, "status": 1, "issues": 1, **{field: 1 for field in ANALYSIS_VALUE_FIELDS}}
+        cursor = WaterAnalysisLog.get_motor_collection().find(
+            {"timestamp": {"$gte": start, "$lte": end}},
+            projection,
+            sort=[("timestamp", 1), ("_id", 1)],
+            batch_size=batch_size,
+        )
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def update_classifications(self, updates: List[Tuple[ObjectId, str, List[str]]]) -> int:
+        """ เขียน status / issues ใหม่ทั้ง batch ด้วย bulk_write ครั้งเดียว คืนจำนวนที่แก้ไขจริง """
+        if not updates:
+            return 0
+        result = await WaterAnalysisLog.get_motor_collection().bulk_write(
+            [UpdateOne({"_id": _id}, {"$set": {"status": status, "issues": issues}}) for _id, status, issues in updates],
+            ordered=False,
+        )
+        return result.modified_count
\ No newline at end of file
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends
+from apiapp.core.container import container
 from .use_case import ReportUseCase
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
-def get_report_use_case():
-    return ReportUseCase()
+get_report_use_case = container.provider(ReportUseCase)
 
 from typing import Optional
 
@@ -5,8 +5,8 @@ from .repository import ReportRepository
 
 class ReportUseCase:
     
-    def __init__(self):
-        self.repo = ReportRepository()
+    def __init__(self, repo: ReportRepository):
+        self.repo = repo
 
     # =========================================================
     # 📊 โซนสรุปผล (Cards)
@@ -0,0 +1,206 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 🧪 Rule engine สำหรับจัดระดับคุณภาพน้ำ
+# ---------------------------------------------------------
+# กฎเก็บเป็นข้อมูล (ดู model.py) แล้ว compile ครั้งเดียวเป็น CompiledRules
+# ใช้ได้ทั้งประเมินค่าล่าสุด 1 ชุด (evaluate) และทั้งตารางย้อนหลังด้วย NumPy (evaluate_batch)
+
+SEVERITY_LEVELS = {"warning": 1, "critical": 2}
+
+# ระดับ -> (status, color, message) ของผลวิเคราะห์
+STATUS_BY_LEVEL = {
+    0: ("Good", "green", "คุณภาพน้ำปกติ เหมาะแก่การเลี้ยงสัตว์น้ำ"),
+    1: ("Warning", "orange", "คุณภาพน้ำเริ่มมีปัญหา"),
+    2: ("Critical", "red", "คุณภาพน้ำวิกฤต! กรุณาตรวจสอบทันที"),
+}
+
+# กฎเริ่มต้น (ค่าเดียวกับที่เคย hard-code ใน SensorUseCase) ใช้ seed ตอน collection ยังว่าง
+DEFAULT_RULES = [
+    {"name": "ph_low", "sensor_type": "ph", "operator": "lt", "threshold": 6.5,
+     "severity": "critical", "message": "pH ต่ำเกินไป ({value:.1f})"},
+    {"name": "ph_high", "sensor_type": "ph", "operator": "gt", "threshold": 8.5,
+     "severity": "critical", "message": "pH สูงเกินไป ({value:.1f})"},
+    {"name": "temperature_low", "sensor_type": "temperature", "operator": "lt", "threshold": 15,
+     "severity": "warning", "message": "น้ำเย็นเกินไป ({value:.1f}°C)"},
+    {"name": "temperature_high", "sensor_type": "temperature", "operator": "gt", "threshold": 30,
+     "severity": "warning", "message": "น้ำร้อนเกินไป ({value:.1f}°C)"},
+    {"name": "turbidity_high", "sensor_type": "turbidity", "operator": "gt", "threshold": 5.0,
+     "severity": "warning", "message": "น้ำขุ่นมาก ({value:.1f} NTU)"},
+    {"name": "tds_high", "sensor_type": "tds", "operator": "gt", "threshold": 400,
+     "severity": "critical", "message": "ค่า TDS สูงเกินไป ({value:.1f} ppm)"},
+]
+
+
+class Rule(NamedTuple):
+    name: str
+    sensor_type: str
+    above: bool  # True = ผิดปกติเมื่อสูงกว่า threshold ("gt"), False = ต่ำกว่า ("lt")
+    threshold: float
+    level: int
+    message: str
+    hysteresis: float
+
+    def breached(self, value: float) -> bool:
+        return value > self.threshold if self.above else value < self.threshold
+
+    def holding(self, value: float) -> bool:
+        """ยังถือว่าผิดปกติต่อ (ยังไม่กลับเข้าช่วงปกติเกิน hysteresis)"""
+        if self.above:
+            return value > self.threshold - self.hysteresis
+        return value < self.threshold + self.hysteresis
+
+
+def compile_rule(data: dict) -> Rule:
+    return Rule(
+        name=data["name"],
+        sensor_type=data["sensor_type"],
+        above=data["operator"] == "gt",
+        threshold=float(data["threshold"]),
+        level=SEVERITY_LEVELS[data.get("severity", "warning")],
+        message=data["message"],
+        hysteresis=float(data.get("hysteresis") or 0.0),
+    )
+
+
+class CompiledRules:
+    """
+    ชุดกฎที่ compile แล้ว (immutable) สลับทั้งก้อนตอน reload
+
+    - กฎที่ไม่มี device_id ใช้กับทุกบ่อ
+    - กฎที่มี device_id ชื่อเดียวกันจะแทนกฎกลางเฉพาะบ่อนั้น (enabled=False = ปิดกฎนั้นสำหรับบ่อนั้น)
+    """
+
+    def __init__(self, rules: Iterable[dict]):
+        self._global: Dict[str, Optional[Rule]] = {}
+        self._overrides: Dict[str, Dict[str, Optional[Rule]]] = {}
+        for data in rules:
+            rule = compile_rule(data) if data.get("enabled", True) else None
+            device_id = data.get("device_id")
+            if device_id:
+                self._overrides.setdefault(device_id, {})[data["name"]] = rule
+            else:
+                self._global[data["name"]] = rule
+        self._resolved: Dict[Optional[str], Tuple[Rule, ...]] = {}
+
+    def rules_for(self, device_id: Optional[str] = None) -> Tuple[Rule, ...]:
+        resolved = self._resolved.get(device_id)
+        if resolved is None:
+            merged = {**self._global, **self._overrides.get(device_id, {})}
+            resolved = tuple(rule for rule in merged.values() if rule is not None)
+            self._resolved[device_id] = resolved
+        return resolved
+
+    def evaluate(
+        self,
+        values: Dict[str, Optional[float]],
+        device_id: Optional[str] = None,
+        active: Optional[Set[str]] = None,
+        update: bool = False,
+    ) -> Tuple[str, str, str, List[str]]:
+        """
+        (status, color, message, issues) ของค่าชุดเดียว
+        active: ชื่อกฎที่ผิดปกติอยู่ก่อนหน้า (ใช้กับ hysteresis) อัปเดตในที่เฉพาะเมื่อ update=True
+        """
+        level = 0
+        issues = []
+        for rule in self.rules_for(device_id):
+            value = values.get(rule.sensor_type)
+            if value is None:
+                continue
+            was_active = active is not None and rule.name in active
+            triggered = rule.breached(value) or (was_active and rule.holding(value))
+            if update and active is not None:
+                if triggered:
+                    active.add(rule.name)
+                else:
+                    active.discard(rule.name)
+            if triggered:
+                issues.append(rule.message.format(value=value))
+                level = max(level, rule.level)
+        status, color, message = STATUS_BY_LEVEL[level]
+        return status, color, message, issues
+
+    def evaluate_batch(
+        self,
+        columns: Dict[str, np.ndarray],
+        device_id: Optional[str] = None,
+        active: Optional[Set[str]] = None,
+        issues: bool = False,
+    ) -> dict:
+        """
+        ประเมินทั้งตาราง (แถวเรียงตามเวลา, NaN = ไม่มีค่า) แบบ vectorized
+        คืน {"level": ระดับต่อแถว (0/1/2), "rules": {ชื่อกฎ: bool ต่อแถว}}
+        active: สถานะ hysteresis ก่อนแถวแรก (อัปเดตในที่เป็นสถานะหลังแถวสุดท้าย ใช้ต่อ batch ถัดไป)
+        issues=True: เพิ่ม "issues" ข้อความต่อแถว (format เฉพาะแถวที่กฎทำงาน)
+        """
+        length = len(next(iter(columns.values()))) if columns else 0
+        level = np.zeros(length, dtype=np.int8)
+        fired = {}
+        for rule in self.rules_for(device_id):
+            values = columns.get(rule.sensor_type)
+            if values is None:
+                continue
+            was_active = active is not None and rule.name in active
+            hit, still_active = _batch_active(rule, values, was_active)
+            if active is not None:
+                if still_active:
+                    active.add(rule.name)
+                else:
+                    active.discard(rule.name)
+            fired[rule.name] = hit
+            level = np.maximum(level, np.where(hit, rule.level, 0).astype(np.int8))
+        result = {"level": level, "rules": fired}
+        if issues:
+            messages: List[List[str]] = [[] for _ in range(length)]
+            for rule in self.rules_for(device_id):
+                hit = fired.get(rule.name)
+                if hit is None:
+                    continue
+                values = columns[rule.sensor_type]
+                for i in np.flatnonzero(hit).tolist():
+                    messages[i].append(rule.message.format(value=float(values[i])))
+            result["issues"] = messages
+        return result
+
+
+def _batch_active(rule: Rule, values: np.ndarray, was_active: bool = False) -> Tuple[np.ndarray, bool]:
+    """(กฎทำงานต่อแถว, สถานะ hysteresis หลังแถวสุดท้าย)"""
+    missing = np.isnan(values)
+    with np.errstate(invalid="ignore"):
+        on = values > rule.threshold if rule.above else values < rule.threshold
+        hold = values > rule.threshold - rule.hysteresis if rule.above else values < rule.threshold + rule.hysteresis
+    # Schmitt trigger: ตั้งเมื่อเกิน threshold, ล้างเมื่อกลับเข้าช่วงปกติเกิน hysteresis
+    # แถวระหว่างนั้น (หรือไม่มีค่า) ใช้สถานะล่าสุด -> forward fill ด้วย maximum.accumulate ของ index
+    event = np.where(on, 1, np.where(~hold & ~missing, 0, -1))
+    index = np.where(event >= 0, np.arange(len(values)), -1)
+    np.maximum.accumulate(index, out=index)
+    state = np.where(index >= 0, event[np.maximum(index, 0)], int(was_active)) == 1
+    return state & ~missing, bool(state[-1]) if len(state) else was_active
+
+
+class RuleEngine:
+    """
+    ตัวถือ CompiledRules ปัจจุบัน (singleton ใน container) + สถานะ hysteresis ต่อบ่อ
+    reload() สลับชุดกฎทั้งก้อน ตัวที่กำลังประเมินอยู่ใช้ชุดเดิมจนจบ
+
+    - advance(): ประเมินแล้วเลื่อนสถานะ hysteresis (SensorUseCase เรียกที่เดียวต่อค่าล่าสุดชุดใหม่)
+    - evaluate(): ประเมินด้วยสถานะปัจจุบันโดยไม่แก้สถานะ (ค่าชุดอื่นที่ส่งมาเอง)
+    """
+
+    def __init__(self, rules: Optional[Iterable[dict]] = None):
+        self.compiled = CompiledRules(DEFAULT_RULES if rules is None else rules)
+        self._active: Dict[Optional[str], Set[str]] = {}
+        self.version = 0
+
+    def reload(self, rules: Iterable[dict]):
+        self.compiled = CompiledRules(rules)
+        self.version += 1
+
+    def evaluate(self, values: Dict[str, Optional[float]], device_id: Optional[str] = None):
+        return self.compiled.evaluate(values, device_id, self._active.get(device_id))
+
+    def advance(self, values: Dict[str, Optional[float]], device_id: Optional[str] = None):
+        return self.compiled.evaluate(values, device_id, self._active.setdefault(device_id, set()), update=True)
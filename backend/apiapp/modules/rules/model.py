@@ -0,0 +1,35 @@
+from beanie import Document
+from pydantic import Field
+from datetime import datetime, timedelta
+from typing import Optional
+import pymongo
+
+
+def now_thai():
+    return datetime.utcnow() + timedelta(hours=7)
+
+
+class WaterQualityRule(Document):
+    """
+    กฎจัดระดับคุณภาพน้ำ 1 ข้อ (แก้ไขได้ระหว่างระบบทำงาน ดู engine.py)
+    ผิดปกติเมื่อค่า sensor_type ต่ำกว่า (lt) / สูงกว่า (gt) threshold
+    และหายเมื่อกลับเข้าช่วงปกติเกิน hysteresis
+    """
+    name: str
+    sensor_type: str
+    operator: str  # "lt" | "gt"
+    threshold: float
+    severity: str = "warning"  # "warning" | "critical"
+    message: str  # เช่น "pH ต่ำเกินไป ({value:.1f})"
+    hysteresis: float = 0.0
+    device_id: Optional[str] = None  # ระบุเพื่อ override กฎชื่อเดียวกันเฉพาะบ่อ
+    enabled: bool = True
+    updated_at: datetime = Field(default_factory=now_thai)
+
+    class Settings:
+        name = "water_quality_rules"
+        indexes = [
+            pymongo.IndexModel(
+                [("name", pymongo.ASCENDING), ("device_id", pymongo.ASCENDING)], unique=True
+            ),
+        ]
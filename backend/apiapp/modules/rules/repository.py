@@ -0,0 +1,38 @@
+from typing import List, Optional, Tuple
+from beanie import PydanticObjectId
+from .model import WaterQualityRule
+
+
+class RuleRepository:
+
+    async def list(self) -> List[WaterQualityRule]:
+        return await WaterQualityRule.find_all().sort("name", "device_id").to_list()
+
+    async def get(self, rule_id: str) -> Optional[WaterQualityRule]:
+        if not PydanticObjectId.is_valid(rule_id):
+            return None
+        return await WaterQualityRule.get(PydanticObjectId(rule_id))
+
+    async def create(self, rule: WaterQualityRule) -> WaterQualityRule:
+        return await rule.insert()
+
+    async def save(self, rule: WaterQualityRule) -> WaterQualityRule:
+        return await rule.save()
+
+    async def delete(self, rule: WaterQualityRule):
+        await rule.delete()
+
+    async def count(self) -> int:
+        return await WaterQualityRule.find_all().count()
+
+    async def insert_many(self, rules: List[WaterQualityRule]):
+        await WaterQualityRule.insert_many(rules)
+
+    async def fingerprint(self) -> Tuple[int, Optional[str]]:
+        """(จำนวนกฎ, updated_at ล่าสุด) ใช้เช็คว่ามีการแก้ไขกฎจาก process อื่นหรือไม่"""
+        rows = await WaterQualityRule.get_motor_collection().aggregate([
+            {"$group": {"_id": None, "count": {"$sum": 1}, "updated_at": {"$max": "$updated_at"}}},
+        ]).to_list(length=1)
+        if not rows:
+            return 0, None
+        return rows[0]["count"], str(rows[0]["updated_at"])
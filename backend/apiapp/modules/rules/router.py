@@ -0,0 +1,56 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, status
+
+from apiapp.core.container import container
+from ...core.security import get_current_admin, get_current_user
+from ...modules.user.model import User
+from .schemas import RulePreviewRequest, RuleRequest, RuleResponse
+from .use_case import RuleUseCase
+
+router = APIRouter(prefix="/rules", tags=["Rules"])
+
+get_rule_use_case = container.provider(RuleUseCase)
+
+
+@router.get("", response_model=List[RuleResponse])
+async def list_rules(current_user=Depends(get_current_user), use_case: RuleUseCase = Depends(get_rule_use_case)):
+    """กฎจัดระดับคุณภาพน้ำทั้งหมด (รวม override รายบ่อ)"""
+    return await use_case.list_rules()
+
+
+@router.post("", response_model=RuleResponse, status_code=status.HTTP_201_CREATED)
+async def create_rule(data: RuleRequest, admin: User = Depends(get_current_admin),
+                      use_case: RuleUseCase = Depends(get_rule_use_case)):
+    """เพิ่มกฎ (ระบุ device_id เพื่อ override กฎชื่อเดียวกันเฉพาะบ่อ) มีผลทันที"""
+    return await use_case.create_rule(data)
+
+
+@router.put("/{rule_id}", response_model=RuleResponse)
+async def update_rule(rule_id: str, data: RuleRequest, admin: User = Depends(get_current_admin),
+                      use_case: RuleUseCase = Depends(get_rule_use_case)):
+    """แก้ไขกฎ มีผลทันที"""
+    return await use_case.update_rule(rule_id, data)
+
+
+@router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_rule(rule_id: str, admin: User = Depends(get_current_admin),
+                      use_case: RuleUseCase = Depends(get_rule_use_case)):
+    await use_case.delete_rule(rule_id)
+    return None
+
+
+@router.post("/preview")
+async def preview_rules(data: RulePreviewRequest, current_user=Depends(get_current_user),
+                        use_case: RuleUseCase = Depends(get_rule_use_case)):
+    """
+    ลองใช้กฎใหม่กับข้อมูลย้อนหลังของบ่อ (ไม่บันทึก)
+    เทียบจำนวนแถว Good/Warning/Critical และจำนวนครั้งที่แต่ละกฎทำงาน กับกฎปัจจุบัน
+    """
+    return await use_case.preview(data)
+
+
+@router.post("/reload")
+async def reload_rules(admin: User = Depends(get_current_admin), use_case: RuleUseCase = Depends(get_rule_use_case)):
+    """โหลดกฎจาก DB ใหม่ทันที"""
+    return {"rules": await use_case.reload()}
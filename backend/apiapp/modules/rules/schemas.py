@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, ConfigDict, field_validator
+
+SensorType = Literal["ph", "ph_voltage", "turbidity", "nh3", "temperature", "tds"]
+
+
+class RuleRequest(BaseModel):
+    name: str
+    sensor_type: SensorType
+    operator: Literal["lt", "gt"]
+    threshold: float
+    severity: Literal["warning", "critical"] = "warning"
+    message: str
+    hysteresis: float = 0.0
+    device_id: Optional[str] = None
+    enabled: bool = True
+
+    @field_validator("message")
+    @classmethod
+    def check_message(cls, v: str) -> str:
+        # ข้อความใช้ str.format ได้เฉพาะ {value}
+        try:
+            v.format(value=1.0)
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"message must be a format string using only {{value}}: {e}")
+        return v
+
+    @field_validator("hysteresis")
+    @classmethod
+    def check_hysteresis(cls, v: float) -> float:
+        if v < 0:
+            raise ValueError("hysteresis must be >= 0")
+        return v
+
+
+class RuleResponse(RuleRequest):
+    id: PydanticObjectId
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True, arbitrary_types_allowed=True)
+
+
+class RulePreviewRequest(BaseModel):
+    """กฎที่จะลองใช้ (แทนกฎชื่อ/บ่อเดียวกัน หรือเพิ่มใหม่) เทียบกับกฎปัจจุบันบนข้อมูลย้อนหลัง"""
+    rules: List[RuleRequest]
+    device_id: str
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    step: Optional[float] = None  # วินาทีต่อแถว (ไม่ระบุ = แบ่งช่วงเวลาตามจำนวนแถวสูงสุด)
@@ -0,0 +1,225 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+from pymongo.errors import DuplicateKeyError
+
+from ...core.exceptions import ConflictError, NotFoundError, ValidationError
+from ..reports.model import ANALYSIS_VALUE_FIELDS
+from ..reports.repository import ReportRepository
+from ..sensors.use_case import SensorUseCase
+from .engine import DEFAULT_RULES, STATUS_BY_LEVEL, CompiledRules, RuleEngine
+from .model import WaterQualityRule, now_thai
+from .repository import RuleRepository
+from .schemas import RulePreviewRequest, RuleRequest
+
+# field ของกฎที่ใช้ compile (ไม่รวม id / updated_at)
+RULE_FIELDS = tuple(RuleRequest.model_fields)
+
+
+class RuleUseCase:
+    """
+    จัดการกฎคุณภาพน้ำใน DB และ reload เข้า RuleEngine
+
+    - แก้ไขผ่าน API: reload ทันทีใน process นี้
+    - process อื่น (เช่น ingest ที่รันแยก) เช็ค fingerprint ทุก reload_seconds แล้ว reload เมื่อเปลี่ยน
+    """
+
+    def __init__(
+        self,
+        repo: RuleRepository,
+        engine: RuleEngine,
+        sensors: SensorUseCase,
+        reports: ReportRepository,
+        reload_seconds: float,
+        reclassify_batch_size: int = 5000,
+    ):
+        self.repo = repo
+        self.engine = engine
+        self.sensors = sensors
+        self.reports = reports
+        self.reload_seconds = reload_seconds
+        self.reclassify_batch_size = reclassify_batch_size
+        self._rules: List[dict] = [dict(rule) for rule in DEFAULT_RULES]
+        self._fingerprint: Optional[Tuple[int, Optional[str]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------------------------------------------------------
+    # 🔌 Lifecycle / Hot reload
+    # ---------------------------------------------------------
+    async def start(self):
+        await self.load()
+        self._task = asyncio.create_task(self._watch())
+
+    async def load(self) -> int:
+        """โหลดกฎจาก DB (ครั้งแรกที่ collection ว่าง: ย้ายกฎเดิมที่เคย hard-code ลง DB ก่อน)"""
+        if await self.repo.count() == 0:
+            await self.repo.insert_many([WaterQualityRule(**rule) for rule in DEFAULT_RULES])
+            logger.info(f"🧪 Seeded {len(DEFAULT_RULES)} default water quality rules")
+        return await self.reload()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                if await self.repo.fingerprint() != self._fingerprint:
+                    await self.reload()
+            except Exception as e:
+                logger.error(f"❌ Rule reload failed: {e}")
+
+    async def reload(self) -> int:
+        rules = [rule.model_dump(include=set(RULE_FIELDS)) for rule in await self.repo.list()]
+        fingerprint = await self.repo.fingerprint()
+        self.engine.reload(rules)
+        self._rules = rules
+        self._fingerprint = fingerprint
+        # ผลวิเคราะห์ที่ memo ไว้คำนวณจากกฎเดิม
+        self.sensors.invalidate_analysis()
+        logger.info(f"🧪 Loaded {len(rules)} water quality rules (version {self.engine.version})")
+        return len(rules)
+
+    # ---------------------------------------------------------
+    # ✏️ CRUD
+    # ---------------------------------------------------------
+    async def list_rules(self) -> List[WaterQualityRule]:
+        return await self.repo.list()
+
+    async def create_rule(self, data: RuleRequest) -> WaterQualityRule:
+        try:
+            rule = await self.repo.create(WaterQualityRule(**data.model_dump()))
+        except DuplicateKeyError:
+            raise ConflictError(detail=f"Rule '{data.name}' already exists for device {data.device_id}")
+        await self.reload()
+        return rule
+
+    async def update_rule(self, rule_id: str, data: RuleRequest) -> WaterQualityRule:
+        rule = await self._get(rule_id)
+        for key, value in data.model_dump().items():
+            setattr(rule, key, value)
+        rule.updated_at = now_thai()
+        try:
+            await self.repo.save(rule)
+        except DuplicateKeyError:
+            raise ConflictError(detail=f"Rule '{data.name}' already exists for device {data.device_id}")
+        await self.reload()
+        return rule
+
+    async def delete_rule(self, rule_id: str):
+        await self.repo.delete(await self._get(rule_id))
+        await self.reload()
+
+    async def _get(self, rule_id: str) -> WaterQualityRule:
+        rule = await self.repo.get(rule_id)
+        if not rule:
+            raise NotFoundError(detail="Rule not found")
+        return rule
+
+    # ---------------------------------------------------------
+    # 🔍 Preview: เทียบกฎใหม่กับกฎปัจจุบันบนข้อมูลย้อนหลัง
+    # ---------------------------------------------------------
+    async def preview(self, data: RulePreviewRequest) -> dict:
+        grid, columns, start, end, step, truncated = await self.sensors.aligned_columns(
+            data.device_id, data.start, data.end, data.step
+        )
+        candidate: Dict[tuple, dict] = {(rule["name"], rule.get("device_id")): rule for rule in self._rules}
+        for rule in data.rules:
+            candidate[(rule.name, rule.device_id)] = rule.model_dump()
+
+        started = time.perf_counter()
+        current = self.engine.compiled.evaluate_batch(columns, data.device_id)
+        proposed = CompiledRules(candidate.values()).evaluate_batch(columns, data.device_id)
+        elapsed = time.perf_counter() - started
+
+        names = sorted(set(current["rules"]) | set(proposed["rules"]))
+        return {
+            "device_id": data.device_id,
+            "start": start,
+            "end": end,
+            "step": step,
+            "rows": len(grid),
+            # ข้อมูลดิบในช่วงเกิน history_scan_limit: แถวต้นช่วงอาจไม่มีค่า ควรแบ่งช่วงให้เล็กลง
+            "truncated": truncated,
+            "evaluate_ms": round(elapsed * 1000, 3),
+            "current": self._level_counts(current["level"]),
+            "candidate": self._level_counts(proposed["level"]),
+            "changed_rows": int((current["level"] != proposed["level"]).sum()),
+            "rules": {
+                name: {
+                    "current": int(current["rules"][name].sum()) if name in current["rules"] else 0,
+                    "candidate": int(proposed["rules"][name].sum()) if name in proposed["rules"] else 0,
+                }
+                for name in names
+            },
+        }
+
+    # ---------------------------------------------------------
+    # 🔁 จัดระดับ Snapshot ย้อนหลังใหม่ตามกฎปัจจุบัน
+    # ---------------------------------------------------------
+    async def reclassify(self, start: datetime, end: datetime, dry_run: bool = False) -> dict:
+        """
+        ประเมิน WaterAnalysisLog ในช่วงเวลาใหม่ด้วยกฎปัจจุบัน แล้วเขียนเฉพาะตัวที่ status / issues เปลี่ยน
+        อ่านเป็น batch เรียงตามเวลา ประเมินทั้ง batch ด้วย evaluate_batch และเขียนกลับด้วย bulk_write ครั้งเดียวต่อ batch
+        สถานะ hysteresis ต่อเนื่องข้าม batch เหมือนตอนบันทึกทีละชั่วโมง
+        Snapshot ประเมินด้วย override ของบ่อที่บันทึกไว้ (device_id) และสถานะ hysteresis แยกต่อบ่อ
+        """
+        if start >= end:
+            raise ValidationError("start must be before end", field="start")
+        # ใช้ชุดกฎเดียวตลอด job แม้จะมีการ reload ระหว่างทาง
+        compiled = self.engine.compiled
+        active: Dict[Optional[str], Set[str]] = {}
+        started = time.perf_counter()
+        scanned = changed = updated = 0
+        statuses = {status: 0 for status, _, _ in STATUS_BY_LEVEL.values()}
+
+        async for batch in self.reports.iter_logs(start, end, self.reclassify_batch_size):
+            # แยกตามบ่อ (คงลำดับเวลาในแต่ละบ่อ) ประเมินทีละกลุ่มด้วย override ของบ่อนั้น
+            by_device: Dict[Optional[str], List[dict]] = {}
+            for row in batch:
+                by_device.setdefault(row.get("device_id"), []).append(row)
+            updates = []
+            for device_id, rows in by_device.items():
+                columns = {
+                    field: np.array([row.get(field) for row in rows], dtype=np.float64)
+                    for field in ANALYSIS_VALUE_FIELDS
+                }
+                result = compiled.evaluate_batch(
+                    columns, device_id, active.setdefault(device_id, set()), issues=True
+                )
+                for row, level, issues in zip(rows, result["level"].tolist(), result["issues"]):
+                    status = STATUS_BY_LEVEL[level][0]
+                    statuses[status] += 1
+                    if row.get("status") != status or row.get("issues") != issues:
+                        updates.append((row["_id"], status, issues))
+            scanned += len(batch)
+            changed += len(updates)
+            if updates and not dry_run:
+                updated += await self.reports.update_classifications(updates)
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"🔁 Reclassified {scanned} snapshots ({changed} changed{', dry run' if dry_run else ''}) in {elapsed:.2f}s"
+        )
+        return {
+            "start": start,
+            "end": end,
+            "rules_version": self.engine.version,
+            "dry_run": dry_run,
+            "scanned": scanned,
+            "changed": changed,
+            "updated": updated,
+            "statuses": statuses,
+            "elapsed_seconds": round(elapsed, 3),
+        }
+
+    @staticmethod
+    def _level_counts(level: np.ndarray) -> Dict[str, int]:
+        counts = np.bincount(level, minlength=len(STATUS_BY_LEVEL))
+        return {STATUS_BY_LEVEL[i][0]: int(counts[i]) for i in STATUS_BY_LEVEL}
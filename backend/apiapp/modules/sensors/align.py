@@ -0,0 +1,131 @@
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .downsample import to_epoch_ms
+
+# ---------------------------------------------------------
+# 🧷 รวมหลาย sensor เป็นตารางเดียวด้วย as-of join
+# ---------------------------------------------------------
+# แต่ละ sensor บันทึกแยกกันและผ่าน compression คนละจังหวะ timestamp จึงไม่ตรงกัน
+# ค่า ณ เวลา t ของ sensor = ค่าล่าสุดที่บันทึกก่อนหรือตรงกับ t (as-of / last-known)
+# ใช้ np.searchsorted ต่อ sensor ครั้งเดียวทั้งตาราง ไม่ loop ทีละแถวใน Python
+
+# series ของ 1 sensor = (เวลา ms เรียงจากเก่า -> ใหม่, ค่า)
+Series = Tuple[np.ndarray, np.ndarray]
+
+
+def to_series(rows: List[dict], field: str) -> Series:
+    """แปลง doc (เรียงเวลาแล้ว) เป็น array เวลา ms และค่า"""
+    if not rows:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    times = to_epoch_ms([row["timestamp"] for row in rows])
+    values = np.fromiter((row[field] for row in rows), dtype=np.float64, count=len(rows))
+    return times, values
+
+
+def time_grid(start: datetime, end: datetime, step_seconds: float) -> np.ndarray:
+    """เวลา ms ทุก step วินาทีตั้งแต่ start ถึง end (รวม end ถ้าลงตัว)"""
+    start_ms, end_ms = to_epoch_ms([start, end])
+    return np.arange(start_ms, end_ms + 1, step_seconds * 1000.0)
+
+
+def change_points(series: Dict[str, Series], start: datetime, end: datetime) -> np.ndarray:
+    """ทุกเวลาที่มี sensor ใดเปลี่ยนค่า (union ของ timestamp ในช่วง)"""
+    start_ms, end_ms = to_epoch_ms([start, end])
+    times = np.unique(np.concatenate([t for t, _ in series.values()] + [np.array([start_ms])]))
+    return times[(times >= start_ms) & (times <= end_ms)]
+
+
+def asof(series: Series, grid: np.ndarray, max_age_ms: Optional[float] = None) -> np.ndarray:
+    """ค่า as-of ของ series ที่ทุกเวลาใน grid (NaN ถ้ายังไม่มีค่าหรือค่าเก่าเกิน max_age_ms)"""
+    times, values = series
+    result = np.full(len(grid), np.nan)
+    if len(times) == 0:
+        return result
+    index = np.searchsorted(times, grid, side="right") - 1
+    known = index >= 0
+    if max_age_ms is not None:
+        known &= grid - times[np.maximum(index, 0)] <= max_age_ms
+    result[known] = values[index[known]]
+    return result
+
+
+def correlation(columns: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Pearson correlation ทีละคู่ ใช้เฉพาะแถวที่ทั้งสอง sensor มีค่า"""
+    names = list(columns)
+    result: Dict[str, Dict[str, Optional[float]]] = {name: {} for name in names}
+    for i, a in enumerate(names):
+        result[a][a] = 1.0
+        for b in names[i + 1:]:
+            x, y = columns[a], columns[b]
+            mask = ~(np.isnan(x) | np.isnan(y))
+            r = None
+            if mask.sum() >= 3 and np.std(x[mask]) > 0 and np.std(y[mask]) > 0:
+                r = float(np.corrcoef(x[mask], y[mask])[0, 1])
+            result[a][b] = result[b][a] = r
+    return result
+
+
+def trend(grid: np.ndarray, values: np.ndarray) -> dict:
+    """ค่าสรุป + ความชัน (ต่อชั่วโมง) จาก least squares ของแถวที่มีค่า"""
+    mask = ~np.isnan(values)
+    count = int(mask.sum())
+    if not count:
+        return {"count": 0, "mean": None, "min": None, "max": None, "slope_per_hour": None}
+    x, y = grid[mask] / 3_600_000.0, values[mask]
+    slope = float(np.polyfit(x - x[0], y, 1)[0]) if count >= 2 and x[-1] > x[0] else None
+    return {
+        "count": count,
+        "mean": float(y.mean()),
+        "min": float(y.min()),
+        "max": float(y.max()),
+        "slope_per_hour": slope,
+    }
+
+
+def to_json_column(values: np.ndarray) -> List[Optional[float]]:
+    """NaN -> None (JSON ไม่มี NaN)"""
+    return [None if math.isnan(v) else v for v in values.tolist()]
+
+
+def to_datetimes(grid: np.ndarray) -> List[datetime]:
+    return grid.astype(np.int64).astype("datetime64[ms]").tolist()
+
+
+def build_frame(
+    series: Dict[str, Series],
+    start: datetime,
+    end: datetime,
+    step_seconds: Optional[float] = None,
+    max_age_seconds: Optional[float] = None,
+    max_rows: int = 10000,
+    summary: bool = True,
+) -> dict:
+    """
+    ตารางแบบ columnar: timestamps + ค่า as-of ของทุก sensor ต่อแถว
+    step_seconds=None ใช้ทุกจุดที่มี sensor เปลี่ยนค่า (change points) แทน grid คงที่
+    """
+    if step_seconds:
+        if (end - start).total_seconds() / step_seconds + 1 > max_rows:
+            raise ValueError(f"Range / step exceeds {max_rows} rows, use a larger step")
+        grid = time_grid(start, end, step_seconds)
+    else:
+        grid = change_points(series, start, end)
+        if len(grid) > max_rows:
+            raise ValueError(f"{len(grid)} change points exceed {max_rows} rows, use step instead")
+
+    max_age_ms = max_age_seconds * 1000.0 if max_age_seconds else None
+    columns = {name: asof(s, grid, max_age_ms) for name, s in series.items()}
+    frame = {
+        "timestamps": to_datetimes(grid),
+        "columns": {name: to_json_column(values) for name, values in columns.items()},
+    }
+    if summary:
+        frame["summary"] = {
+            "correlation": correlation(columns),
+            "trend": {name: trend(grid, values) for name, values in columns.items()},
+        }
+    return frame
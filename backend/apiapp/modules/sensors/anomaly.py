@@ -0,0 +1,129 @@
+import math
+from typing import Dict, List, NamedTuple, Optional
+
+# ---------------------------------------------------------
+# 🚨 ตรวจจับค่าผิดปกติแบบ streaming (ทุก reading ที่รับเข้ามา)
+# ---------------------------------------------------------
+# สถานะต่อ (device_id, sensor_type) มีขนาดคงที่ (AnomalyState) เก็บไว้ใน DeadbandState เดียวกัน
+# ทุก reading ใช้เวลา O(1): เทียบกับ EWMA mean/variance แล้วอัปเดต ไม่ต้องย้อนดูประวัติ
+#
+# - spike: |ค่า - EWMA mean| / EWMA stddev เกิน z_threshold (หลังเก็บครบ warmup sample)
+# - rate: เปลี่ยนจาก reading ก่อนหน้ามากกว่า max_rate ต่อนาที (+ เผื่อ noise 2 stddev)
+# - flatline: ค่าไม่เปลี่ยนเลย (±flat_epsilon) นานเกิน flatline_seconds -> sensor อาจค้าง (แจ้งครั้งเดียวต่อช่วง)
+
+ANOMALY_KINDS = ("spike", "rate", "flatline")
+
+# อัตราเปลี่ยนสูงสุดต่อนาทีที่ยังถือว่าเป็นไปได้ทางกายภาพ (override ด้วย SENSOR_ANOMALY_MAX_RATES)
+DEFAULT_MAX_RATES = {
+    "ph": 0.5, "ph_voltage": 0.2, "turbidity": 2.0, "nh3": 0.5, "temperature": 2.0, "tds": 100.0,
+}
+
+
+class AnomalyConfig(NamedTuple):
+    alpha: float  # น้ำหนักของ reading ใหม่ใน EWMA (ยิ่งมากยิ่งตามค่าใหม่เร็ว)
+    z_threshold: float
+    warmup: int  # จำนวน sample ก่อนเริ่มตรวจ spike
+    min_std: float  # stddev ต่ำสุดที่ใช้คิด z (กันค่าที่นิ่งมากแล้วขยับ 1 step กลายเป็น spike)
+    max_rate: Optional[float]  # ต่อนาที (None = ไม่ตรวจ)
+    flatline_seconds: float  # 0 = ไม่ตรวจ
+    flat_epsilon: float = 0.0
+
+
+class AnomalyState:
+    """สถานะของ detector ต่อ 1 คู่ (device_id, sensor_type)"""
+
+    __slots__ = ("count", "mean", "var", "last_value", "last_time", "flat_value", "flat_since", "flat_flagged",
+                 "last_alert_time")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.last_value: Optional[float] = None
+        self.last_time = 0.0
+        self.flat_value: Optional[float] = None
+        self.flat_since = 0.0
+        self.flat_flagged = False
+        self.last_alert_time = 0.0
+
+
+class AnomalyDetector:
+    def __init__(self, configs: Dict[str, AnomalyConfig], alert_cooldown: float = 900.0):
+        self.configs = configs
+        self.alert_cooldown = alert_cooldown
+
+    def check(self, state: AnomalyState, sensor_type: str, t: float, value: float) -> List[str]:
+        """ชนิดความผิดปกติของ reading นี้ (ว่าง = ปกติ) แล้วอัปเดตสถานะด้วย reading นี้"""
+        config = self.configs.get(sensor_type)
+        if config is None:
+            return []
+        flags = []
+
+        # 1. Spike: เทียบกับ EWMA ก่อนรวม reading นี้
+        diff = value - state.mean
+        std = max(math.sqrt(state.var), config.min_std)
+        if state.count >= config.warmup and abs(diff) / std > config.z_threshold:
+            flags.append("spike")
+
+        # 2. Rate of change จาก reading ก่อนหน้า (reading ที่มาช้ากว่า/ซ้ำเวลาไม่นับ)
+        # เผื่อ noise ของ sensor (2 stddev) ไม่อย่างนั้น sample ถี่ๆ จะเกินอัตราจาก noise อย่างเดียว
+        dt = t - state.last_time
+        if config.max_rate is not None and state.last_value is not None and dt > 0:
+            if abs(value - state.last_value) > config.max_rate * dt / 60 + 2 * std:
+                flags.append("rate")
+
+        # 3. Flatline: ค่าเดิมต่อเนื่องนานเกินกำหนด
+        if state.flat_value is not None and abs(value - state.flat_value) <= config.flat_epsilon:
+            if config.flatline_seconds and not state.flat_flagged and t - state.flat_since >= config.flatline_seconds:
+                state.flat_flagged = True
+                flags.append("flatline")
+        else:
+            state.flat_value = value
+            state.flat_since = t
+            state.flat_flagged = False
+
+        # อัปเดต EWMA mean / variance (incremental, ไม่เก็บประวัติ)
+        if state.count == 0:
+            state.mean = value
+            state.var = 0.0
+        else:
+            increment = config.alpha * diff
+            state.mean += increment
+            state.var = (1 - config.alpha) * (state.var + diff * increment)
+        state.count += 1
+        if dt > 0 or state.last_value is None:
+            state.last_value = value
+            state.last_time = t
+        return flags
+
+    def should_alert(self, state: AnomalyState, t: float) -> bool:
+        """แจ้งเตือนได้ไม่เกิน 1 ครั้งต่อ alert_cooldown ต่อ (device_id, sensor_type)"""
+        if t - state.last_alert_time < self.alert_cooldown:
+            return False
+        state.last_alert_time = t
+        return True
+
+
+def build_detector(
+    alpha: float,
+    z_threshold: float,
+    warmup: int,
+    flatline_seconds: float,
+    min_stds: Dict[str, float],
+    max_rates: Dict[str, float],
+    alert_cooldown: float,
+) -> AnomalyDetector:
+    """สร้าง detector ต่อ sensor_type (min_std ใช้ความละเอียดของ sensor, max_rate = ค่า default + override)"""
+    rates = {**DEFAULT_MAX_RATES, **max_rates}
+    configs = {
+        sensor_type: AnomalyConfig(
+            alpha=alpha,
+            z_threshold=z_threshold,
+            warmup=warmup,
+            min_std=min_std,
+            max_rate=rates.get(sensor_type),
+            flatline_seconds=flatline_seconds,
+        )
+        for sensor_type, min_std in min_stds.items()
+    }
+    return AnomalyDetector(configs, alert_cooldown)
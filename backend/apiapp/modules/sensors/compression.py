@@ -0,0 +1,167 @@
+import math
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .deadband import DeadbandState
+
+Point = Tuple[datetime, float]
+
+
+class Decision(NamedTuple):
+    """ผลการตัดสินใจของ policy ต่อ 1 reading"""
+
+    points: List[Point]  # จุดที่ต้องบันทึกลง DB (SDT อาจเป็นจุดก่อนหน้าที่ถือไว้)
+    reason: str  # first | change | door | heartbeat | forced | suppressed
+
+
+class CompressionPolicy:
+    """
+    Policy สำหรับเลือกว่า reading ไหนต้องบันทึกลง DB
+    ทำงานกับ DeadbandState ของ (device_id, sensor_type) นั้นๆ
+    """
+
+    name = "base"
+
+    def __init__(self, error_bound: float, heartbeat_seconds: float):
+        self.error_bound = error_bound
+        self.heartbeat_seconds = heartbeat_seconds
+
+    def offer(self, state: DeadbandState, timestamp: datetime, t: float, value: float) -> Decision:
+        raise NotImplementedError
+
+    def force(self, state: DeadbandState, timestamp: datetime, t: float, value: float) -> Decision:
+        """บังคับบันทึก reading นี้ (พร้อมจุดที่ถือไว้ ถ้ามี) แล้วเริ่มนับใหม่จากจุดนี้"""
+        points = self._take_pending(state)
+        points.append((timestamp, value))
+        self._archive(state, t, value)
+        return Decision(points, "forced")
+
+    def flush(self, state: DeadbandState) -> List[Point]:
+        """คืนจุดที่ยังถือไว้ (เช่นตอน shutdown) และบันทึกเป็นจุดอ้างอิงล่าสุด"""
+        if state.pending_ts is None:
+            return []
+        point = (state.pending_ts, state.pending_value)
+        self._archive(state, state.pending_time, state.pending_value)
+        return [point]
+
+    # --- helpers ---
+    def _archive(self, state: DeadbandState, t: float, value: float):
+        state.last_value = value
+        state.last_time = t
+        state.pending_ts = None
+        state.pending_value = None
+        state.pending_time = 0.0
+        state.slope_low = -math.inf
+        state.slope_high = math.inf
+
+    def _take_pending(self, state: DeadbandState) -> List[Point]:
+        if state.pending_ts is None:
+            return []
+        return [(state.pending_ts, state.pending_value)]
+
+
+class DeadbandPolicy(CompressionPolicy):
+    """
+    แบบเดิม: บันทึกเมื่อค่าเปลี่ยนเกิน error_bound จากค่าที่บันทึกล่าสุด
+    หรือเมื่อไม่ได้บันทึกนานเกิน heartbeat
+    """
+
+    name = "deadband"
+
+    def offer(self, state, timestamp, t, value):
+        if state.last_value is None:
+            reason = "first"
+        elif abs(value - state.last_value) >= self.error_bound:
+            reason = "change"
+        elif (t - state.last_time) > self.heartbeat_seconds:
+            reason = "heartbeat"
+        else:
+            return Decision([], "suppressed")
+
+        self._archive(state, t, value)
+        return Decision([(timestamp, value)], reason)
+
+
+class SwingingDoorPolicy(CompressionPolicy):
+    """
+    Swinging-Door Trending (SDT)
+
+    เก็บเฉพาะจุดหัก (archive) ของเส้น โดยรับประกันว่าการลากเส้นตรงระหว่างจุดที่บันทึก 2 จุดติดกัน
+    จะห่างจากทุก reading ที่ถูกตัดทิ้งระหว่างนั้นไม่เกิน error_bound
+
+    - A = จุดที่บันทึกล่าสุด (last_value/last_time), P = reading ล่าสุดที่ยังถือไว้ (pending)
+    - [slope_low, slope_high] = ช่วงความชันจาก A ที่ยังผ่านแถบ ±error_bound ของทุกจุดระหว่างทาง ("ประตู")
+    - reading ใหม่ X: ถ้าความชัน A→X ยังอยู่ในประตู X จะกลายเป็น P ตัวใหม่ (ยังไม่บันทึก)
+      ถ้าหลุดประตู จะบันทึก P เป็น A ตัวใหม่ แล้วเริ่มประตูใหม่จาก P
+    - reading ที่บันทึกจึงช้ากว่าจริง 1 sample (ค่าล่าสุดยังอยู่ใน pending)
+    """
+
+    name = "sdt"
+
+    def offer(self, state, timestamp, t, value):
+        if state.last_value is None:
+            self._archive(state, t, value)
+            return Decision([(timestamp, value)], "first")
+
+        dt = t - state.last_time
+        if dt <= 0:
+            # reading มาช้ากว่า/ซ้ำกับจุดที่บันทึกแล้ว: เก็บเฉพาะเมื่อต่างเกิน error_bound (ไม่แตะสถานะประตู)
+            if abs(value - state.last_value) >= self.error_bound:
+                return Decision([(timestamp, value)], "change")
+            return Decision([], "suppressed")
+
+        if dt > self.heartbeat_seconds:
+            points = self._take_pending(state)
+            points.append((timestamp, value))
+            self._archive(state, t, value)
+            return Decision(points, "heartbeat")
+
+        slope = (value - state.last_value) / dt
+        if state.slope_low <= slope <= state.slope_high:
+            self._hold(state, timestamp, t, value, dt)
+            return Decision([], "suppressed")
+
+        # ประตูปิด: บันทึกจุดที่ถือไว้เป็น A ตัวใหม่ (มี pending เสมอ เพราะประตูเริ่มต้นเปิดกว้างไม่จำกัด)
+        points = self._take_pending(state)
+        self._archive(state, state.pending_time, points[0][1])
+        dt = t - state.last_time
+        if dt <= 0:
+            # X มีเวลาเดียวกับจุดที่เพิ่งบันทึก: เก็บ X ด้วยถ้าต่างเกิน error_bound
+            if abs(value - state.last_value) >= self.error_bound:
+                points.append((timestamp, value))
+                self._archive(state, t, value)
+            return Decision(points, "door")
+        self._hold(state, timestamp, t, value, dt)
+        return Decision(points, "door")
+
+    def _hold(self, state: DeadbandState, timestamp: datetime, t: float, value: float, dt: float):
+        """ถือ X ไว้เป็น pending แล้วแคบประตูด้วยแถบ ±error_bound ของ X"""
+        state.slope_high = min(state.slope_high, (value + self.error_bound - state.last_value) / dt)
+        state.slope_low = max(state.slope_low, (value - self.error_bound - state.last_value) / dt)
+        state.pending_ts = timestamp
+        state.pending_time = t
+        state.pending_value = value
+
+
+POLICIES = {
+    DeadbandPolicy.name: DeadbandPolicy,
+    SwingingDoorPolicy.name: SwingingDoorPolicy,
+}
+
+
+def build_policies(
+    default: str,
+    overrides: Dict[str, str],
+    error_bounds: Dict[str, float],
+    heartbeat_seconds: float,
+    sensor_types: Optional[List[str]] = None,
+) -> Dict[str, CompressionPolicy]:
+    """สร้าง policy ต่อ sensor_type (ค่า default + override รายตัว)"""
+    sensor_types = sensor_types or list(error_bounds)
+    policies = {}
+    for sensor_type in sensor_types:
+        name = overrides.get(sensor_type, default)
+        if name not in POLICIES:
+            raise ValueError(f"Unknown compression policy '{name}' for {sensor_type}")
+        policies[sensor_type] = POLICIES[name](error_bounds[sensor_type], heartbeat_seconds)
+    return policies
@@ -0,0 +1,103 @@
+import calendar
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+# เวลาใน DB เป็นเวลาไทยแบบ Naive (UTC+7) ดู now_thai() ใน model.py
+THAI_OFFSET_SECONDS = 7 * 3600
+
+
+def to_epoch(ts: datetime) -> float:
+    """แปลง timestamp ของ reading เป็น epoch seconds (Naive = เวลาไทย)"""
+    if ts.tzinfo is not None:
+        return ts.timestamp()
+    return calendar.timegm(ts.timetuple()) - THAI_OFFSET_SECONDS + ts.microsecond / 1e6
+
+
+def from_epoch(t: float) -> datetime:
+    """epoch seconds -> เวลาไทยแบบ Naive (กลับด้านของ to_epoch)"""
+    return datetime(1970, 1, 1) + timedelta(seconds=t + THAI_OFFSET_SECONDS)
+
+
+class DeadbandState:
+    """สถานะ Deadband ของ 1 คู่ (device_id, sensor_type)"""
+
+    __slots__ = (
+        "last_value", "last_time", "received", "saved",
+        "pending_ts", "pending_time", "pending_value", "slope_low", "slope_high", "anomaly",
+    )
+
+    def __init__(self):
+        self.last_value: Optional[float] = None  # ค่าล่าสุดที่บันทึกลง DB
+        self.last_time: float = 0.0  # epoch ของค่าล่าสุดที่บันทึก (ใช้ทำ Heartbeat)
+        self.received = 0
+        self.saved = 0
+        # ใช้กับ Swinging-Door (compression.py): reading ที่ถือไว้ยังไม่บันทึก + ช่วงความชันของประตู
+        self.pending_ts: Optional[datetime] = None
+        self.pending_time: float = 0.0
+        self.pending_value: Optional[float] = None
+        self.slope_low = -math.inf
+        self.slope_high = math.inf
+        # สถานะของ anomaly detector (anomaly.py) สร้างเมื่อเปิดใช้เท่านั้น
+        self.anomaly = None
+
+
+class DeadbandStore:
+    """
+    เก็บสถานะ Deadband แยกตาม (device_id, sensor_type)
+    จำกัดจำนวน entry สูงสุด (LRU) กันหน่วยความจำโตไม่จำกัดเมื่อมี device ใหม่เข้ามาเรื่อยๆ
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._states: "OrderedDict[Tuple[str, str], DeadbandState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, device_id: str, sensor_type: str) -> DeadbandState:
+        key = (device_id, sensor_type)
+        state = self._states.get(key)
+        if state is None:
+            state = DeadbandState()
+            self._states[key] = state
+            if len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(key)
+        return state
+
+    def seed(self, device_id: str, sensor_type: str, value: float, timestamp: datetime):
+        """Warm start จากค่าล่าสุดใน DB (ไม่นับเป็น received/saved)"""
+        state = self.get(device_id, sensor_type)
+        state.last_value = value
+        state.last_time = to_epoch(timestamp)
+        state.pending_ts = None
+        state.pending_value = None
+        state.slope_low = -math.inf
+        state.slope_high = math.inf
+
+    def items(self):
+        return self._states.items()
+
+    def clear(self):
+        self._states.clear()
+
+    def compression_stats(self) -> Dict[str, dict]:
+        """อัตราการบีบอัดต่อ device: received / saved (ยิ่งสูงยิ่งประหยัดพื้นที่)"""
+        devices: Dict[str, dict] = {}
+        for (device_id, sensor_type), state in self._states.items():
+            device = devices.setdefault(device_id, {"received": 0, "saved": 0, "sensors": {}})
+            device["received"] += state.received
+            device["saved"] += state.saved
+            device["sensors"][sensor_type] = {
+                "received": state.received,
+                "saved": state.saved,
+                "compression_ratio": round(state.received / state.saved, 2) if state.saved else None,
+            }
+        for device in devices.values():
+            device["compression_ratio"] = (
+                round(device["received"] / device["saved"], 2) if device["saved"] else None
+            )
+        return devices
@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import List, Sequence
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 📉 Largest-Triangle-Three-Buckets (LTTB)
+# ---------------------------------------------------------
+# ลดจำนวนจุดของกราฟเหลือ N จุดโดยรักษารูปร่าง (ยอด/หุบ) ของเส้นไว้
+# - จุดแรกและจุดสุดท้ายถูกเก็บเสมอ จุดที่เหลือแบ่งเป็น N-2 bucket
+# - ในแต่ละ bucket เลือกจุดที่ทำสามเหลี่ยมพื้นที่มากที่สุดกับ
+#   จุดที่เลือกใน bucket ก่อนหน้า และค่าเฉลี่ยของ bucket ถัดไป
+# ค่าเฉลี่ยทุก bucket คำนวณครั้งเดียวด้วย cumsum ส่วนพื้นที่คำนวณทั้ง bucket ด้วย numpy
+# เหลือ loop ใน Python แค่ N รอบ (ไม่ใช่ตามจำนวนจุดดิบ)
+
+
+def to_epoch_ms(timestamps: Sequence[datetime]) -> np.ndarray:
+    """datetime -> มิลลิวินาที (float64) สำหรับใช้เป็นแกน x"""
+    return np.asarray(timestamps, dtype="datetime64[ms]").astype(np.int64).astype(np.float64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """index ของจุดที่เลือก (เรียงตาม x) ไม่เกิน n จุด"""
+    length = len(x)
+    if n >= length or length <= 2:
+        return np.arange(length)
+    if n < 3:
+        return np.array([0, length - 1])
+
+    # ขอบ bucket: จุด 1..length-2 แบ่งเป็น n-2 ช่วงเท่าๆ กัน
+    every = (length - 2) / (n - 2)
+    edges = (np.arange(n - 1) * every).astype(np.intp) + 1
+    edges[-1] = length - 1
+
+    # ค่าเฉลี่ยของ bucket ถัดไป (bucket สุดท้ายใช้จุดสุดท้ายแทน)
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    lo, hi = edges[1:-1], edges[2:]
+    counts = hi - lo
+    avg_x = np.append((cum_x[hi] - cum_x[lo]) / counts, x[-1])
+    avg_y = np.append((cum_y[hi] - cum_y[lo]) / counts, y[-1])
+
+    selected = np.empty(n, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = length - 1
+    a = 0
+    for i in range(n - 2):
+        start, stop = edges[i], edges[i + 1]
+        # |cross product| = 2 * พื้นที่สามเหลี่ยม (ไม่ต้องหาร 2 เพราะเทียบกันเอง)
+        area = np.abs(
+            (x[a] - avg_x[i]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y[i] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(docs: List[dict], field: str, points: int) -> List[dict]:
+    """เลือก doc (เรียงเวลาเก่า -> ใหม่) ให้เหลือไม่เกิน points ตัวด้วย LTTB"""
+    if len(docs) <= points:
+        return docs
+    x = to_epoch_ms([doc["timestamp"] for doc in docs])
+    y = np.fromiter((doc[field] for doc in docs), dtype=np.float64, count=len(docs))
+    return [docs[i] for i in lttb_indices(x, y, points)]
@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import io
+from typing import AsyncIterator, List, Tuple
+
+# ---------------------------------------------------------
+# 📤 Export ข้อมูล sensor เป็น CSV / Parquet แบบ streaming
+# ---------------------------------------------------------
+# รับ batch (list ของ dict จาก SensorRepository.iter_range) ทีละก้อน แล้วส่ง bytes ออกทันที
+# หน่วยความจำจึงคงที่ประมาณ 1 batch ไม่ขึ้นกับความยาวช่วงเวลา
+
+EXPORT_COLUMNS = ("sensor_type", "device_id", "timestamp", "value")
+
+# batch = (sensor_type, rows) โดย rows มี device_id, timestamp, value
+Batch = Tuple[str, List[dict]]
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def csv_chunks(batches: AsyncIterator[Batch]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    async for sensor_type, rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (sensor_type, row["device_id"], row["timestamp"].isoformat(), row["value"]) for row in rows
+        )
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """file-like ที่ ParquetWriter เขียนลง แล้วให้ generator ดึง bytes ที่เขียนแล้วออกไปส่งทีละก้อน"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def parquet_chunks(batches: AsyncIterator[Batch]) -> AsyncIterator[bytes]:
+    """1 batch = 1 row group (ต้องมี pyarrow: poetry install -E parquet)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("sensor_type", pa.string()),
+        ("device_id", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("value", pa.float64()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def write_batch(sensor_type: str, rows: List[dict]):
+        table = pa.table(
+            {
+                "sensor_type": [sensor_type] * len(rows),
+                "device_id": [row["device_id"] for row in rows],
+                "timestamp": [row["timestamp"] for row in rows],
+                "value": [row["value"] for row in rows],
+            },
+            schema=schema,
+        )
+        writer.write_table(table)
+
+    try:
+        async for sensor_type, rows in batches:
+            # แปลง/บีบอัดใน thread แยก ไม่บล็อก event loop
+            await asyncio.to_thread(write_batch, sensor_type, rows)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.take()
@@ -0,0 +1,119 @@
+import heapq
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+# sample ใน window = (timestamp, value)
+Sample = Tuple[datetime, float]
+# record ที่บันทึกลง DB = (timestamp, _id, value) เรียงแบบเดียวกับ index (timestamp, _id)
+SavedSample = Tuple[datetime, ObjectId, float]
+# ผลลัพธ์ที่คืนให้ use case = (device_id, timestamp, value)
+Reading = Tuple[str, datetime, float]
+# ผลลัพธ์ของ history = (device_id, timestamp, _id, value)
+SavedReading = Tuple[str, datetime, ObjectId, float]
+
+
+class HotWindow:
+    """
+    Ring buffer ในหน่วยความจำของ reading ล่าสุดต่อ (device_id, sensor_type)
+
+    - latest: อัปเดตทุก reading ที่รับเข้ามา (ทั้งที่บันทึกลง DB และที่ถูก compression ตัดทิ้ง)
+      ทำให้ค่า latest บน dashboard ไม่ค้างอยู่ที่จุดที่บันทึกล่าสุด
+    - history: เฉพาะ record ที่บันทึกลง DB (add_saved) พร้อม _id หน้าแรกจึงเหมือนหน้าที่อ่านจาก DB
+      และ cursor ของหน้าถัดไปต่อกันพอดี
+    - เก็บ size sample ต่อ series และไม่เกิน max_series series (LRU)
+      หน่วยความจำสูงสุดจึงประมาณ size * max_series sample
+    - คืน None เมื่อ window ตอบไม่ได้ครบ (miss) ให้ use case ไปถาม MongoDB แทน
+    """
+
+    def __init__(self, size: int, max_series: int):
+        self.size = size
+        self.max_series = max_series
+        self._series: "OrderedDict[Tuple[str, str], Deque[Sample]]" = OrderedDict()
+        self._devices: Dict[str, Set[str]] = {}  # sensor_type -> device_id ที่มี series อยู่
+        self._latest: Dict[str, Reading] = {}  # sensor_type -> reading ใหม่สุดของทุก device
+        self._saved: Dict[Tuple[str, str], Deque[SavedSample]] = {}
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def add(self, device_id: str, sensor_type: str, value: float, timestamp: datetime):
+        key = (device_id, sensor_type)
+        series = self._series.get(key)
+        if series is None:
+            series = deque(maxlen=self.size)
+            self._series[key] = series
+            self._devices.setdefault(sensor_type, set()).add(device_id)
+            if len(self._series) > self.max_series:
+                (old_device, old_sensor), _ = self._series.popitem(last=False)
+                self._devices[old_sensor].discard(old_device)
+                self._saved.pop((old_device, old_sensor), None)
+        else:
+            self._series.move_to_end(key)
+        series.append((timestamp, value))
+
+        latest = self._latest.get(sensor_type)
+        if latest is None or timestamp >= latest[1]:
+            self._latest[sensor_type] = (device_id, timestamp, value)
+
+    def add_saved(self, device_id: str, sensor_type: str, record_id: ObjectId, value: float, timestamp: datetime):
+        """record ที่ส่งไปบันทึกลง DB แล้ว (เรียกหลัง add ของ reading เดียวกัน series จึงมีอยู่แล้ว)"""
+        key = (device_id, sensor_type)
+        if key not in self._series:
+            return
+        saved = self._saved.get(key)
+        if saved is None:
+            saved = self._saved[key] = deque(maxlen=self.size)
+        saved.append((timestamp, record_id, value))
+
+    def latest(self, sensor_type: str, device_id: Optional[str] = None) -> Optional[Reading]:
+        if device_id is None:
+            return self._latest.get(sensor_type)
+        series = self._series.get((device_id, sensor_type))
+        if not series:
+            return None
+        timestamp, value = series[-1]
+        return device_id, timestamp, value
+
+    def history(self, sensor_type: str, limit: int, device_id: Optional[str] = None) -> Optional[List[SavedReading]]:
+        """
+        record ที่บันทึกแล้วล่าสุด limit ตัว เรียง (timestamp, _id) ใหม่ -> เก่าเหมือน DB
+        หรือ None ถ้า window มีไม่พอ
+        """
+        if limit <= 0 or limit > self.size:
+            return None
+
+        # ไม่กรอง device = รวมทุก device ของ sensor นี้ (เหมือน query เดิม)
+        devices = [device_id] if device_id is not None else self._devices.get(sensor_type, ())
+        series = [(device, self._saved[(device, sensor_type)])
+                  for device in devices if (device, sensor_type) in self._saved]
+        newest = heapq.nlargest(
+            limit,
+            ((ts, record_id, device, value) for device, saved in series for ts, record_id, value in saved),
+            key=lambda item: (item[0], item[1]),
+        )
+        if len(newest) < limit:
+            return None
+        # series ที่เต็มแล้วอาจทิ้ง record ที่ใหม่กว่าจุดตัดไปแล้ว -> ตอบไม่ได้ครบ
+        cutoff = newest[-1][:2]
+        for _, saved in series:
+            if len(saved) == self.size and saved[0][:2] > cutoff:
+                return None
+        return [(device, ts, record_id, value) for ts, record_id, device, value in newest]
+
+    def clear(self):
+        self._series.clear()
+        self._devices.clear()
+        self._latest.clear()
+        self._saved.clear()
+
+    def stats(self) -> dict:
+        return {
+            "series": len(self._series),
+            "samples": sum(len(series) for series in self._series.values()),
+            "saved_samples": sum(len(saved) for saved in self._saved.values()),
+            "size": self.size,
+            "max_series": self.max_series,
+        }
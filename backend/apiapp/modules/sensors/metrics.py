@@ -0,0 +1,121 @@
+from typing import Set
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+
+# ---------------------------------------------------------
+# 📈 Prometheus metrics ของ ingest path (เปิดดูที่ GET /metrics)
+# ---------------------------------------------------------
+
+# bucket ละเอียดช่วง µs-ms สำหรับงาน CPU (validate/decide) และยาวถึงหลายวินาทีสำหรับ insert
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+INSERT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# device_id ที่เกิน max_devices ใช้ label นี้ร่วมกัน
+OTHER_DEVICE = "other"
+
+
+class DeviceLabels:
+    """
+    แปลง device_id เป็นค่า label ของ metric โดยจำกัดจำนวน series (device ใหม่เข้ามาได้ไม่จำกัด)
+
+    device max_devices ตัวแรกที่เจอได้ label ของตัวเองตลอดอายุ process ที่เกินรวมเป็น "other"
+    (ไม่ใช้ LRU แบบ DeadbandStore: ลบ series ของ counter ที่ยังมีคนอ่านอยู่ทำให้ค่ากระโดดและสลับ label ไปมา)
+    """
+
+    def __init__(self, max_devices: int):
+        self.max_devices = max_devices
+        self._known: Set[str] = set()
+
+    def __call__(self, device_id: str) -> str:
+        if device_id in self._known:
+            return device_id
+        if len(self._known) < self.max_devices:
+            self._known.add(device_id)
+            return device_id
+        return OTHER_DEVICE
+
+
+# ตั้งค่าจาก SENSOR_METRICS_MAX_DEVICES ใน init_container
+device_label = DeviceLabels(100)
+
+READINGS_RECEIVED = Counter(
+    "aquasense_sensor_readings_received_total",
+    "Sensor readings received by the ingest pipeline",
+    ["device_id", "sensor_type"],
+)
+READINGS_SAVED = Counter(
+    "aquasense_sensor_readings_saved_total",
+    "Sensor points stored, by compression reason (first/change/door/heartbeat/forced/shutdown)",
+    ["device_id", "sensor_type", "reason"],
+)
+READINGS_SUPPRESSED = Counter(
+    "aquasense_sensor_readings_suppressed_total",
+    "Sensor readings dropped by the compression policy",
+    ["device_id", "sensor_type"],
+)
+
+VALIDATE_SECONDS = Histogram(
+    "aquasense_sensor_validate_seconds",
+    "Time spent validating an ingest payload",
+    ["source"],
+    buckets=FAST_BUCKETS,
+)
+DECIDE_SECONDS = Histogram(
+    "aquasense_sensor_decide_seconds",
+    "Time spent in the compression policy per reading",
+    ["sensor_type"],
+    buckets=FAST_BUCKETS,
+)
+INSERT_SECONDS = Histogram(
+    "aquasense_sensor_insert_seconds",
+    "MongoDB insert_many latency per collection",
+    ["sensor_type"],
+    buckets=INSERT_BUCKETS,
+)
+
+HOT_WINDOW_LOOKUPS = Counter(
+    "aquasense_sensor_hot_window_lookups_total",
+    "Latest/history lookups answered from the in-memory hot window (hit) or MongoDB (miss)",
+    ["kind", "result"],
+)
+
+ANALYSIS_LOOKUPS = Counter(
+    "aquasense_sensor_analysis_lookups_total",
+    "Water-quality analysis requests served from the memo (hit), by joining an in-flight run (joined) or computed (miss)",
+    ["result"],
+)
+
+ANOMALIES = Counter(
+    "aquasense_sensor_anomalies_total",
+    "Readings flagged by the streaming anomaly detector, by kind (spike/rate/flatline)",
+    ["device_id", "sensor_type", "kind"],
+)
+
+
+class WriteBufferCollector(Collector):
+    """อ่านค่าจาก SensorWriteBuffer.stats() ตอน scrape (ไม่ต้องอัปเดต gauge ใน hot path)"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def collect(self):
+        stats = self.buffer.stats()
+        for key in ("pending_docs", "pending_lag_seconds", "last_flush_size",
+                    "last_flush_seconds", "last_flush_lag_seconds", "spill_depth"):
+            yield GaugeMetricFamily(f"aquasense_sensor_buffer_{key}", f"Sensor write buffer {key}", value=stats[key])
+        for key in ("flushes", "flushed_docs", "failed_flushes", "spilled_docs", "replayed_docs"):
+            yield CounterMetricFamily(f"aquasense_sensor_buffer_{key}", f"Sensor write buffer {key}", value=stats[key])
+
+
+_buffer_collector = None
+
+
+def register_buffer_collector(buffer):
+    """ลงทะเบียน collector ของ write buffer (เรียกจาก init_container แทนตัวเดิมถ้ามี)"""
+    global _buffer_collector
+    if _buffer_collector is not None:
+        REGISTRY.unregister(_buffer_collector)
+    _buffer_collector = WriteBufferCollector(buffer)
+    REGISTRY.register(_buffer_collector)
@@ -1,14 +1,54 @@
-from beanie import Document
+from beanie import Document, Granularity, TimeSeriesConfig
 from pydantic import Field
 from datetime import datetime, timedelta
 from typing import Optional
 import pymongo
+from apiapp.core.config import get_settings
 # ฟังก์ชันสำหรับเวลาไทย (UTC+7)
 def now_thai():
     return datetime.utcnow() + timedelta(hours=7)
 
 SECONDS_TO_EXPIRE = 604800  # 7 วัน
 
+# ==========================================
+# ⏱️ Time-series collection (เปิดด้วย SENSOR_TIMESERIES=true)
+# ==========================================
+# - timeField = timestamp, metaField = device_id, granularity = seconds
+# - หมดอายุ 7 วันเหมือนเดิม แต่ใช้ expireAfterSeconds ของ collection แทน TTL index
+# - collection เดิมต้องย้ายข้อมูลก่อนด้วย `forge migrate timeseries`
+#   (Beanie จะสร้าง time-series ให้เฉพาะตอนที่ collection ยังไม่มีอยู่)
+# - time-series ไม่บังคับ _id ไม่ซ้ำ: replay ไฟล์ spill ของ write buffer จึงกรอง _id ที่มีอยู่แล้วเอง
+#   (SensorWriteBuffer.dedupe_replay) แทนการพึ่ง DuplicateKeyError
+SENSOR_TIMESERIES_CONFIG = TimeSeriesConfig(
+    time_field="timestamp",
+    meta_field="device_id",
+    granularity=Granularity.seconds,
+    expire_after_seconds=SECONDS_TO_EXPIRE,
+)
+
+# ค้นหาค่าล่าสุดต่อ device (warm start Deadband / query ราย device)
+DEVICE_TIME_INDEX = pymongo.IndexModel(
+    [("device_id", pymongo.ASCENDING), ("timestamp", pymongo.DESCENDING)]
+)
+
+if get_settings().SENSOR_TIMESERIES:
+    SENSOR_TIMESERIES = SENSOR_TIMESERIES_CONFIG
+    SENSOR_INDEXES = [DEVICE_TIME_INDEX]
+else:
+    SENSOR_TIMESERIES = None
+    SENSOR_INDEXES = [
+        pymongo.IndexModel(
+            [("timestamp", pymongo.ASCENDING)],
+            expireAfterSeconds=SECONDS_TO_EXPIRE
+        ),
+        DEVICE_TIME_INDEX,
+        # keyset pagination ของ /sensors/history: sort (timestamp, _id) ตรงกับ index ไม่ต้อง sort ในหน่วยความจำ
+        pymongo.IndexModel([("timestamp", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]),
+        pymongo.IndexModel(
+            [("device_id", pymongo.ASCENDING), ("timestamp", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+        ),
+    ]
+
 # ==========================================
 # 1. Sensor pH
 # ==========================================
@@ -21,12 +61,8 @@ class SensorPH(Document):
     class Settings:
         # กำหนดชื่อ Collection ใน MongoDB ให้ตรงกับของเดิม
         name = "sensor_PH"
-        indexes = [
-            pymongo.IndexModel(
-                [("timestamp", pymongo.ASCENDING)],
-                expireAfterSeconds=SECONDS_TO_EXPIRE
-            )
-        ]
+        indexes = SENSOR_INDEXES
+        timeseries = SENSOR_TIMESERIES
 
 # ==========================================
 # 2. Sensor Turbidity (ความขุ่น)
@@ -38,12 +74,8 @@ class SensorTurbidity(Document):
 
     class Settings:
         name = "sensor_NTU"
-        indexes = [
-            pymongo.IndexModel(
-                [("timestamp", pymongo.ASCENDING)],
-                expireAfterSeconds=SECONDS_TO_EXPIRE
-            )
-        ]
+        indexes = SENSOR_INDEXES
+        timeseries = SENSOR_TIMESERIES
 
 # ==========================================
 # 3. Sensor Ammonia (NH3)
@@ -55,12 +87,8 @@ class SensorNH3(Document):
 
     class Settings:
         name = "sensor_NH3"
-        indexes = [
-            pymongo.IndexModel(
-                [("timestamp", pymongo.ASCENDING)],
-                expireAfterSeconds=SECONDS_TO_EXPIRE
-            )
-        ]
+        indexes = SENSOR_INDEXES
+        timeseries = SENSOR_TIMESERIES
 
 # ==========================================
 # 4. Sensor Temperature (อุณหภูมิ)
@@ -72,12 +100,8 @@ class SensorTemperature(Document):
 
     class Settings:
         name = "sensor_temperature"
-        indexes = [
-            pymongo.IndexModel(
-                [("timestamp", pymongo.ASCENDING)],
-                expireAfterSeconds=SECONDS_TO_EXPIRE
-            )
-        ]
+        indexes = SENSOR_INDEXES
+        timeseries = SENSOR_TIMESERIES
 
 # ==========================================
 # 5. Sensor TDS (ความเข้มข้นของสารละลาย)
@@ -89,12 +113,8 @@ class SensorTDS(Document):
 
     class Settings:
         name = "sensor_TDS"
-        indexes = [
-            pymongo.IndexModel(
-                [("timestamp", pymongo.ASCENDING)],
-                expireAfterSeconds=SECONDS_TO_EXPIRE
-            )
-        ]
+        indexes = SENSOR_INDEXES
+        timeseries = SENSOR_TIMESERIES
 
 # ==========================================
 # 6. Sensor pH Voltage
@@ -106,9 +126,99 @@ class SensorPHVoltage(Document):
 
     class Settings:
         name = "sensor_ph_voltage"
+        indexes = SENSOR_INDEXES
+        timeseries = SENSOR_TIMESERIES
+
+
+# ==========================================
+# 🧮 Rollup รายนาที / รายชั่วโมง (ดู rollup.py)
+# ==========================================
+# เก็บนานกว่าข้อมูลดิบ (7 วัน) เพื่อดูแนวโน้มระยะยาว
+_settings = get_settings()
+ROLLUP_MINUTE_EXPIRE = _settings.SENSOR_ROLLUP_MINUTE_RETENTION_DAYS * 86400
+ROLLUP_HOUR_EXPIRE = _settings.SENSOR_ROLLUP_HOUR_RETENTION_DAYS * 86400
+
+# 1 document ต่อ (sensor_type, device_id, bucket)
+ROLLUP_KEY_INDEX = pymongo.IndexModel(
+    [("sensor_type", pymongo.ASCENDING), ("device_id", pymongo.ASCENDING), ("bucket", pymongo.ASCENDING)],
+    unique=True,
+)
+# query ช่วงเวลาแบบไม่ระบุ device
+ROLLUP_SENSOR_TIME_INDEX = pymongo.IndexModel(
+    [("sensor_type", pymongo.ASCENDING), ("bucket", pymongo.ASCENDING)]
+)
+
+
+class SensorRollupMinute(Document):
+    sensor_type: str
+    device_id: str
+    bucket: datetime  # เวลาเริ่มของ bucket (เวลาไทย)
+    n: int  # จำนวน reading (ไม่ใช้ชื่อ count เพราะทับ Document.count())
+    sum: float
+    sum_sq: float
+    min: float
+    max: float
+    first: float
+    first_ts: datetime
+    last: float
+    last_ts: datetime
+
+    class Settings:
+        name = "sensor_rollup_minute"
         indexes = [
-            pymongo.IndexModel(
-                [("timestamp", pymongo.ASCENDING)],
-                expireAfterSeconds=SECONDS_TO_EXPIRE
-            )
-        ]
\ No newline at end of file
+            ROLLUP_KEY_INDEX,
+            ROLLUP_SENSOR_TIME_INDEX,
+            pymongo.IndexModel([("bucket", pymongo.ASCENDING)], expireAfterSeconds=ROLLUP_MINUTE_EXPIRE),
+        ]
+
+
+# field เหมือน SensorRollupMinute (แยก class เพราะอยู่คนละ collection)
+class SensorRollupHour(Document):
+    sensor_type: str
+    device_id: str
+    bucket: datetime  # เวลาเริ่มของ bucket (เวลาไทย)
+    n: int  # จำนวน reading (ไม่ใช้ชื่อ count เพราะทับ Document.count())
+    sum: float
+    sum_sq: float
+    min: float
+    max: float
+    first: float
+    first_ts: datetime
+    last: float
+    last_ts: datetime
+
+    class Settings:
+        name = "sensor_rollup_hour"
+        indexes = [
+            ROLLUP_KEY_INDEX,
+            ROLLUP_SENSOR_TIME_INDEX,
+            pymongo.IndexModel([("bucket", pymongo.ASCENDING)], expireAfterSeconds=ROLLUP_HOUR_EXPIRE),
+        ]
+
+
+ROLLUP_MODELS = {
+    "minute": SensorRollupMinute,
+    "hour": SensorRollupHour,
+}
+
+# ==========================================
+# 🗺️ Mapping: sensor_type -> Document / ชื่อฟิลด์ค่า
+# ==========================================
+SENSOR_MODELS = {
+    "ph": SensorPH,
+    "ph_voltage": SensorPHVoltage,
+    "turbidity": SensorTurbidity,
+    "nh3": SensorNH3,
+    "temperature": SensorTemperature,
+    "tds": SensorTDS,
+}
+
+# ชื่อฟิลด์ที่เก็บค่าของแต่ละ sensor (ไม่เหมือนกันทุกตัว เช่น turbidity -> NTU)
+SENSOR_VALUE_FIELDS = {
+    "ph": "ph",
+    "ph_voltage": "voltage",
+    "turbidity": "NTU",
+    "nh3": "NH3",
+    "temperature": "temperature",
+    "tds": "tds",
+}
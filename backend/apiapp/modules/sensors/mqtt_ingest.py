@@ -0,0 +1,190 @@
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+import paho.mqtt.client as mqtt
+from loguru import logger
+from pydantic import ValidationError
+
+from apiapp.core.config import Settings
+from .metrics import VALIDATE_SECONDS
+from .model import SENSOR_MODELS
+from .schemas import SensorBatchReading, SensorBatchRequest
+from .use_case import SensorUseCase
+
+# จำนวนข้อความสูงสุดที่รวมเป็น batch เดียวก่อนส่งเข้า SensorUseCase
+MAX_MESSAGES_PER_BATCH = 500
+
+
+class SensorMQTTSubscriber:
+    """
+    รับข้อมูล Sensor ผ่าน MQTT (แทนการยิง HTTP ทีละค่า)
+
+    Topic ที่รองรับ (prefix ตาม MQTT_SENSOR_TOPIC เช่น aquasense/sensors/#):
+    - aquasense/sensors/{device_id}/{sensor_type}
+        payload: ตัวเลข เช่น "7.12"
+                 หรือ JSON {"value": 7.12, "timestamp": "..."} หรือ list ของ object นี้
+    - aquasense/sensors/{device_id}
+        payload: JSON {"ph": 7.1, "temperature": 28.4, ...}
+                 หรือ {"readings": [{"sensor_type": "ph", "value": 7.1}, ...]}
+
+    paho ทำงานใน thread ของตัวเอง ข้อความจะถูกส่งต่อเข้า asyncio.Queue
+    แล้ว consumer จะรวมเป็น batch ต่อ device ก่อนเรียก SensorUseCase.record_batch
+    """
+
+    def __init__(self, settings: Settings, use_case: SensorUseCase):
+        self.settings = settings
+        self.use_case = use_case
+        self.topic = settings.MQTT_SENSOR_TOPIC
+        self.prefix = self.topic.rstrip("#").rstrip("/")
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.MQTT_INGEST_QUEUE_SIZE)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.client: Optional[mqtt.Client] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.failed = 0
+
+    # ---------------------------------------------------------
+    # 🔌 เชื่อมต่อ / ยกเลิกการเชื่อมต่อ
+    # ---------------------------------------------------------
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            client_id=self.settings.MQTT_CLIENT_ID,
+        )
+        if self.settings.MQTT_USERNAME:
+            self.client.username_pw_set(self.settings.MQTT_USERNAME, self.settings.MQTT_PASSWORD)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+
+        self.client.connect_async(self.settings.MQTT_BROKER, self.settings.MQTT_PORT, keepalive=60)
+        self.client.loop_start()
+        self._consumer = asyncio.create_task(self._consume())
+        logger.info(f"📡 MQTT ingest started: {self.settings.MQTT_BROKER}:{self.settings.MQTT_PORT} -> {self.topic}")
+
+    async def stop(self):
+        if self.client:
+            self.client.loop_stop()
+            self.client.disconnect()
+        if self._consumer:
+            # ส่งข้อมูลที่ค้างอยู่ใน queue ให้หมดก่อนปิด
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ MQTT ingest stopped with {self.queue.qsize()} messages pending")
+            self._consumer.cancel()
+        logger.info("🛑 MQTT ingest stopped")
+
+    async def run_forever(self):
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    # ---------------------------------------------------------
+    # 📨 Callback จาก paho (ทำงานใน thread ของ paho)
+    # ---------------------------------------------------------
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            logger.error(f"❌ MQTT connect failed: {reason_code}")
+            return
+        # subscribe ใหม่ทุกครั้งที่ reconnect
+        client.subscribe(self.topic, qos=self.settings.MQTT_INGEST_QOS)
+
+    def _on_message(self, client, userdata, message):
+        self.loop.call_soon_threadsafe(self._enqueue, message.topic, message.payload)
+
+    def _enqueue(self, topic: str, payload: bytes):
+        try:
+            self.queue.put_nowait((topic, payload))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"⚠️ MQTT ingest queue full, dropped message from {topic}")
+
+    # ---------------------------------------------------------
+    # 🔄 Consumer: รวมข้อความเป็น batch ต่อ device
+    # ---------------------------------------------------------
+    async def _consume(self):
+        while True:
+            messages = [await self.queue.get()]
+            while len(messages) < MAX_MESSAGES_PER_BATCH and not self.queue.empty():
+                messages.append(self.queue.get_nowait())
+
+            try:
+                batches: Dict[str, List[SensorBatchReading]] = {}
+                for topic, payload in messages:
+                    started = time.perf_counter()
+                    decoded = self.decode(topic, payload)
+                    VALIDATE_SECONDS.labels("mqtt").observe(time.perf_counter() - started)
+                    if decoded and decoded[1]:
+                        device_id, readings = decoded
+                        batches.setdefault(device_id, []).extend(readings)
+
+                # แยกต่อ device: device หนึ่งล้มเหลวไม่ทำให้ของ device อื่นหายไปด้วย
+                # DB ล่มไม่ raise: record_batch ลอง insert ใหม่แล้ว spill ลงไฟล์ของ write buffer
+                for device_id, readings in batches.items():
+                    try:
+                        await self.use_case.record_batch(
+                            SensorBatchRequest(device_id=device_id, readings=readings),
+                            write_retries=self.settings.MQTT_INGEST_WRITE_RETRIES,
+                            retry_backoff=self.settings.MQTT_INGEST_RETRY_BACKOFF_MS / 1000,
+                        )
+                    except Exception as e:
+                        self.failed += len(readings)
+                        logger.error(f"❌ MQTT ingest error ({device_id}, {len(readings)} readings): {e!r}")
+            except Exception as e:
+                logger.error(f"❌ MQTT ingest error: {e}")
+            finally:
+                for _ in messages:
+                    self.queue.task_done()
+
+    def decode(self, topic: str, payload: bytes):
+        """แปลง topic + payload เป็น (device_id, [SensorBatchReading]) หรือ None ถ้ารูปแบบไม่ถูกต้อง"""
+        if not topic.startswith(self.prefix + "/"):
+            return None
+        parts = topic[len(self.prefix) + 1:].split("/")
+
+        try:
+            text = payload.decode("utf-8").strip()
+            if len(parts) == 2:
+                device_id, sensor_type = parts
+                if sensor_type not in SENSOR_MODELS:
+                    logger.warning(f"⚠️ Unknown sensor type in topic: {topic}")
+                    return None
+                return device_id, self._decode_samples(sensor_type, text)
+
+            if len(parts) == 1:
+                device_id = parts[0]
+                body = json.loads(text)
+                if "readings" in body:
+                    return device_id, [SensorBatchReading(**r) for r in body["readings"]]
+                return device_id, [
+                    SensorBatchReading(sensor_type=sensor_type, value=value)
+                    for sensor_type, value in body.items() if sensor_type in SENSOR_MODELS
+                ]
+        except (ValueError, TypeError, AttributeError, ValidationError) as e:
+            logger.warning(f"⚠️ Invalid MQTT payload on {topic}: {e}")
+            return None
+
+        return None
+
+    def _decode_samples(self, sensor_type: str, text: str) -> List[SensorBatchReading]:
+        try:
+            # payload เป็นตัวเลขล้วน (รูปแบบที่ ESP32 ส่งง่ายที่สุด)
+            return [SensorBatchReading(sensor_type=sensor_type, value=float(text))]
+        except ValueError:
+            pass
+
+        body = json.loads(text)
+        samples = body if isinstance(body, list) else [body]
+        readings = []
+        for sample in samples:
+            if isinstance(sample, (int, float)):
+                readings.append(SensorBatchReading(sensor_type=sensor_type, value=sample))
+            else:
+                readings.append(SensorBatchReading(sensor_type=sensor_type, **sample))
+        return readings
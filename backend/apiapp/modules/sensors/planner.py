@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from .rollup import RESOLUTIONS, bucket_start
+
+# tier เรียงจากละเอียด -> หยาบ
+TIERS = ("raw", "minute", "hour")
+
+# อ่านได้ถึง points * OVERSAMPLE จุดแล้วค่อยลดด้วย LTTB (ได้รูปกราฟละเอียดกว่าใช้ tier หยาบทันที)
+OVERSAMPLE = 4
+
+
+class Segment(NamedTuple):
+    """ช่วงเวลาที่อ่านจาก tier เดียว (รวม start และ end)"""
+
+    tier: str
+    start: datetime
+    end: datetime
+
+
+class TierPlanner:
+    """
+    เลือกว่าจะอ่านช่วงเวลาจากข้อมูลดิบ, rollup รายนาที หรือรายชั่วโมง
+
+    - ระบุ points: เลือก tier ที่ละเอียดที่สุดที่จำนวนจุดโดยประมาณไม่เกิน points * OVERSAMPLE
+      (เช่น 2 ชม. -> raw, 3 วัน -> minute, 30 วัน -> hour)
+    - ระบุ resolution (วินาที): เลือก tier ที่หยาบที่สุดที่ยังละเอียดกว่าหรือเท่ากับ resolution
+    - ช่วงที่เก่ากว่าอายุข้อมูลของ tier ที่เลือก (raw 7 วัน, minute 90 วัน) อ่านจาก tier ที่หยาบกว่าแล้วต่อกัน
+    """
+
+    def __init__(self, raw_interval: float, retention: Dict[str, float]):
+        # ระยะห่างโดยประมาณของ reading ดิบที่บันทึก (วินาที) ใช้ประมาณจำนวนจุด
+        self.step = {"raw": raw_interval, **RESOLUTIONS}
+        self.retention = retention
+
+    def choose(self, start: datetime, end: datetime, points: Optional[int] = None,
+               resolution: Optional[float] = None) -> str:
+        if resolution:
+            fitting = [tier for tier in TIERS if self.step[tier] <= resolution]
+            return fitting[-1] if fitting else "raw"
+        span = (end - start).total_seconds()
+        for tier in TIERS:
+            if span / self.step[tier] <= (points or 1) * OVERSAMPLE:
+                return tier
+        return TIERS[-1]
+
+    def plan(self, start: datetime, end: datetime, now: datetime, tier: str) -> List[Segment]:
+        """แบ่งช่วงเวลาเป็น segment (เก่า -> ใหม่) ตามอายุข้อมูลของแต่ละ tier"""
+        segments: List[Segment] = []
+        index = TIERS.index(tier)
+        while True:
+            tier = TIERS[index]
+            if tier != "raw":
+                # เริ่มที่ต้น bucket จะได้ไม่ตัด bucket แรกทิ้ง
+                start = bucket_start(start, tier)
+            if index == len(TIERS) - 1:
+                segments.append(Segment(tier, start, end))
+                break
+            cutoff = now - timedelta(seconds=self.retention[tier])
+            if cutoff <= start:
+                segments.append(Segment(tier, start, end))
+                break
+            # ต่อกับ tier ถัดไปที่ขอบ bucket ของ tier นั้น bucket จึงไม่ทับกับ segment นี้
+            coarser = TIERS[index + 1]
+            boundary = bucket_start(cutoff, coarser)
+            if boundary < cutoff:
+                boundary += timedelta(seconds=RESOLUTIONS[coarser])
+            if boundary <= end:
+                segments.append(Segment(tier, boundary, end))
+            end = min(end, boundary - timedelta(microseconds=1))
+            index += 1
+        segments.reverse()
+        return segments
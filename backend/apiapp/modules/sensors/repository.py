@@ -1,106 +1,324 @@
-from typing import List, Optional, Union
-from .model import SensorPH, SensorPHVoltage, SensorTurbidity, SensorNH3, SensorTemperature, SensorTDS
-from .schemas import (
-    SensorPH as SchemaPH,
-    SensorPHVoltage as SchemaPHVoltage,
-    SensorTurbidity as SchemaTurbidity,
-    SensorNH3 as SchemaNH3, 
-    SensorTemperature as SchemaTemperature,
-    SensorTDS as SchemaTDS
-)
+import base64
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from .metrics import INSERT_SECONDS
+from .model import ROLLUP_MODELS, SENSOR_MODELS, SENSOR_VALUE_FIELDS
+
+# record ที่พร้อมบันทึก = dict ตรงกับ BSON ใน collection (_id, device_id, <value field>, timestamp)
+SensorRecord = Dict[str, Any]
+
+
+def encode_cursor(timestamp: datetime, object_id: ObjectId) -> str:
+    """cursor แบบ opaque ของ keyset (timestamp, _id)"""
+    raw = f"{timestamp.isoformat()}|{object_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """แปลง cursor กลับเป็น (timestamp, _id) (ValueError ถ้ารูปแบบไม่ถูกต้อง)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, object_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(object_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 class SensorRepository:
     
     # ==========================================
     # 💾 ส่วนบันทึกข้อมูล (Create / Insert)
     # ==========================================
-    
-    async def add_ph(self, data: SchemaPH) -> SensorPH:
-        # สร้าง Object Beanie จากข้อมูล Pydantic
-        record = SensorPH(
-            device_id=data.device_id,
-            ph=data.ph
-            # timestamp จะถูกสร้างเองจาก default_factory ใน model.py
-        )
-        await record.insert() # สั่งบันทึกลง MongoDB
-        return record
+    # เขียน dict ตรงผ่าน Motor collection ไม่สร้าง Beanie Document
+    # (Document validate ซ้ำ + ตั้ง state tracking ทุก record ซึ่งไม่จำเป็นกับข้อมูล insert-only)
 
-    async def add_ph_voltage(self, data: SchemaPHVoltage) -> SensorPHVoltage:
-        record = SensorPHVoltage(
-            device_id=data.device_id,
-            voltage=data.voltage
-        )
-        await record.insert()
-        return record
+    def build_record(self, sensor_type: str, device_id: str, value: float, timestamp: datetime) -> SensorRecord:
+        """สร้าง record ของ sensor_type ที่ระบุ (ยังไม่บันทึก)"""
+        return {
+            # กำหนด _id ตั้งแต่ตอนสร้าง เพื่อให้บันทึกซ้ำ (retry/replay) ได้โดยไม่เกิดข้อมูลซ้ำ
+            "_id": ObjectId(),
+            "device_id": device_id,
+            SENSOR_VALUE_FIELDS[sensor_type]: value,
+            "timestamp": timestamp,
+        }
 
-    async def add_turbidity(self, data: SchemaTurbidity) -> SensorTurbidity:
-        record = SensorTurbidity(
-            device_id=data.device_id,
-            NTU=data.NTU
-        )
-        await record.insert()
-        return record
+    async def add_many(self, sensor_type: str, records: List[SensorRecord], ordered: bool = True) -> int:
+        """บันทึกหลาย record ของ sensor เดียวกันด้วย insert_many ครั้งเดียว"""
+        if not records:
+            return 0
+        collection = self._get_model_class(sensor_type).get_motor_collection()
+        started = time.perf_counter()
+        await collection.insert_many(records, ordered=ordered)
+        INSERT_SECONDS.labels(sensor_type).observe(time.perf_counter() - started)
+        return len(records)
 
-    async def add_nh3(self, data: SchemaNH3) -> SensorNH3:
-        record = SensorNH3(
-            device_id=data.device_id,
-            NH3=data.NH3
-        )
-        await record.insert()
-        return record
+    async def existing_ids(self, sensor_type: str, records: List[SensorRecord]) -> set:
+        """
+        _id ของ record ที่มีอยู่ใน collection แล้ว (ใช้ตอน replay ของ time-series collection
+        ซึ่งไม่มี unique index ที่ _id) จำกัดด้วยช่วง timestamp ของ record ให้ค้นเฉพาะ bucket ที่เกี่ยวข้อง
+        """
+        if not records:
+            return set()
+        collection = self._get_model_class(sensor_type).get_motor_collection()
+        timestamps = [record["timestamp"] for record in records]
+        query = {
+            "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)},
+            "_id": {"$in": [record["_id"] for record in records]},
+        }
+        return {doc["_id"] async for doc in collection.find(query, {"_id": 1})}
 
-    async def add_temperature(self, data: SchemaTemperature) -> SensorTemperature:
-        record = SensorTemperature(
-            device_id=data.device_id,
-            temperature=data.temperature
-        )
-        await record.insert()
-        return record
+    def dump_record(self, sensor_type: str, record: SensorRecord) -> dict:
+        """แปลง record เป็น JSON (ใช้เขียนไฟล์ spill ของ write buffer)"""
+        field = SENSOR_VALUE_FIELDS[sensor_type]
+        return {
+            "id": str(record["_id"]),
+            "device_id": record["device_id"],
+            field: record[field],
+            "timestamp": record["timestamp"].isoformat(),
+        }
 
-    async def add_tds(self, data: SchemaTDS) -> SensorTDS:
-        record = SensorTDS(
-            device_id=data.device_id,
-            tds=data.tds
-        )
-        await record.insert()
-        return record
+    def load_record(self, sensor_type: str, doc: dict) -> SensorRecord:
+        """แปลง JSON จาก dump_record กลับเป็น record"""
+        field = SENSOR_VALUE_FIELDS[sensor_type]
+        return {
+            "_id": ObjectId(doc["id"]),
+            "device_id": doc["device_id"],
+            field: float(doc[field]),
+            "timestamp": datetime.fromisoformat(doc["timestamp"]),
+        }
 
     # ==========================================
     # 🔍 ส่วนดึงข้อมูล (Read / Query)
     # ==========================================
 
-    async def get_latest(self, sensor_type: str):
-        """ดึงข้อมูลล่าสุด 1 ตัว"""
+    async def get_latest(self, sensor_type: str, device_id: Optional[str] = None):
+        """ดึงข้อมูลล่าสุด 1 ตัว (ระบุ device_id เพื่อกรองเฉพาะ device)"""
         model = self._get_model_class(sensor_type)
         if model:
-            # find_all() -> เรียง timestamp ถอยหลัง (-) -> เอาตัวแรก
-            return await model.find_all().sort("-timestamp").first_or_none()
+            # find() -> เรียง timestamp ถอยหลัง (-) -> เอาตัวแรก
+            return await model.find(self._device_filter(device_id)).sort("-timestamp").first_or_none()
         return None
 
-    async def get_history(self, sensor_type: str, limit: int = 20):
-        """ดึงข้อมูลย้อนหลังตามจำนวน limit"""
+    async def get_history(
+        self,
+        sensor_type: str,
+        limit: int = 20,
+        device_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        cursor: Optional[Tuple[datetime, ObjectId]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        ดึงข้อมูลย้อนหลัง (ใหม่ -> เก่า) ทีละหน้า คืน (items, next_cursor)
+
+        - start/end: ช่วงเวลา (รวมทั้งสองฝั่ง), device_id: กรองเฉพาะ device
+        - cursor: keyset (timestamp, _id) ของแถวสุดท้ายในหน้าก่อน ต่อหน้าถัดไปด้วย index
+          ไม่ต้อง skip จึงใช้เวลาเท่ากันทุกหน้า
+        - fields: เลือกเฉพาะ field ที่ต้องการ (device_id / <value field> / timestamp)
+        """
         model = self._get_model_class(sensor_type)
-        if model:
-            # .to_list() จำเป็นต้องใส่เสมอใน Beanie เมื่อดึงหลายตัว
-            return await model.find_all().sort("-timestamp").limit(limit).to_list()
-        return []
+        if not model:
+            return [], None
+
+        query = self._range_filter(device_id, start, end)
+        if cursor:
+            cursor_ts, cursor_id = cursor
+            query["$or"] = [
+                {"timestamp": {"$lt": cursor_ts}},
+                {"timestamp": cursor_ts, "_id": {"$lt": cursor_id}},
+            ]
+
+        projection = {"_id": 1, "timestamp": 1}
+        for field in fields or ["device_id", SENSOR_VALUE_FIELDS[sensor_type]]:
+            projection[field] = 1
+
+        docs = await (
+            model.get_motor_collection()
+            .find(query, projection)
+            .sort([("timestamp", -1), ("_id", -1)])
+            .limit(limit)
+            .to_list(length=limit)
+        )
+        next_cursor = encode_cursor(docs[-1]["timestamp"], docs[-1]["_id"]) if len(docs) == limit else None
+        items = []
+        for doc in docs:
+            doc["id"] = str(doc.pop("_id"))
+            items.append(doc)
+        return items, next_cursor
+
+    async def get_range(
+        self,
+        sensor_type: str,
+        device_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        max_docs: int = 200_000,
+    ) -> List[dict]:
+        """
+        ข้อมูลทั้งช่วงเวลา (เก่า -> ใหม่) เฉพาะ device_id/timestamp/ค่า สำหรับ downsample
+        ถ้าเกิน max_docs จะได้เฉพาะ max_docs ตัวล่าสุดของช่วง
+        """
+        model = self._get_model_class(sensor_type)
+        if not model:
+            return []
+        query = self._range_filter(device_id, start, end)
+        projection = {"_id": 0, "device_id": 1, "timestamp": 1, SENSOR_VALUE_FIELDS[sensor_type]: 1}
+        docs = await (
+            model.get_motor_collection()
+            .find(query, projection)
+            .sort([("timestamp", -1), ("_id", -1)])
+            .limit(max_docs)
+            .to_list(length=max_docs)
+        )
+        docs.reverse()
+        return docs
+
+    async def get_last_before(self, sensor_type: str, device_id: Optional[str], before: datetime) -> Optional[dict]:
+        """reading ล่าสุดก่อนเวลา before (ค่าตั้งต้นของ as-of join)"""
+        model = self._get_model_class(sensor_type)
+        if not model:
+            return None
+        field = SENSOR_VALUE_FIELDS[sensor_type]
+        query = {**self._device_filter(device_id), "timestamp": {"$lt": before}}
+        return await model.get_motor_collection().find_one(
+            query, {"_id": 0, "device_id": 1, "timestamp": 1, field: 1}, sort=[("timestamp", -1), ("_id", -1)]
+        )
+
+    async def iter_range(
+        self,
+        sensor_type: str,
+        device_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        batch_size: int = 5000,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        ไล่อ่านทั้งช่วงเวลา (เก่า -> ใหม่) ทีละ batch จาก Motor cursor (ไม่ใช้ to_list ทั้งก้อน)
+        แต่ละแถวมี device_id, timestamp, value
+        """
+        model = self._get_model_class(sensor_type)
+        if not model:
+            return
+        field = SENSOR_VALUE_FIELDS[sensor_type]
+        cursor = (
+            model.get_motor_collection()
+            .find(self._range_filter(device_id, start, end), {"_id": 0, "device_id": 1, "timestamp": 1, field: 1})
+            .sort([("timestamp", 1), ("_id", 1)])
+            .batch_size(batch_size)
+        )
+        batch: List[dict] = []
+        async for doc in cursor:
+            doc["value"] = doc.pop(field)
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def get_latest_per_device(self, sensor_type: str) -> List[dict]:
+        """ดึงค่าล่าสุดของแต่ละ device (ใช้ warm start Deadband)"""
+        model = self._get_model_class(sensor_type)
+        if not model:
+            return []
+        field = SENSOR_VALUE_FIELDS[sensor_type]
+        # sort ตาม (device_id, -timestamp) ให้ตรงกับ index เพื่อให้ $group/$first ใช้ DISTINCT_SCAN
+        pipeline = [
+            {"$sort": {"device_id": 1, "timestamp": -1}},
+            {"$group": {
+                "_id": "$device_id",
+                "value": {"$first": f"${field}"},
+                "timestamp": {"$first": "$timestamp"},
+            }},
+            {"$project": {"_id": 0, "device_id": "$_id", "value": 1, "timestamp": 1}},
+        ]
+        return await model.aggregate(pipeline).to_list()
+
+    # ==========================================
+    # 🧮 Rollup รายนาที / รายชั่วโมง
+    # ==========================================
+
+    async def upsert_rollups(self, resolution: str, aggregates: dict):
+        """
+        บวก RollupAggregate เข้า document ของ bucket (สร้างใหม่ถ้ายังไม่มี) ด้วย bulk_write ครั้งเดียว
+        ใช้ update แบบ pipeline เพื่อเลือก first/last ตามเวลาได้ในคำสั่งเดียว
+        """
+        operations = [
+            UpdateOne(
+                {"sensor_type": sensor_type, "device_id": device_id, "bucket": bucket},
+                self._rollup_update(aggregate),
+                upsert=True,
+            )
+            for (sensor_type, device_id, bucket), aggregate in aggregates.items()
+        ]
+        if operations:
+            await ROLLUP_MODELS[resolution].get_motor_collection().bulk_write(operations, ordered=False)
+
+    async def get_rollups(
+        self,
+        sensor_type: str,
+        resolution: str,
+        device_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 1000,
+    ) -> List[dict]:
+        """rollup ของช่วงเวลา (เก่า -> ใหม่) start/end เทียบกับเวลาเริ่ม bucket"""
+        query = {"sensor_type": sensor_type, **self._range_filter(device_id, start, end, field="bucket")}
+        return await (
+            ROLLUP_MODELS[resolution].get_motor_collection()
+            .find(query, {"_id": 0})
+            .sort([("bucket", 1), ("device_id", 1)])
+            .limit(limit)
+            .to_list(length=limit)
+        )
+
+    @staticmethod
+    def _rollup_update(aggregate) -> list:
+        def add(field, value):
+            return {"$add": [{"$ifNull": [f"${field}", 0]}, value]}
+
+        # ทุก expression ใน $set เดียวกันอ่านค่าเดิมของ document (ก่อนอัปเดต)
+        no_first = {"$eq": [{"$type": "$first_ts"}, "missing"]}
+        no_last = {"$eq": [{"$type": "$last_ts"}, "missing"]}
+        take_first = {"$or": [no_first, {"$lt": [aggregate.first_ts, "$first_ts"]}]}
+        take_last = {"$or": [no_last, {"$gte": [aggregate.last_ts, "$last_ts"]}]}
+        return [{"$set": {
+            "n": add("n", aggregate.n),
+            "sum": add("sum", aggregate.sum),
+            "sum_sq": add("sum_sq", aggregate.sum_sq),
+            "min": {"$min": ["$min", aggregate.min]},
+            "max": {"$max": ["$max", aggregate.max]},
+            "first": {"$cond": [take_first, aggregate.first, "$first"]},
+            "first_ts": {"$cond": [take_first, aggregate.first_ts, "$first_ts"]},
+            "last": {"$cond": [take_last, aggregate.last, "$last"]},
+            "last_ts": {"$cond": [take_last, aggregate.last_ts, "$last_ts"]},
+        }}]
 
     # ==========================================
     # 🛠️ Helper Function (Private)
     # ==========================================
     
+    def _device_filter(self, device_id: Optional[str]) -> dict:
+        return {"device_id": device_id} if device_id else {}
+
+    def _range_filter(
+        self, device_id: Optional[str], start: Optional[datetime], end: Optional[datetime], field: str = "timestamp"
+    ) -> dict:
+        """กรอง device + ช่วงเวลา (รวมทั้งสองฝั่ง)"""
+        query = self._device_filter(device_id)
+        time_range = {}
+        if start:
+            time_range["$gte"] = start
+        if end:
+            time_range["$lte"] = end
+        if time_range:
+            query[field] = time_range
+        return query
+
     def _get_model_class(self, sensor_type: str):
         """ช่วยแปลง string เป็น Class ของ Beanie"""
-        if sensor_type == "ph": 
-            return SensorPH
-        elif sensor_type == "ph_voltage":
-            return SensorPHVoltage
-        elif sensor_type == "turbidity": 
-            return SensorTurbidity
-        elif sensor_type == "nh3": 
-            return SensorNH3
-        elif sensor_type == "temperature": 
-            return SensorTemperature
-        elif sensor_type == "tds":
-            return SensorTDS
-        return None
\ No newline at end of file
+        return SENSOR_MODELS.get(sensor_type)
\ No newline at end of file
@@ -0,0 +1,169 @@
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+# ---------------------------------------------------------
+# 📊 สถิติแบบ sliding window ต่อ (device_id, sensor_type)
+# ---------------------------------------------------------
+# อัปเดตทุก reading ที่รับเข้ามาแบบ amortized O(1) ไม่ต้อง query ย้อนหลัง
+# - mean / variance / slope: ผลรวมสะสม (บวกตอนเข้า ลบตอนหลุด window)
+# - min / max: monotonic deque (แต่ละ reading เข้าและออกจาก deque ได้ครั้งเดียว)
+#   อ้างถึง reading ด้วยลำดับที่รับ (seq) ไม่ใช่เวลา เพราะหลาย reading อาจมีเวลาเดียวกัน
+# เวลาเป็น epoch วินาที (ดู deadband.to_epoch) และ slope เป็นหน่วยต่อชั่วโมง
+
+# ชื่อ window -> ความยาว (วินาที)
+DEFAULT_WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+
+Sample = Tuple[float, float]  # (t, value)
+Extreme = Tuple[int, float]  # (seq, value) ใน deque ของ min / max
+
+
+class RollingWindow:
+    """
+    สถิติของ reading ในช่วง span วินาทีล่าสุด
+    เก็บ sample ไม่เกิน max_samples (ถ้าส่งถี่เกิน window จะสั้นกว่า span)
+    """
+
+    __slots__ = ("span", "max_samples", "samples", "mins", "maxs", "seq", "anchor",
+                 "n", "sum", "sum_sq", "sum_t", "sum_tt", "sum_tv")
+
+    def __init__(self, span: float, max_samples: int):
+        self.span = span
+        self.max_samples = max_samples
+        self.samples: Deque[Sample] = deque()
+        self.mins: Deque[Extreme] = deque()  # ค่าเพิ่มขึ้นจากหน้าไปหลัง: หน้าสุด = min
+        self.maxs: Deque[Extreme] = deque()  # ค่าลดลงจากหน้าไปหลัง: หน้าสุด = max
+        # seq ของ reading ถัดไป (reading เก่าสุดใน samples คือ seq - len(samples))
+        self.seq = 0
+        # เวลาอ้างอิงของผลรวมที่เกี่ยวกับ t (กัน float สูญเสียความละเอียดเมื่อ epoch ใหญ่)
+        self.anchor: Optional[float] = None
+        self.n = 0
+        self.sum = self.sum_sq = 0.0
+        self.sum_t = self.sum_tt = self.sum_tv = 0.0
+
+    def add(self, t: float, value: float) -> bool:
+        """เพิ่ม reading (reading ที่เก่ากว่าตัวล่าสุดถูกข้าม คืน False)"""
+        if self.samples and t < self.samples[-1][0]:
+            return False
+        if self.anchor is None or t - self.anchor > 4 * self.span:
+            self._rebase(t)
+        seq = self.seq
+        self.seq += 1
+        self.samples.append((t, value))
+        self._include(t, value)
+        while self.mins and self.mins[-1][1] >= value:
+            self.mins.pop()
+        self.mins.append((seq, value))
+        while self.maxs and self.maxs[-1][1] <= value:
+            self.maxs.pop()
+        self.maxs.append((seq, value))
+        if len(self.samples) > self.max_samples:
+            self._pop_oldest()
+        self.expire(t)
+        return True
+
+    def expire(self, now: float):
+        """เอา reading ที่เก่ากว่า now - span ออก"""
+        cutoff = now - self.span
+        while self.samples and self.samples[0][0] < cutoff:
+            self._pop_oldest()
+
+    def stats(self) -> dict:
+        if not self.n:
+            return {"count": 0, "mean": None, "variance": None, "stddev": None,
+                    "min": None, "max": None, "slope_per_hour": None, "oldest": None, "newest": None}
+        mean = self.sum / self.n
+        variance = max(self.sum_sq / self.n - mean * mean, 0.0)
+        slope = None
+        denominator = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if self.n >= 2 and denominator > 0:
+            slope = (self.n * self.sum_tv - self.sum_t * self.sum) / denominator * 3600
+        return {
+            "count": self.n,
+            "mean": mean,
+            "variance": variance,
+            "stddev": math.sqrt(variance),
+            "min": self.mins[0][1],
+            "max": self.maxs[0][1],
+            "slope_per_hour": slope,
+            "oldest": self.samples[0][0],
+            "newest": self.samples[-1][0],
+        }
+
+    # --- helpers ---
+    def _include(self, t: float, value: float, sign: int = 1):
+        x = t - self.anchor
+        self.n += sign
+        self.sum += sign * value
+        self.sum_sq += sign * value * value
+        self.sum_t += sign * x
+        self.sum_tt += sign * x * x
+        self.sum_tv += sign * x * value
+
+    def _pop_oldest(self):
+        seq = self.seq - len(self.samples)
+        t, value = self.samples.popleft()
+        self._include(t, value, -1)
+        if self.mins and self.mins[0][0] <= seq:
+            self.mins.popleft()
+        if self.maxs and self.maxs[0][0] <= seq:
+            self.maxs.popleft()
+
+    def _rebase(self, t: float):
+        """ย้ายเวลาอ้างอิงแล้วคิดผลรวมใหม่จาก sample ที่เหลือ (นานๆ ครั้ง ล้าง error สะสมของการบวกลบด้วย)"""
+        self.expire(t)
+        self.anchor = self.samples[0][0] if self.samples else t
+        self.n = 0
+        self.sum = self.sum_sq = 0.0
+        self.sum_t = self.sum_tt = self.sum_tv = 0.0
+        for sample_t, value in self.samples:
+            self._include(sample_t, value)
+
+
+class RollingStats:
+    """
+    RollingWindow ทุก window ต่อ (device_id, sensor_type) จำกัดจำนวน series (LRU)
+    สถิติมาจาก reading ที่ process นี้รับเท่านั้น (เริ่มนับใหม่เมื่อ restart)
+    """
+
+    def __init__(self, windows: Dict[str, float], max_series: int = 2000, max_samples: int = 20000):
+        self.windows = windows
+        self.max_series = max_series
+        self.max_samples = max_samples
+        self._series: "OrderedDict[Tuple[str, str], Dict[str, RollingWindow]]" = OrderedDict()
+        self.dropped = 0  # reading ที่มาช้ากว่าตัวล่าสุดของ series
+
+    def add(self, device_id: str, sensor_type: str, t: float, value: float):
+        key = (device_id, sensor_type)
+        series = self._series.get(key)
+        if series is None:
+            series = {name: RollingWindow(span, self.max_samples) for name, span in self.windows.items()}
+            self._series[key] = series
+            if len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(key)
+        # ทุก window รับ reading ชุดเดียวกัน: ข้ามทั้งชุดถ้ามาช้ากว่าตัวล่าสุด
+        if any(window.samples and t < window.samples[-1][0] for window in series.values()):
+            self.dropped += 1
+            return
+        for window in series.values():
+            window.add(t, value)
+
+    def snapshot(self, sensor_type: str, device_id: Optional[str] = None, window: Optional[str] = None,
+                 now: Optional[float] = None) -> Dict[str, Dict[str, dict]]:
+        """{device_id: {window: stats}} ของ sensor นั้น (window เลื่อนตามเวลาปัจจุบันแม้ไม่มี reading ใหม่)"""
+        now = time.time() if now is None else now
+        result: Dict[str, Dict[str, dict]] = {}
+        for (series_device, series_sensor), series in self._series.items():
+            if series_sensor != sensor_type or (device_id and series_device != device_id):
+                continue
+            stats = {}
+            for name, rolling in series.items():
+                if window and name != window:
+                    continue
+                rolling.expire(now)
+                stats[name] = rolling.stats()
+            result[series_device] = stats
+        return result
@@ -0,0 +1,188 @@
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+# ---------------------------------------------------------
+# 🧮 Rollup รายนาที / รายชั่วโมง
+# ---------------------------------------------------------
+# resolution -> ความยาว bucket (วินาที)
+RESOLUTIONS = {"minute": 60, "hour": 3600}
+
+# key ของ bucket = (sensor_type, device_id, เวลาเริ่ม bucket)
+RollupKey = Tuple[str, str, datetime]
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """ปัดเวลาลงเป็นต้น bucket (เวลาไทยแบบ naive เหมือน timestamp ของ reading)"""
+    if resolution == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+
+class RollupAggregate:
+    """สถิติของ 1 bucket: รวมกันได้ (n/sum/sum_sq บวกกัน, min/max, first/last ตามเวลา)"""
+
+    __slots__ = ("n", "sum", "sum_sq", "min", "max", "first_ts", "first", "last_ts", "last")
+
+    def __init__(self, timestamp: datetime, value: float):
+        self.n = 1
+        self.sum = value
+        self.sum_sq = value * value
+        self.min = value
+        self.max = value
+        self.first_ts = self.last_ts = timestamp
+        self.first = self.last = value
+
+    def add(self, timestamp: datetime, value: float):
+        self.n += 1
+        self.sum += value
+        self.sum_sq += value * value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if timestamp < self.first_ts:
+            self.first_ts, self.first = timestamp, value
+        if timestamp >= self.last_ts:
+            self.last_ts, self.last = timestamp, value
+
+    def merge(self, other: "RollupAggregate"):
+        self.n += other.n
+        self.sum += other.sum
+        self.sum_sq += other.sum_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if other.first_ts < self.first_ts:
+            self.first_ts, self.first = other.first_ts, other.first
+        if other.last_ts >= self.last_ts:
+            self.last_ts, self.last = other.last_ts, other.last
+
+
+def summarize(doc: dict) -> dict:
+    """เติม mean / stddev (population) จาก n, sum, sum_sq ของ rollup document (ส่งออกเป็น count)"""
+    doc = dict(doc)
+    count = doc.pop("n")
+    mean = doc["sum"] / count
+    variance = max(doc["sum_sq"] / count - mean * mean, 0.0)
+    return {**doc, "count": count, "mean": mean, "stddev": math.sqrt(variance)}
+
+
+class SensorRollupBuffer:
+    """
+    รวม reading ที่รับเข้ามาเป็น rollup รายนาที/รายชั่วโมงในหน่วยความจำ
+    แล้ว upsert ลง MongoDB ทุก flush_interval ด้วย bulk_write ครั้งเดียวต่อ resolution
+
+    - นับทุก reading ที่รับเข้ามา (รวมที่ compression ตัดทิ้ง) สถิติจึงไม่เพี้ยนตาม compression
+    - upsert แบบบวกเพิ่ม ($add/$min/$max) หลาย process เขียน bucket เดียวกันได้
+    - flush ไม่สำเร็จจะรวมกลับเข้า pending แล้วลองใหม่รอบถัดไป
+      (ถ้า timeout หลัง DB รับไปแล้วบางส่วน bucket นั้นอาจถูกนับซ้ำ: at-least-once)
+    """
+
+    def __init__(self, repo, flush_interval: float, flush_timeout: float):
+        self.repo = repo
+        self.flush_interval = flush_interval
+        self.flush_timeout = flush_timeout
+        self._pending: Dict[str, Dict[RollupKey, RollupAggregate]] = {r: {} for r in RESOLUTIONS}
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+        self.flushes = 0
+        self.flushed_buckets = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+
+    # ---------------------------------------------------------
+    # 🔌 Lifecycle
+    # ---------------------------------------------------------
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🚀 Sensor rollup buffer started (flush every {self.flush_interval:.0f}s)")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._wake.set()
+        if self._task:
+            await self._task
+        await self.flush()
+        logger.info("🛑 Sensor rollup buffer stopped")
+
+    async def _run(self):
+        while self.running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self.running:
+                return
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Sensor rollup flush error: {e}")
+
+    # ---------------------------------------------------------
+    # 📥 รับ reading จาก SensorUseCase
+    # ---------------------------------------------------------
+    def add(self, device_id: str, sensor_type: str, timestamp: datetime, value: float):
+        for resolution, pending in self._pending.items():
+            key = (sensor_type, device_id, bucket_start(timestamp, resolution))
+            aggregate = pending.get(key)
+            if aggregate is None:
+                pending[key] = RollupAggregate(timestamp, value)
+            else:
+                aggregate.add(timestamp, value)
+
+    async def flush(self) -> bool:
+        async with self._flush_lock:
+            started = time.monotonic()
+            ok = True
+            for resolution in RESOLUTIONS:
+                pending = self._pending[resolution]
+                if not pending:
+                    continue
+                self._pending[resolution] = {}
+                try:
+                    await asyncio.wait_for(
+                        self.repo.upsert_rollups(resolution, pending), timeout=self.flush_timeout
+                    )
+                    self.flushed_buckets += len(pending)
+                except Exception as e:
+                    ok = False
+                    logger.warning(f"⚠️ Rollup flush ({resolution}) failed ({e!r}), retrying {len(pending)} buckets")
+                    self._restore(resolution, pending)
+            self.flushes += 1
+            self.last_flush_seconds = time.monotonic() - started
+            if not ok:
+                self.failed_flushes += 1
+            return ok
+
+    def _restore(self, resolution: str, pending: Dict[RollupKey, RollupAggregate]):
+        """รวม bucket ที่ flush ไม่สำเร็จกลับเข้า pending (อาจมี reading ใหม่เข้ามาระหว่างนั้นแล้ว)"""
+        current = self._pending[resolution]
+        for key, aggregate in pending.items():
+            existing = current.get(key)
+            if existing is None:
+                current[key] = aggregate
+            else:
+                aggregate.merge(existing)
+                current[key] = aggregate
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "pending_buckets": {r: len(p) for r, p in self._pending.items()},
+            "flushes": self.flushes,
+            "flushed_buckets": self.flushed_buckets,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
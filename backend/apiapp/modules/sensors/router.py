@@ -1,60 +1,106 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+import time
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Type
 
-# ✅ แก้ตรงนี้: เปลี่ยนจาก .schemas เป็น .model
-from .model import SensorPH, SensorPHVoltage, SensorTurbidity, SensorNH3, SensorTemperature, SensorTDS
+from .metrics import VALIDATE_SECONDS
+from .schemas import (
+    SensorPHRequest, SensorPHVoltageRequest, SensorTurbidityRequest,
+    SensorNH3Request, SensorTemperatureRequest, SensorTDSRequest,
+    SensorBatchRequest
+)
 
 # Import Use Case
+from apiapp.core.container import container
+from apiapp.modules.reports.use_case import ReportUseCase
+from .stream import SensorStreamBroker, StreamFullError
 from .use_case import SensorUseCase
+from .write_buffer import SensorWriteBuffer
 
 # สร้าง Router
 # หมายเหตุ: prefix="/sensors" แปลว่า endpoint ทั้งหมดจะขึ้นต้นด้วย /sensors
 router = APIRouter(prefix="/sensors", tags=["Sensors"])
 
-# Dependency Injection สำหรับ UseCase
-def get_use_case():
-    return SensorUseCase()
+# Dependency Injection สำหรับ UseCase (singleton จาก container ไม่สร้างใหม่ทุก request)
+get_use_case = container.provider(SensorUseCase)
+get_write_buffer = container.provider(SensorWriteBuffer)
+get_report_use_case = container.provider(ReportUseCase)
+get_stream = container.provider(SensorStreamBroker)
+
+# ⚡ Body ของ ingest: parse + validate JSON ในขั้นตอนเดียวด้วย model_validate_json
+# (เร็วกว่าให้ FastAPI json.loads แล้ว validate dict อีกรอบ และจับเวลา validate ได้)
+def json_body(model: Type[BaseModel]):
+    async def parse(request: Request):
+        body = await request.body()
+        started = time.perf_counter()
+        try:
+            return model.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+            )
+        finally:
+            VALIDATE_SECONDS.labels("http").observe(time.perf_counter() - started)
+    return Depends(parse)
+
+# ให้ OpenAPI ยังแสดง schema ของ body เหมือนเดิม
+def body_schema(model: Type[BaseModel]) -> dict:
+    return {"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": model.model_json_schema()}},
+    }}
 
 # ==========================================
 # 📥 POST: บันทึกข้อมูล (Add Data)
 # ==========================================
 
-@router.post("/add/ph")
-async def add_ph(data: SensorPH, use_case: SensorUseCase = Depends(get_use_case)):
+@router.post("/add/ph", openapi_extra=body_schema(SensorPHRequest))
+async def add_ph(data: SensorPHRequest = json_body(SensorPHRequest), use_case: SensorUseCase = Depends(get_use_case)):
     # ใส่ await เพราะ record_ph เป็น async function
     return await use_case.record_ph(data)
 
-@router.post("/add/ph_voltage")
-async def add_ph_voltage(data: SensorPHVoltage, use_case: SensorUseCase = Depends(get_use_case)):
+@router.post("/add/ph_voltage", openapi_extra=body_schema(SensorPHVoltageRequest))
+async def add_ph_voltage(data: SensorPHVoltageRequest = json_body(SensorPHVoltageRequest), use_case: SensorUseCase = Depends(get_use_case)):
     return await use_case.record_ph_voltage(data)
 
-@router.post("/add/turbidity")
-async def add_turbidity(data: SensorTurbidity, use_case: SensorUseCase = Depends(get_use_case)):
+@router.post("/add/turbidity", openapi_extra=body_schema(SensorTurbidityRequest))
+async def add_turbidity(data: SensorTurbidityRequest = json_body(SensorTurbidityRequest), use_case: SensorUseCase = Depends(get_use_case)):
     return await use_case.record_turbidity(data)
 
-@router.post("/add/nh3")
-async def add_nh3(data: SensorNH3, use_case: SensorUseCase = Depends(get_use_case)):
+@router.post("/add/nh3", openapi_extra=body_schema(SensorNH3Request))
+async def add_nh3(data: SensorNH3Request = json_body(SensorNH3Request), use_case: SensorUseCase = Depends(get_use_case)):
     return await use_case.record_nh3(data)
 
-@router.post("/add/temperature")
-async def add_temperature(data: SensorTemperature, use_case: SensorUseCase = Depends(get_use_case)):
+@router.post("/add/temperature", openapi_extra=body_schema(SensorTemperatureRequest))
+async def add_temperature(data: SensorTemperatureRequest = json_body(SensorTemperatureRequest), use_case: SensorUseCase = Depends(get_use_case)):
     return await use_case.record_temperature(data)
 
-@router.post("/add/tds")
-async def add_tds(data: SensorTDS, use_case: SensorUseCase = Depends(get_use_case)):
+@router.post("/add/tds", openapi_extra=body_schema(SensorTDSRequest))
+async def add_tds(data: SensorTDSRequest = json_body(SensorTDSRequest), use_case: SensorUseCase = Depends(get_use_case)):
     return await use_case.record_tds(data)
 
+@router.post("/add/batch")
+async def add_batch(data: SensorBatchRequest, use_case: SensorUseCase = Depends(get_use_case)):
+    """
+    บันทึกข้อมูลหลาย Sensor (และหลาย sample ต่อ sensor) ใน request เดียว
+    ลดจำนวน HTTP request ของ ESP32 จาก 6 ครั้งต่อรอบ เหลือ 1 ครั้ง
+    """
+    return await use_case.record_batch(data)
+
 # ==========================================
 # 📤 GET: ดึงข้อมูล (Retrieve Data)
 # ==========================================
 
 @router.get("/latest/{sensor_type}")
-async def get_latest(sensor_type: str, use_case: SensorUseCase = Depends(get_use_case)):
+async def get_latest(sensor_type: str, device_id: Optional[str] = None, use_case: SensorUseCase = Depends(get_use_case)):
     """
-    ดึงข้อมูลล่าสุดของ Sensor ที่ระบุ
+    ดึงข้อมูลล่าสุดของ Sensor ที่ระบุ (จาก hot window ในหน่วยความจำ ถ้าไม่มีค่อยถาม DB)
     sensor_type options: 'ph', 'turbidity', 'nh3', 'temperature', 'tds'
     """
-    result = await use_case.get_current(sensor_type)
+    result = await use_case.get_current(sensor_type, device_id)
     
     if not result:
         # ถ้าหาไม่เจอ ให้ return 404 (Not Found)
@@ -62,16 +108,163 @@ async def get_latest(sensor_type: str, use_case: SensorUseCase = Depends(get_use
     
     return result
 
+@router.get("/rollups/{sensor_type}")
+async def get_rollups(
+    sensor_type: str,
+    resolution: str = Query("hour", description="minute หรือ hour"),
+    device_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    use_case: SensorUseCase = Depends(get_use_case),
+):
+    """
+    สถิติรายนาที/รายชั่วโมง (count, min, max, mean, stddev, first, last) ต่อ device
+    เก็บนานกว่าข้อมูลดิบ ใช้ดูแนวโน้มระยะยาว
+    """
+    return await use_case.get_rollups(sensor_type, resolution, device_id, start, end, limit)
+
+
+@router.get("/stats/{sensor_type}")
+async def get_stats(
+    sensor_type: str,
+    device_id: Optional[str] = None,
+    window: Optional[str] = Query(None, description="เช่น 5m, 1h, 24h (ไม่ระบุ = ทุก window)"),
+    use_case: SensorUseCase = Depends(get_use_case),
+):
+    """
+    สถิติ sliding window ต่อ device: count, mean, variance, stddev, min, max, slope_per_hour
+    คำนวณต่อเนื่องจากทุก reading ที่รับเข้ามาใน process นี้ (ไม่ query DB, ingest ที่รันแยกไม่นับรวม)
+    """
+    return use_case.get_stats(sensor_type, device_id, window)
+
+
 @router.get("/history/{sensor_type}")
-async def get_history(sensor_type: str, limit: int = 20, use_case: SensorUseCase = Depends(get_use_case)):
+async def get_history(
+    sensor_type: str,
+    limit: int = Query(20, ge=1, le=1000),
+    device_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="เช่น timestamp,ph"),
+    points: Optional[int] = Query(None, ge=3, le=5000, description="ลดเหลือไม่เกิน N จุดด้วย LTTB (สำหรับกราฟ)"),
+    resolution: Optional[str] = Query(None, description="raw / minute / hour หรือความละเอียดเป็นวินาที"),
+    use_case: SensorUseCase = Depends(get_use_case),
+):
+    """
+    ดึงประวัติข้อมูล (Default 20 รายการล่าสุด) แบบแบ่งหน้า
+    - start/end: ช่วงเวลา (เวลาไทย), device_id: เฉพาะ device
+    - ส่ง next_cursor ของหน้าก่อนกลับมาใน cursor เพื่อดึงหน้าถัดไป
+    - points: คืนทั้งช่วงเวลาเป็นไม่เกิน N จุด (Largest-Triangle-Three-Buckets) แทนการแบ่งหน้า
+      โดยเลือกอ่านจากข้อมูลดิบ / rollup รายนาที / รายชั่วโมงให้เองตามความยาวช่วงเวลา (ไม่ระบุ start = 24 ชม.ล่าสุด)
+    """
+    return await use_case.get_history(
+        sensor_type, limit, device_id,
+        start=start, end=end, cursor=cursor,
+        fields=fields.split(",") if fields else None,
+        points=points,
+        resolution=resolution,
+    )
+
+@router.get("/aligned")
+async def get_aligned(
+    device_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    step: Optional[float] = Query(None, gt=0, description="วินาทีต่อแถว (ไม่ระบุ = ทุกจุดที่มีค่าเปลี่ยน)"),
+    sensors: Optional[str] = Query(None, description="เช่น ph,temperature (ไม่ระบุ = ทุก sensor)"),
+    max_age: Optional[float] = Query(None, gt=0, description="ค่าที่เก่ากว่านี้ (วินาที) ถือว่าไม่มีค่า"),
+    summary: bool = True,
+    use_case: SensorUseCase = Depends(get_use_case),
+):
+    """
+    ตารางรวมทุก sensor ของ device ที่เวลาเดียวกัน (as-of join: ค่าล่าสุดที่รู้ ณ แต่ละแถว)
+    คืนแบบ columnar {timestamps, columns: {sensor: [...]}} พร้อม correlation และ trend ต่อ sensor
+    truncated=true: ข้อมูลดิบในช่วงมากเกินไป อ่านได้เฉพาะส่วนใหม่สุด (ต้นช่วงเป็น null) ควรแบ่งช่วงให้เล็กลง
     """
-    ดึงประวัติข้อมูล (Default 20 รายการล่าสุด)
+    return await use_case.get_aligned(
+        device_id, start, end, step,
+        sensors=sensors.split(",") if sensors else None,
+        max_age=max_age,
+        summary=summary,
+    )
+
+@router.get("/export")
+async def export_sensors(
+    sensor_type: str = Query("all", description="all หรือชื่อ sensor เช่น ph"),
+    device_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    use_case: SensorUseCase = Depends(get_use_case),
+):
+    """
+    ดาวน์โหลดข้อมูลดิบทั้งช่วงเวลาเป็น CSV หรือ Parquet
+    ส่งออกทีละ batch จาก MongoDB cursor (ไม่โหลดทั้งหมดเข้าหน่วยความจำ)
+    คอลัมน์: sensor_type, device_id, timestamp, value
     """
-    return await use_case.get_history(sensor_type)
+    chunks, media_type, filename = use_case.export(sensor_type, device_id, start, end, format)
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @router.get("/status/analysis")
 async def get_system_status(use_case: SensorUseCase = Depends(get_use_case)):
     """
     วิเคราะห์คุณภาพน้ำรวมจากเซนเซอร์ทุกตัว
     """
-    return await use_case.analyze_water_quality()
\ No newline at end of file
+    return await use_case.analyze_water_quality()
+
+@router.get("/dashboard")
+async def get_dashboard(
+    use_case: SensorUseCase = Depends(get_use_case),
+    reports: ReportUseCase = Depends(get_report_use_case),
+):
+    """
+    ข้อมูลหน้า Dashboard ใน request เดียว: ค่าล่าสุดทุก sensor + ผลวิเคราะห์ + สรุปวันนี้
+    (แทนการยิง /latest/* 6 ครั้ง + /status/analysis ทุกรอบ polling)
+    """
+    return await use_case.get_dashboard(reports)
+
+@router.get("/stream")
+async def stream_sensors(use_case: SensorUseCase = Depends(get_use_case)):
+    """
+    Live stream แบบ Server-Sent Events
+    - snapshot: ค่าล่าสุดทุก sensor + ผลวิเคราะห์ (ครั้งแรกที่เชื่อมต่อ)
+    - reading: เฉพาะค่าที่เปลี่ยน ต่อ device
+    - analysis: เมื่อสถานะคุณภาพน้ำเปลี่ยน
+    - resync: client อ่านไม่ทัน ให้เชื่อมต่อใหม่เพื่อรับ snapshot
+    """
+    try:
+        events = use_case.open_stream()
+    except StreamFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/stream/stats")
+async def get_stream_stats(stream: SensorStreamBroker = Depends(get_stream)):
+    """
+    จำนวน client ที่เชื่อมต่อ stream และจำนวน event ที่ส่งไป
+    """
+    return stream.stats()
+
+@router.get("/buffer/stats")
+async def get_buffer_stats(write_buffer: SensorWriteBuffer = Depends(get_write_buffer)):
+    """
+    สถานะของ write-behind buffer (จำนวนที่ค้าง, ขนาด flush ล่าสุด, lag, ข้อมูลที่ค้างในไฟล์ spill)
+    """
+    return write_buffer.stats()
+
+@router.get("/deadband/stats")
+async def get_deadband_stats(use_case: SensorUseCase = Depends(get_use_case)):
+    """
+    อัตราการบีบอัดของ Deadband ต่อ device (received / saved) แยกตาม sensor
+    """
+    return use_case.get_deadband_stats()
\ No newline at end of file
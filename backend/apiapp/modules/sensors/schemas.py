@@ -1,12 +1,23 @@
-from typing import List, Optional
+from typing import Annotated, List, Literal, Optional
 from datetime import datetime, timedelta
-from pydantic import Field
+from pydantic import AfterValidator, BaseModel, Field
 from beanie import Document # ✅ ต้องใช้ Document เพื่อบันทึกลง MongoDB
 
 # --- ฟังก์ชันเวลา (UTC+7) ---
 def now_thai():
     return datetime.utcnow() + timedelta(hours=7)
 
+def to_thai_naive(ts: datetime) -> datetime:
+    """timestamp จาก client -> เวลาไทยแบบ Naive (Naive ถือว่าเป็นเวลาไทยอยู่แล้ว, มี offset แปลงเป็น UTC+7)"""
+    offset = ts.utcoffset()
+    if offset is None:
+        return ts.replace(tzinfo=None)
+    return ts.replace(tzinfo=None) - offset + timedelta(hours=7)
+
+# timestamp ที่ client ส่งมาทุกช่องทาง (HTTP / MQTT) เก็บเป็นเวลาไทยแบบ Naive เหมือน now_thai()
+# กันเทียบ Naive กับ Aware ไม่ได้ (hot window / rollup) และค่าใน DB เพี้ยน 7 ชั่วโมง
+ThaiDatetime = Annotated[datetime, AfterValidator(to_thai_naive)]
+
 # ==========================================
 # 📡 Sensor Models (ข้อมูลดิบจาก Sensor)
 # ==========================================
@@ -63,4 +74,56 @@ class SensorPHVoltage(Document):
     timestamp: datetime = Field(default_factory=now_thai)
 
     class Settings:
-        name = "sensor_ph_voltage"
\ No newline at end of file
+        name = "sensor_ph_voltage"
+
+# ==========================================
+# ⚡ Ingest Requests (body ของ POST /sensors/add/*)
+# ==========================================
+# BaseModel ธรรมดาแทน Beanie Document: validate ครั้งเดียวด้วย pydantic-core
+# แล้ว SensorRepository เขียนเป็น dict ตรงลง collection
+
+class SensorPHRequest(BaseModel):
+    ph: float
+    device_id: str = "esp32_default"
+    timestamp: ThaiDatetime = Field(default_factory=now_thai)
+
+class SensorPHVoltageRequest(BaseModel):
+    voltage: float
+    device_id: str = "esp32_default"
+    timestamp: ThaiDatetime = Field(default_factory=now_thai)
+
+class SensorTurbidityRequest(BaseModel):
+    NTU: float
+    device_id: str = "esp32_default"
+    timestamp: ThaiDatetime = Field(default_factory=now_thai)
+
+class SensorNH3Request(BaseModel):
+    NH3: float
+    device_id: str = "esp32_default"
+    timestamp: ThaiDatetime = Field(default_factory=now_thai)
+
+class SensorTemperatureRequest(BaseModel):
+    temperature: float
+    device_id: str = "esp32_default"
+    timestamp: ThaiDatetime = Field(default_factory=now_thai)
+
+class SensorTDSRequest(BaseModel):
+    tds: float
+    device_id: str = "esp32_default"
+    timestamp: ThaiDatetime = Field(default_factory=now_thai)
+
+# ==========================================
+# 📦 Batch Ingest (หลาย sensor / หลาย sample ใน request เดียว)
+# ==========================================
+
+SensorType = Literal["ph", "ph_voltage", "turbidity", "nh3", "temperature", "tds"]
+
+class SensorBatchReading(BaseModel):
+    sensor_type: SensorType
+    value: float
+    # ถ้า ESP32 ไม่ส่งเวลามา ให้ใช้เวลาที่ server รับข้อมูล
+    timestamp: ThaiDatetime = Field(default_factory=now_thai)
+
+class SensorBatchRequest(BaseModel):
+    device_id: str = "esp32_default"
+    readings: List[SensorBatchReading] = Field(min_length=1)
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from loguru import logger
+
+from apiapp.infrastructure.lease import MongoLease
+from .model import now_thai
+from .rollup import bucket_start
+
+HOUR = timedelta(hours=1)
+
+
+def next_hour(now: datetime) -> datetime:
+    return bucket_start(now, "hour") + HOUR
+
+
+class HourlySnapshotScheduler:
+    """
+    บันทึก Snapshot คุณภาพน้ำตรงรอบ hh:00 (เวลาไทย) ครั้งเดียวต่อชั่วโมงแม้มีหลาย worker
+
+    - ตื่นตามเวลานาฬิกาจริงทุกต้นชั่วโมง (คำนวณเวลานอนใหม่ทุกรอบ ไม่สะสมการเลื่อน)
+    - แต่ละชั่วโมง (slot) ต้องได้ MongoLease ก่อน worker อื่นที่ตื่นพร้อมกันจะข้ามไป
+    - หลังระบบหยุดไป ย้อนบันทึกชั่วโมงที่ขาดไม่เกิน catchup_hours (ใช้ค่าล่าสุด ณ เวลานั้นจาก DB)
+    - ทำไม่สำเร็จจะลองใหม่ทุก retry_seconds (slot ยังไม่ถูกบันทึกว่าเสร็จ)
+    """
+
+    def __init__(self, use_case, lease: MongoLease, catchup_hours: int, retry_seconds: float = 60):
+        self.use_case = use_case
+        self.lease = lease
+        self.catchup_hours = catchup_hours
+        self.retry_seconds = retry_seconds
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------------------------------------------------------
+    # 🔌 Lifecycle
+    # ---------------------------------------------------------
+    async def start(self):
+        if self._task:
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🚀 Hourly snapshot scheduler started ({self.lease.owner})")
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+        logger.info("🛑 Hourly snapshot scheduler stopped")
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await self.tick()
+                delay = (next_hour(now_thai()) - now_thai()).total_seconds()
+            except Exception as e:
+                logger.error(f"❌ Hourly snapshot error: {e}")
+                delay = self.retry_seconds
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=max(delay, 0) + 1)
+            except asyncio.TimeoutError:
+                pass
+
+    # ---------------------------------------------------------
+    # ⏰ 1 รอบ: ชั่วโมงที่ยังไม่ได้บันทึกทั้งหมด เก่า -> ใหม่
+    # ---------------------------------------------------------
+    async def tick(self) -> int:
+        current = bucket_start(now_thai(), "hour")
+        last = await self.lease.last_slot()
+        slot = current if last is None else max(last + HOUR, current - HOUR * self.catchup_hours)
+        done = 0
+        while slot <= current:
+            if not await self.lease.acquire(slot):
+                # worker อื่นกำลังทำหรือทำไปแล้ว
+                return done
+            try:
+                await self.use_case.run_hourly_snapshot(at=slot, catch_up=slot < current)
+            except Exception:
+                await self.lease.release()
+                raise
+            await self.lease.complete(slot)
+            done += 1
+            slot += HOUR
+        return done
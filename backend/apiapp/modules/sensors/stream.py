@@ -0,0 +1,210 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Set
+
+from loguru import logger
+from redis.asyncio import Redis
+
+# channel ของ Redis ที่ทุก process (API ทุก worker + ingest ที่รันแยก) ใช้กระจาย event ร่วมกัน
+STREAM_CHANNEL = "aquasense:sensor-stream"
+
+
+class StreamFullError(Exception):
+    """จำนวน client ที่เชื่อมต่อ stream ถึงขีดจำกัดแล้ว"""
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def format_event(event: str, data) -> str:
+    """จัดรูปแบบข้อความ Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default, ensure_ascii=False)}\n\n"
+
+
+class SensorStreamBroker:
+    """
+    กระจาย event ของ sensor ไปยัง client ที่เปิด /sensors/stream (SSE)
+
+    - client แต่ละตัวมี asyncio.Queue ของตัวเอง (ขนาดจำกัด) ไม่มี task หรือ query DB ต่อ client
+      connection ที่ไม่มีอะไรเกิดขึ้นจึงมีต้นทุนแค่ queue ว่างๆ + heartbeat
+    - serialize ข้อความครั้งเดียวต่อ event แล้วส่ง string เดียวกันให้ทุก client
+    - client ที่อ่านไม่ทัน (queue เต็ม) จะถูกล้าง queue แล้วได้ event "resync" ให้ดึง snapshot ใหม่
+    - ปิด stream เองเมื่อครบ max_seconds (EventSource จะเชื่อมต่อใหม่อัตโนมัติ)
+      เพราะ uvicorn รอ response ที่ยังส่งอยู่ให้จบก่อนปิด server / ก่อนเข้า lifespan shutdown
+    - redis (SENSOR_STREAM_FANOUT): event ที่ publish ใน process นี้ส่งต่อผ่าน Redis pub/sub ด้วย
+      client ที่ต่อกับ uvicorn worker อื่น หรือ API ขณะที่ ingest รันแยก process จึงได้ event เดียวกัน
+      (ไม่เปิด = เห็นเฉพาะ reading ที่ ingest ใน process เดียวกัน)
+    """
+
+    def __init__(
+        self,
+        queue_size: int,
+        max_subscribers: int,
+        heartbeat_seconds: float,
+        max_seconds: float,
+        redis: Optional[Redis] = None,
+        channel: str = STREAM_CHANNEL,
+    ):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_seconds = max_seconds
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.last_analysis: Optional[tuple] = None  # (status, issues) ล่าสุดที่ส่งไปแล้ว
+        self.published = 0
+        self.resyncs = 0
+
+        # 📡 fan-out ข้าม process (event ของตัวเองที่วนกลับมาจาก Redis ข้ามด้วย origin)
+        self.redis = redis
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._outbox: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.relayed = 0
+        self.relay_dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def active(self) -> bool:
+        """มีผู้รับ event: client ใน process นี้ หรือ process อื่นผ่าน Redis"""
+        return bool(self._subscribers) or self._outbox is not None
+
+    # ---------------------------------------------------------
+    # 🔌 Lifecycle (เฉพาะเมื่อเปิด fan-out ผ่าน Redis)
+    # ---------------------------------------------------------
+    async def start(self):
+        if self.redis is None or self._tasks:
+            return
+        self._outbox = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._send()), asyncio.create_task(self._listen())]
+        logger.info(f"📡 Sensor stream fan-out started ({self.channel})")
+
+    async def stop(self):
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._outbox = None
+        await self.redis.aclose()
+        logger.info("🛑 Sensor stream fan-out stopped")
+
+    def check_capacity(self):
+        if len(self._subscribers) >= self.max_subscribers:
+            raise StreamFullError(f"Sensor stream is full ({self.max_subscribers} subscribers)")
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data):
+        if not self.active:
+            return
+        message = format_event(event, data)
+        self._deliver(message)
+        if self._outbox is not None:
+            try:
+                self._outbox.put_nowait(message)
+            except asyncio.QueueFull:
+                # Redis ช้า/ล่ม: ไม่ให้ ingest ต้องรอ process อื่นจะได้ resync ตอนเชื่อมต่อใหม่
+                self.relay_dropped += 1
+
+    def _deliver(self, message: str):
+        if not self._subscribers:
+            return
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._resync(queue)
+        self.published += 1
+
+    async def _send(self):
+        while True:
+            message = await self._outbox.get()
+            try:
+                await self.redis.publish(self.channel, json.dumps({"origin": self.origin, "message": message}))
+            except Exception as e:
+                self.relay_dropped += 1
+                logger.warning(f"⚠️ Sensor stream publish to Redis failed: {e!r}")
+                await asyncio.sleep(1)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for item in pubsub.listen():
+                    if item["type"] != "message":
+                        continue
+                    payload = json.loads(item["data"])
+                    if payload["origin"] != self.origin:
+                        self._deliver(payload["message"])
+                        self.relayed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Sensor stream subscription lost ({e!r}), reconnecting")
+                # ระหว่างหลุดอาจพลาด event จาก process อื่น: ให้ client ดึง snapshot ใหม่
+                for queue in list(self._subscribers):
+                    self._resync(queue)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _resync(self, queue: asyncio.Queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(format_event("resync", {}))
+        self.resyncs += 1
+
+    async def events(self, initial: Optional[Callable[[], Awaitable[str]]] = None) -> AsyncIterator[str]:
+        """
+        generator สำหรับ StreamingResponse: ส่ง initial -> event จาก queue -> heartbeat เมื่อว่าง
+        subscribe ภายใน generator เพื่อให้ unsubscribe ใน finally เสมอ (รวมถึงตอน client หลุดกลางทาง)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_seconds
+        queue = self.subscribe()
+        try:
+            # ให้ EventSource รอ 3 วินาทีก่อนเชื่อมต่อใหม่
+            yield "retry: 3000\n\n"
+            if initial:
+                yield await initial()
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=min(self.heartbeat_seconds, remaining))
+                except asyncio.TimeoutError:
+                    # comment line ของ SSE: กัน proxy / load balancer ตัด connection ที่เงียบ
+                    yield ": keep-alive\n\n"
+                    continue
+                yield message
+        finally:
+            self.unsubscribe(queue)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+            "resyncs": self.resyncs,
+            "fanout": self.redis is not None,
+            "relayed": self.relayed,
+            "relay_dropped": self.relay_dropped,
+        }
@@ -1,257 +1,855 @@
+import asyncio
 import time
-from datetime import datetime
-from typing import Optional, Dict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Tuple
+from loguru import logger
+from pymongo.errors import DuplicateKeyError
+from apiapp.core.exceptions import ValidationError
+from apiapp.infrastructure.jobs import JobQueue
 from apiapp.modules.notification.service import LineBotService
-from .repository import SensorRepository
+from apiapp.modules.rules.engine import RuleEngine
+from .anomaly import AnomalyDetector, AnomalyState
+from .compression import CompressionPolicy, Decision
+from .deadband import DeadbandStore, from_epoch, to_epoch
+from . import align
+from .downsample import downsample
+from .export import csv_chunks, parquet_available, parquet_chunks
+from .hot_window import HotWindow
+from . import metrics
+from .model import SENSOR_VALUE_FIELDS, now_thai
+from .planner import TIERS, TierPlanner
+from .rolling import RollingStats
+from .rollup import RESOLUTIONS, SensorRollupBuffer, summarize
+from .repository import SensorRepository, decode_cursor, encode_cursor
+from .stream import SensorStreamBroker, format_event
+from .write_buffer import SensorWriteBuffer
 from .schemas import (
-    SensorPH, SensorPHVoltage, SensorTurbidity, SensorNH3, SensorTemperature, SensorTDS
+    SensorPHRequest, SensorPHVoltageRequest, SensorTurbidityRequest,
+    SensorNH3Request, SensorTemperatureRequest, SensorTDSRequest,
+    SensorBatchRequest
 )
 from apiapp.modules.reports.model import WaterAnalysisLog
+from apiapp.modules.reports.use_case import ReportUseCase
 class SensorUseCase:
-    # ---------------------------------------------------------
-    # 🧠 ส่วนความจำของระบบ (Class Variables)
-    # ---------------------------------------------------------
-    _last_alert_time: float = 0
-
-    # เก็บค่าล่าสุดที่ "บันทึกลง DB" (เอาไว้เทียบ Deadband)
-    _last_saved_values: dict[str, Optional[float]] = {
-        "ph": None, "ph_voltage": None, "turbidity": None, "nh3": None, "temperature": None, "tds": None
-    }
-    
-    # เก็บเวลาล่าสุดที่ "บันทึกลง DB" (เอาไว้ทำ Heartbeat)
-    _last_saved_times: dict[str, float] = {
-        "ph": 0, "ph_voltage": 0, "turbidity": 0, "nh3": 0, "temperature": 0, "tds": 0
-    }
-
-    # ตัวแปรจำเวลาบันทึก Snapshot รายชั่วโมง
-    _last_log_time: float = 0 
-
     # 🎯 ตั้งค่าความละเอียด
     THRESHOLDS = {
         "ph": 0.1, "ph_voltage": 0.01, "turbidity": 0.4, "nh3": 0.05, "temperature": 0.5, "tds": 10.0
     }
 
-    def __init__(self):
-        self.repo = SensorRepository()
-        self.line_service = LineBotService()
+    def __init__(
+        self,
+        repo: SensorRepository,
+        line_service: LineBotService,
+        deadband: DeadbandStore,
+        policies: Dict[str, CompressionPolicy],
+        hot_window: HotWindow,
+        planner: TierPlanner,
+        rules: RuleEngine,
+        write_buffer: Optional[SensorWriteBuffer] = None,
+        stream: Optional[SensorStreamBroker] = None,
+        rollups: Optional[SensorRollupBuffer] = None,
+        anomaly: Optional[AnomalyDetector] = None,
+        rolling: Optional[RollingStats] = None,
+        jobs: Optional[JobQueue] = None,
+        history_scan_limit: int = 200_000,
+        history_default_span: timedelta = timedelta(hours=24),
+        export_batch_size: int = 5000,
+        align_max_rows: int = 10000,
+        analysis_cache_ttl: float = 5.0,
+    ):
+        self.repo = repo
+        self.line_service = line_service
+        # เก็บค่า/เวลาล่าสุดที่ "บันทึกลง DB" แยกตาม (device_id, sensor_type) ดู deadband.py
+        # และ compression policy ต่อ sensor_type ดู compression.py
+        # (อายุเท่ากับ app: สร้างครั้งเดียวใน infrastructure/container.py)
+        self._deadband = deadband
+        self._policies = policies
+        # ค่าล่าสุด N ตัวต่อ (device_id, sensor_type) ในหน่วยความจำ ดู hot_window.py
+        self.hot_window = hot_window
+        self.write_buffer = write_buffer
+        # กระจาย reading/analysis ที่เปลี่ยนไปยัง client ของ /sensors/stream
+        self.stream = stream
+        # rollup รายนาที/รายชั่วโมงของทุก reading ที่รับเข้ามา ดู rollup.py
+        self.rollups = rollups
+        # ตรวจ spike / rate / flatline ทุก reading (reading ที่ผิดปกติบันทึกเสมอ) ดู anomaly.py
+        self.anomaly = anomaly
+        # mean / variance / min / max / slope แบบ sliding window (5m, 1h, 24h) ดู rolling.py
+        self.rolling = rolling
+        # ส่งแจ้งเตือน LINE ผ่าน arq worker (None = ส่งเองใน process นี้)
+        self.jobs = jobs
+        # เลือก raw / minute / hour ตามช่วงเวลาที่ขอ ดู planner.py
+        self.planner = planner
+        # กฎจัดระดับคุณภาพน้ำ (แก้ไขได้ขณะรันผ่าน /rules) ดู modules/rules
+        self.rules = rules
+        # document สูงสุดที่อ่านต่อ segment ของ 1 request (กัน scan ข้อมูลดิบไม่จำกัด)
+        self.history_scan_limit = history_scan_limit
+        self.history_default_span = history_default_span
+        self.export_batch_size = export_batch_size
+        self.align_max_rows = align_max_rows
+
+        # ---------------------------------------------------------
+        # 🧠 ส่วนความจำของระบบ
+        # ---------------------------------------------------------
+        self._last_alert_time: float = 0
+        # งานส่ง LINE ของ anomaly ที่ยังไม่เสร็จ (ถือ reference กัน task ถูก GC)
+        self._alert_tasks: set = set()
+
+        # ผลวิเคราะห์ล่าสุด (memo): ใช้ซ้ำจนกว่า reading ล่าสุดของ sensor ใดจะเปลี่ยน (_analysis_version เพิ่ม)
+        # ถ้ามีบางค่าที่มาจาก DB (ไม่อยู่ใน hot window เช่น ingest รันแยก process) ใช้ได้ไม่เกิน TTL
+        self._analysis_version: int = 0
+        self._analysis_cache: Optional[tuple] = None  # (version, expires_at, (latest, values, result))
+        self._analysis_inflight: Optional[Tuple[int, asyncio.Future]] = None
+        self.analysis_cache_ttl = analysis_cache_ttl
 
     # ---------------------------------------------------------
     # 🕵️‍♂️ ฟังก์ชันช่วยตัดสินใจ (Helper Function)
     # ---------------------------------------------------------
-    def _determine_water_quality(self, ph, temp, ntu, nh3, tds):
-        issues = [] 
-
-        # 3. ตรวจสอบเงื่อนไข
-        if ph is not None:
-            if ph < 6.5: issues.append(f"pH ต่ำเกินไป ({ph:.1f})")
-            elif ph > 8.5: issues.append(f"pH สูงเกินไป ({ph:.1f})")
-
-        if temp is not None:
-            if temp < 15: issues.append(f"น้ำเย็นเกินไป ({temp:.1f}°C)")
-            elif temp > 30: issues.append(f"น้ำร้อนเกินไป ({temp:.1f}°C)")
-
-        if ntu is not None:
-            if ntu > 5.0: issues.append(f"น้ำขุ่นมาก ({ntu:.1f} NTU)")
-
-        if tds is not None:
-            if tds > 400: issues.append(f"ค่า TDS สูงเกินไป ({tds:.1f} ppm)")
-
-        # 4. สรุปผล
-        status = "Good"
-        color = "green"
-        message = "คุณภาพน้ำปกติ เหมาะแก่การเลี้ยงสัตว์น้ำ"
-
-        if issues:
-            is_critical = any("อันตราย" in msg for msg in issues) or \
-                          any("สูงเกินไป" in msg for msg in issues) or \
-                          any("ต่ำเกินไป" in msg for msg in issues)
-
-            if is_critical:
-                status = "Critical"
-                color = "red"
-                message = "คุณภาพน้ำวิกฤต! กรุณาตรวจสอบทันที"
-            else:
-                status = "Warning"
-                color = "orange"
-                message = "คุณภาพน้ำเริ่มมีปัญหา"
-        
-        return status, color, message, issues
+    def _determine_water_quality(
+        self, values: Dict[str, Optional[float]], device_id: Optional[str] = None, advance: bool = False
+    ):
+        """
+        (status, color, message, issues) ตามกฎใน RuleEngine (override ของ device_id ถ้ามี)
+        advance=True เลื่อนสถานะ hysteresis ด้วย (เฉพาะ _compute_analysis ที่เดียว ค่าอื่นอ่านอย่างเดียว)
+        """
+        if advance:
+            return self.rules.advance(values, device_id)
+        return self.rules.evaluate(values, device_id)
+
+    def invalidate_analysis(self):
+        """ทิ้งผลวิเคราะห์ที่ memo ไว้ (เช่น หลัง reload กฎ)"""
+        self._analysis_version += 1
+
+    def _compress(self, sensor_type: str, value: float,
+                  device_id: str = "esp32_default", timestamp: Optional[datetime] = None,
+                  force: bool = False) -> Decision:
+        """ส่ง reading เข้า compression policy ของ sensor นั้น (ดู compression.py) force = บันทึกแน่นอน"""
+        started = time.perf_counter()
+        t = to_epoch(timestamp) if timestamp else time.time()
+        state = self._deadband.get(device_id, sensor_type)
+        policy = self._policies[sensor_type]
+        decision = policy.force(state, timestamp, t, value) if force else policy.offer(state, timestamp, t, value)
+        metrics.DECIDE_SECONDS.labels(sensor_type).observe(time.perf_counter() - started)
+        return decision
+
+    async def flush_pending(self):
+        """
+        บันทึกจุดที่ policy ยังถือไว้ (SDT เก็บ reading ล่าสุดไว้รอดูแนวโน้ม)
+        เรียกตอน shutdown ก่อนปิด write buffer
+        """
+        pending: Dict[str, list] = {}
+        for (device_id, sensor_type), state in self._deadband.items():
+            for timestamp, value in self._policies[sensor_type].flush(state):
+                record = self.repo.build_record(sensor_type, device_id, value, timestamp)
+                pending.setdefault(sensor_type, []).append(record)
+                state.saved += 1
+                metrics.READINGS_SAVED.labels(metrics.device_label(device_id), sensor_type, "shutdown").inc()
+        await self._write(pending)
+        count = sum(len(records) for records in pending.values())
+        if count:
+            logger.info(f"💾 Flushed {count} pending compressed readings")
+        return count
+
+    async def warm_start_deadband(self):
+        """
+        โหลดค่าล่าสุดของแต่ละ device จาก DB เข้า Deadband ตอนเริ่มระบบ
+        กันไม่ให้ทุกค่าแรกหลัง restart ถูกบันทึกพร้อมกัน (write storm)
+        """
+        seeded = 0
+        for sensor_type in self.THRESHOLDS:
+            for row in await self.repo.get_latest_per_device(sensor_type):
+                self._deadband.seed(row["device_id"], sensor_type, row["value"], row["timestamp"])
+                seeded += 1
+        logger.info(f"🧠 Deadband warm start: {seeded} (device, sensor) states loaded")
+        return seeded
 
-    def _should_save(self, sensor_type: str, current_value: float) -> bool:
-        now = time.time()
-        last_val = self._last_saved_values[sensor_type]
-        last_time = self._last_saved_times[sensor_type]
-        threshold = self.THRESHOLDS[sensor_type]
+    def get_deadband_stats(self):
+        return self._deadband.compression_stats()
 
-        if last_val is None: return True
-        if abs(current_value - last_val) >= threshold: return True
-        if (now - last_time) > 1800: return True 
+    # ---------------------------------------------------------
+    # 💾 ส่วนบันทึกข้อมูล (Record)
+    # ---------------------------------------------------------
+    async def record_ph(self, data: SensorPHRequest):
+        return await self._record_one("ph", data.device_id, data.ph, data.timestamp)
 
-        return False
+    async def record_ph_voltage(self, data: SensorPHVoltageRequest):
+        return await self._record_one("ph_voltage", data.device_id, data.voltage, data.timestamp)
 
-    def _update_memory(self, sensor_type: str, value: float):
-        self._last_saved_values[sensor_type] = value
-        self._last_saved_times[sensor_type] = time.time()
+    async def record_turbidity(self, data: SensorTurbidityRequest):
+        # ✅ Scale NTU value ทำใน _ingest (max 125 -> 10.0)
+        return await self._record_one("turbidity", data.device_id, data.NTU, data.timestamp)
+
+    async def record_nh3(self, data: SensorNH3Request):
+        return await self._record_one("nh3", data.device_id, data.NH3, data.timestamp)
+
+    async def record_temperature(self, data: SensorTemperatureRequest):
+        return await self._record_one("temperature", data.device_id, data.temperature, data.timestamp)
+
+    async def record_tds(self, data: SensorTDSRequest):
+        return await self._record_one("tds", data.device_id, data.tds, data.timestamp)
+
+    async def record_batch(self, data: SensorBatchRequest, write_retries: int = 0, retry_backoff: float = 0.5):
+        """
+        บันทึกหลายค่าจาก ESP32 ใน request เดียว
+        - ส่งเข้า compression policy ทีละค่า (ตามลำดับที่ส่งมา)
+        - ค่าที่ผ่านจะถูกบันทึกด้วย insert_many ครั้งเดียวต่อ collection
+        - write_retries: ช่องทางที่ไม่มีใครส่งซ้ำให้ (MQTT) ลอง insert ใหม่แล้ว spill แทนการ raise ดู _write
+        """
+        readings = [(r.sensor_type, r.value, r.timestamp) for r in data.readings]
+        results = await self._ingest(data.device_id, readings, write_retries, retry_backoff)
+
+        saved_count = sum(1 for r in results if r["saved"])
+
+        return {
+            "status": "success",
+            "device_id": data.device_id,
+            "saved": saved_count,
+            "suppressed": len(results) - saved_count,
+            "results": results,
+        }
+
+    async def _record_one(self, sensor_type: str, device_id: str, value: float, timestamp: datetime):
+        result = (await self._ingest(device_id, [(sensor_type, value, timestamp)]))[0]
+        return {"status": "success", **result}
+
+    async def _ingest(
+        self, device_id: str, readings: List[Tuple[str, float, datetime]], write_retries: int = 0,
+        retry_backoff: float = 0.5,
+    ) -> List[dict]:
+        """
+        Pipeline กลางของการรับข้อมูล: Compression policy -> สร้าง record -> ส่งเข้า write buffer
+        (ถ้า write buffer ไม่ได้เปิด จะ insert_many ลง DB ทันทีต่อ collection)
+        """
+        results = []
+        pending: Dict[str, list] = {}
+        streaming = self.stream is not None and self.stream.active
+        # label ของ metric (device ที่เกินขีดจำกัดรวมเป็น "other" ดู metrics.DeviceLabels)
+        device_label = metrics.device_label(device_id)
+        changes = []
+        anomalies = []
+
+        for sensor_type, value, timestamp in readings:
+            # ✅ Scale NTU value: max 125 -> 10.0 (divided by 12.5)
+            if sensor_type == "turbidity":
+                value = value / 12.5
+
+            if streaming:
+                # ส่งเฉพาะค่าที่เปลี่ยนจาก reading ก่อนหน้าของ device นี้ (delta)
+                previous = self.hot_window.latest(sensor_type, device_id)
+                if previous is None or previous[2] != value:
+                    changes.append({"type": sensor_type, "value": value, "timestamp": timestamp})
+            previous_latest = self.hot_window.latest(sensor_type)
+            self.hot_window.add(device_id, sensor_type, value, timestamp)
+            if previous_latest != self.hot_window.latest(sensor_type):
+                # ค่าล่าสุดเปลี่ยน (ค่า / เวลา / device) -> snapshot ที่ memo ไว้ใช้ไม่ได้แล้ว
+                # (เวลาใน latest และ device ที่ใช้เลือก override ต้องตามทันแม้ค่าเท่าเดิม)
+                self._analysis_version += 1
+            if self.rollups and self.rollups.running:
+                self.rollups.add(device_id, sensor_type, timestamp, value)
+            t = to_epoch(timestamp) if timestamp else time.time()
+            if self.rolling:
+                self.rolling.add(device_id, sensor_type, t, value)
+            state = self._deadband.get(device_id, sensor_type)
+            state.received += 1
+            metrics.READINGS_RECEIVED.labels(device_label, sensor_type).inc()
+            flags = self._detect_anomaly(state, device_id, sensor_type, value, timestamp, t, anomalies)
+            decision = self._compress(sensor_type, value, device_id, timestamp, force=bool(flags))
+            if decision.points:
+                metrics.READINGS_SAVED.labels(device_label, sensor_type, decision.reason).inc(len(decision.points))
+            else:
+                metrics.READINGS_SUPPRESSED.labels(device_label, sensor_type).inc()
+            for point_ts, point_value in decision.points:
+                record = self.repo.build_record(sensor_type, device_id, point_value, point_ts)
+                pending.setdefault(sensor_type, []).append(record)
+            state.saved += len(decision.points)
+            # saved = reading นี้ถูกบันทึกทันที (SDT อาจบันทึกจุดก่อนหน้าแทน ดู reason)
+            saved = (timestamp, value) in decision.points
+            result = {"type": sensor_type, "value": value, "saved": saved, "reason": decision.reason}
+            if flags:
+                result["anomalies"] = flags
+            results.append(result)
+
+        await self._write(pending, write_retries, retry_backoff)
+        # history จาก hot window ใช้เฉพาะ record ที่ส่งบันทึกสำเร็จแล้ว (มี _id เหมือนใน DB)
+        for sensor_type, records in pending.items():
+            field = SENSOR_VALUE_FIELDS[sensor_type]
+            for record in records:
+                self.hot_window.add_saved(device_id, sensor_type, record["_id"], record[field], record["timestamp"])
+        if changes:
+            self.stream.publish("reading", {"device_id": device_id, "readings": changes})
+            await self._publish_analysis()
+        if anomalies:
+            self._report_anomalies(device_id, anomalies)
+        return results
+
+    def _detect_anomaly(self, state, device_id: str, sensor_type: str, value: float,
+                        timestamp: Optional[datetime], t: float, anomalies: List[dict]) -> List[str]:
+        """ตรวจ reading ด้วย anomaly detector (O(1)) แล้วเก็บรายการที่ผิดปกติไว้รายงานหลังบันทึก"""
+        if self.anomaly is None:
+            return []
+        if state.anomaly is None:
+            state.anomaly = AnomalyState()
+        flags = self.anomaly.check(state.anomaly, sensor_type, t, value)
+        if flags:
+            for kind in flags:
+                metrics.ANOMALIES.labels(metrics.device_label(device_id), sensor_type, kind).inc()
+            anomalies.append({
+                "type": sensor_type,
+                "value": value,
+                "timestamp": timestamp,
+                "kinds": flags,
+                "mean": state.anomaly.mean,
+                "alert": self.anomaly.should_alert(state.anomaly, t),
+            })
+        return flags
+
+    def _report_anomalies(self, device_id: str, anomalies: List[dict]):
+        """ส่ง event ไป /sensors/stream ทันที + แจ้ง LINE (มี cooldown ต่อ device/sensor) โดยไม่รอ ingest"""
+        if self.stream is not None:
+            self.stream.publish("anomaly", {"device_id": device_id, "readings": anomalies})
+        alerts = [a for a in anomalies if a["alert"]]
+        if not alerts:
+            return
+        for a in alerts:
+            logger.warning(f"🚨 Anomaly {device_id}/{a['type']}: {', '.join(a['kinds'])} value={a['value']:.2f}")
+        message = f"🚨 ตรวจพบค่าผิดปกติ ({device_id})\n"
+        for a in alerts:
+            message += f"• {a['type']} = {a['value']:.2f} ({', '.join(a['kinds'])}, ค่าเฉลี่ย {a['mean']:.2f})\n"
+        task = asyncio.create_task(self._send_alert(message))
+        self._alert_tasks.add(task)
+        task.add_done_callback(self._alert_tasks.discard)
+
+    async def _write(self, pending: Dict[str, list], retries: int = 0, backoff: float = 0.5):
+        """
+        ส่ง record เข้า write buffer หรือ insert ตรงถ้า buffer ไม่ได้เปิด
+        retries > 0: insert ตรงที่ล้มเหลวจะลองใหม่แล้ว spill ลงไฟล์ของ write buffer (ไม่ raise)
+        ไม่ได้ลองทั้ง reading ใหม่ เพราะ compression / rollup / hot window รับค่านั้นไปแล้ว
+        """
+        for sensor_type, records in pending.items():
+            if self.write_buffer and self.write_buffer.running:
+                self.write_buffer.add(sensor_type, records)
+            elif retries and self.write_buffer:
+                await self.write_buffer.insert_or_spill(sensor_type, records, retries, backoff)
+            else:
+                await self.repo.add_many(sensor_type, records)
+
+    # --- ส่วนดึงข้อมูล (Get) ---
+    # อ่านจาก hot window ก่อน (ไม่แตะ DB) ถ้าไม่มีข้อมูลพอค่อยถาม MongoDB
+    async def get_current(self, sensor_type: str, device_id: Optional[str] = None):
+        reading = self.hot_window.latest(sensor_type, device_id)
+        if reading:
+            metrics.HOT_WINDOW_LOOKUPS.labels("latest", "hit").inc()
+            return self._to_response(sensor_type, reading)
+        metrics.HOT_WINDOW_LOOKUPS.labels("latest", "miss").inc()
+        return await self.repo.get_latest(sensor_type, device_id)
+
+    async def get_history(
+        self,
+        sensor_type: str,
+        limit: int = 20,
+        device_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        points: Optional[int] = None,
+        resolution: Optional[str] = None,
+    ):
+        """
+        ประวัติแบบแบ่งหน้า: {"items": [...ใหม่ -> เก่า], "next_cursor": ส่งกลับมาเพื่อดึงหน้าถัดไป}
+        ระบุ points และ/หรือ resolution เพื่ออ่านทั้งช่วงเวลาจาก tier ที่เหมาะ (ไม่แบ่งหน้า)
+        """
+        if sensor_type not in SENSOR_VALUE_FIELDS:
+            return {"items": [], "next_cursor": None}
+
+        allowed = {"device_id", SENSOR_VALUE_FIELDS[sensor_type], "timestamp"}
+        if fields and not set(fields) <= allowed:
+            raise ValidationError(f"fields must be a subset of {sorted(allowed)}", field="fields")
+        try:
+            keyset = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise ValidationError(str(e), field="cursor")
+
+        if points or resolution:
+            if keyset:
+                raise ValidationError("cursor cannot be combined with points/resolution", field="cursor")
+            return await self._planned_history(sensor_type, points, resolution, device_id, start, end, fields)
+
+        # หน้าแรกแบบไม่ระบุช่วงเวลา ตอบจาก hot window ได้ (เฉพาะ record ที่บันทึกลง DB เหมือนหน้าถัดไป)
+        if not (start or end or cursor):
+            records = self.hot_window.history(sensor_type, limit, device_id)
+            if records is not None:
+                metrics.HOT_WINDOW_LOOKUPS.labels("history", "hit").inc()
+                field = SENSOR_VALUE_FIELDS[sensor_type]
+                items = [
+                    {"device_id": device, field: value, "timestamp": timestamp, "id": str(record_id)}
+                    for device, timestamp, record_id, value in records
+                ]
+                if fields:
+                    items = [{k: v for k, v in item.items() if k in fields or k in ("timestamp", "id")}
+                             for item in items]
+                # หน้าถัดไปต่อจาก DB ด้วย keyset ของ record สุดท้ายในหน้านี้ (เหมือน repo.get_history)
+                _, last_ts, last_id, _ = records[-1]
+                return {"items": items, "next_cursor": encode_cursor(last_ts, last_id)}
+            metrics.HOT_WINDOW_LOOKUPS.labels("history", "miss").inc()
+
+        items, next_cursor = await self.repo.get_history(
+            sensor_type, limit, device_id, start=start, end=end, cursor=keyset, fields=fields
+        )
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def _planned_history(
+        self,
+        sensor_type: str,
+        points: Optional[int],
+        resolution: Optional[str],
+        device_id: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        fields: Optional[List[str]],
+    ) -> dict:
+        """
+        อ่านช่วงเวลาจาก tier ที่ planner เลือก (ต่อ segment ข้าม tier ตามอายุข้อมูล)
+        แล้วลดเหลือไม่เกิน points จุดด้วย LTTB
+        """
+        now = now_thai()
+        end = end or now
+        start = start or end - self.history_default_span
+        if start >= end:
+            raise ValidationError("start must be before end", field="start")
+
+        if resolution in TIERS:
+            tier = resolution
+        else:
+            try:
+                seconds = float(resolution) if resolution else None
+            except ValueError:
+                raise ValidationError(f"resolution must be one of {list(TIERS)} or seconds", field="resolution")
+            tier = self.planner.choose(start, end, points, seconds)
+
+        field = SENSOR_VALUE_FIELDS[sensor_type]
+        segments = self.planner.plan(start, end, now, tier)
+        docs: List[dict] = []
+        truncated = False
+        for segment in segments:
+            if segment.tier == "raw":
+                rows = await self.repo.get_range(
+                    sensor_type, device_id, segment.start, segment.end, self.history_scan_limit
+                )
+            else:
+                rows = [
+                    {"device_id": row["device_id"], field: row["sum"] / row["n"], "timestamp": row["bucket"],
+                     "min": row["min"], "max": row["max"], "count": row["n"]}
+                    for row in await self.repo.get_rollups(
+                        sensor_type, segment.tier, device_id, segment.start, segment.end, self.history_scan_limit
+                    )
+                ]
+            # อ่านครบ limit = อาจมีข้อมูลมากกว่านี้ (raw ได้ส่วนใหม่สุด, rollup ได้ส่วนเก่าสุดของ segment)
+            truncated = truncated or len(rows) >= self.history_scan_limit
+            docs.extend(rows)
+
+        items = docs
+        if points:
+            # LTTB ใช้ CPU ตามจำนวนจุดที่อ่านมา ให้ทำใน thread แยกไม่บล็อก event loop
+            items = await asyncio.to_thread(downsample, docs, field, points)
+        items.reverse()
+        if fields:
+            items = [{k: v for k, v in item.items() if k in fields or k == "timestamp"} for item in items]
+        return {
+            "items": items,
+            "next_cursor": None,
+            "source_points": len(docs),
+            "truncated": truncated,
+            "segments": [segment._asdict() for segment in segments],
+        }
+
+    async def get_rollups(
+        self,
+        sensor_type: str,
+        resolution: str = "hour",
+        device_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 1000,
+    ) -> List[dict]:
+        """rollup ของช่วงเวลา พร้อม mean/stddev ต่อ bucket"""
+        if sensor_type not in SENSOR_VALUE_FIELDS:
+            return []
+        if resolution not in RESOLUTIONS:
+            raise ValidationError(f"resolution must be one of {sorted(RESOLUTIONS)}", field="resolution")
+        docs = await self.repo.get_rollups(sensor_type, resolution, device_id, start, end, limit)
+        return [summarize(doc) for doc in docs]
 
     # ---------------------------------------------------------
-    # 💾 ส่วนบันทึกข้อมูล (Record)
+    # 📊 สถิติ sliding window (จากหน่วยความจำ ไม่ query DB)
     # ---------------------------------------------------------
-    async def record_ph(self, data: SensorPH):
-        saved = False
-        if self._should_save("ph", data.ph):
-            await self.repo.add_ph(data)
-            self._update_memory("ph", data.ph)
-            print(f"✅ Saved pH: {data.ph}")
-            saved = True
-        return {"status": "success", "type": "ph", "value": data.ph, "saved": saved}
-
-    async def record_ph_voltage(self, data: SensorPHVoltage):
-        saved = False
-        if self._should_save("ph_voltage", data.voltage):
-            await self.repo.add_ph_voltage(data)
-            self._update_memory("ph_voltage", data.voltage)
-            print(f"✅ Saved pH Voltage: {data.voltage}")
-            saved = True
-        return {"status": "success", "type": "ph_voltage", "value": data.voltage, "saved": saved}
-
-    async def record_turbidity(self, data: SensorTurbidity):
-        saved = False
-        # ✅ Scale NTU value: max 125 -> 10.0 (divided by 12.5)
-        data.NTU = data.NTU / 12.5
-        
-        if self._should_save("turbidity", data.NTU):
-            await self.repo.add_turbidity(data)
-            self._update_memory("turbidity", data.NTU)
-            print(f"✅ Saved Turbidity: {data.NTU}")
-            saved = True
-        return {"status": "success", "type": "turbidity", "value": data.NTU, "saved": saved}
-
-    async def record_nh3(self, data: SensorNH3):
-        saved = False
-        if self._should_save("nh3", data.NH3):
-            await self.repo.add_nh3(data)
-            self._update_memory("nh3", data.NH3)
-            print(f"✅ Saved NH3: {data.NH3}")
-            saved = True
-        return {"status": "success", "type": "nh3", "value": data.NH3, "saved": saved}
-
-    async def record_temperature(self, data: SensorTemperature):
-        saved = False
-        if self._should_save("temperature", data.temperature):
-            await self.repo.add_temperature(data)
-            self._update_memory("temperature", data.temperature)
-            print(f"✅ Saved Temp: {data.temperature}")
-            saved = True
-        return {"status": "success", "type": "temperature", "value": data.temperature, "saved": saved}
-
-    async def record_tds(self, data: SensorTDS):
-        saved = False
-        if self._should_save("tds", data.tds):
-            await self.repo.add_tds(data)
-            self._update_memory("tds", data.tds)
-            print(f"✅ Saved TDS: {data.tds}")
-            saved = True
-        return {"status": "success", "type": "tds", "value": data.tds, "saved": saved}
+    def get_stats(self, sensor_type: str, device_id: Optional[str] = None, window: Optional[str] = None) -> dict:
+        if sensor_type not in SENSOR_VALUE_FIELDS:
+            raise ValidationError(f"Unknown sensor type '{sensor_type}'", field="sensor_type")
+        if self.rolling is None:
+            raise ValidationError("Rolling statistics are disabled (SENSOR_ROLLING_ENABLED)", field="sensor_type")
+        if window and window not in self.rolling.windows:
+            raise ValidationError(f"window must be one of {list(self.rolling.windows)}", field="window")
+        devices = self.rolling.snapshot(sensor_type, device_id, window)
+        for windows in devices.values():
+            for stats in windows.values():
+                for key in ("oldest", "newest"):
+                    if stats[key] is not None:
+                        stats[key] = from_epoch(stats[key])
+        return {"sensor_type": sensor_type, "windows": self.rolling.windows, "devices": devices}
 
-    # --- ส่วนดึงข้อมูล (Get) ---
-    async def get_current(self, sensor_type: str):
-        return await self.repo.get_latest(sensor_type)
+    # ---------------------------------------------------------
+    # 🧷 ตารางรวมทุก sensor (as-of join) + correlation / trend
+    # ---------------------------------------------------------
+    async def get_aligned(
+        self,
+        device_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        step: Optional[float] = None,
+        sensors: Optional[List[str]] = None,
+        max_age: Optional[float] = None,
+        summary: bool = True,
+    ) -> dict:
+        """
+        ค่า as-of (ค่าล่าสุดที่รู้) ของทุก sensor ของ device ที่ทุก step วินาที
+        หรือทุกจุดที่มี sensor เปลี่ยนค่า (ไม่ระบุ step)
+        """
+        sensors = sensors or list(SENSOR_VALUE_FIELDS)
+        unknown = [name for name in sensors if name not in SENSOR_VALUE_FIELDS]
+        if unknown:
+            raise ValidationError(f"Unknown sensors: {unknown}", field="sensors")
+        end = end or now_thai()
+        start = start or end - self.history_default_span
+        if start >= end:
+            raise ValidationError("start must be before end", field="start")
+
+        series, truncated = await self._load_series(device_id, sensors, start, end)
+        try:
+            frame = await asyncio.to_thread(
+                align.build_frame, series, start, end, step, max_age, self.align_max_rows, summary
+            )
+        except ValueError as e:
+            raise ValidationError(str(e), field="step")
+        return {"device_id": device_id, "start": start, "end": end, "step": step, "truncated": truncated, **frame}
+
+    async def aligned_columns(
+        self,
+        device_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        step: Optional[float] = None,
+    ) -> tuple:
+        """
+        (grid, columns, start, end, step, truncated) ตาราง as-of ของทุก sensor เป็น NumPy array (NaN = ไม่มีค่า)
+        ใช้ประเมินกฎย้อนหลังแบบ vectorized (ดู rules/use_case.py)
+        """
+        end = end or now_thai()
+        start = start or end - self.history_default_span
+        if start >= end:
+            raise ValidationError("start must be before end", field="start")
+        span = (end - start).total_seconds()
+        step = step or max(60.0, span / self.align_max_rows)
+        if span / step + 1 > self.align_max_rows:
+            raise ValidationError(f"Range / step exceeds {self.align_max_rows} rows, use a larger step", field="step")
+
+        series, truncated = await self._load_series(device_id, list(SENSOR_VALUE_FIELDS), start, end)
+
+        def build():
+            grid = align.time_grid(start, end, step)
+            return grid, {name: align.asof(s, grid) for name, s in series.items()}
+
+        grid, columns = await asyncio.to_thread(build)
+        return grid, columns, start, end, step, truncated
+
+    async def _load_series(
+        self, device_id: str, sensors: List[str], start: datetime, end: datetime
+    ) -> Tuple[Dict[str, align.Series], bool]:
+        """
+        (series ต่อ sensor, truncated) ข้อมูลในช่วงเกิน history_scan_limit จะได้เฉพาะส่วนใหม่สุด (truncated=True)
+        sensor ที่ถูกตัดไม่ใช้ค่าก่อน start: แถวก่อนจุดแรกที่อ่านได้เป็น None แทนค่าเก่าที่ไม่ถูกต้อง
+        """
+        async def load(sensor_type: str) -> Tuple[List[dict], bool]:
+            rows, before = await asyncio.gather(
+                self.repo.get_range(sensor_type, device_id, start, end, self.history_scan_limit),
+                self.repo.get_last_before(sensor_type, device_id, start),
+            )
+            if len(rows) >= self.history_scan_limit:
+                return rows, True
+            # ค่าก่อน start ทำให้แถวแรกๆ มีค่า (compression อาจไม่ได้บันทึกนานแล้ว)
+            return ([before, *rows] if before else rows), False
+
+        loaded = await asyncio.gather(*(load(sensor_type) for sensor_type in sensors))
+        series = {
+            sensor_type: align.to_series(rows, SENSOR_VALUE_FIELDS[sensor_type])
+            for sensor_type, (rows, _) in zip(sensors, loaded)
+        }
+        return series, any(truncated for _, truncated in loaded)
 
-    async def get_history(self, sensor_type: str):
-        return await self.repo.get_history(sensor_type)
+    # ---------------------------------------------------------
+    # 📤 Export (CSV / Parquet แบบ streaming)
+    # ---------------------------------------------------------
+    def export(
+        self,
+        sensor_type: str = "all",
+        device_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        fmt: str = "csv",
+    ):
+        """คืน (chunks, media_type, filename) สำหรับ StreamingResponse (ตรวจ input ก่อนเริ่มส่ง)"""
+        sensor_types = list(SENSOR_VALUE_FIELDS) if sensor_type == "all" else [sensor_type]
+        if sensor_type != "all" and sensor_type not in SENSOR_VALUE_FIELDS:
+            raise ValidationError(f"sensor_type must be 'all' or one of {list(SENSOR_VALUE_FIELDS)}", field="sensor_type")
+        if start and end and start >= end:
+            raise ValidationError("start must be before end", field="start")
+
+        batches = self._export_batches(sensor_types, device_id, start, end)
+        filename = f"aquasense_{sensor_type}_{now_thai():%Y%m%d_%H%M%S}"
+        if fmt == "parquet":
+            if not parquet_available():
+                raise ValidationError("Parquet export requires pyarrow (poetry install -E parquet)", field="format")
+            return parquet_chunks(batches), "application/vnd.apache.parquet", f"{filename}.parquet"
+        return csv_chunks(batches), "text/csv", f"{filename}.csv"
+
+    async def _export_batches(self, sensor_types: List[str], device_id, start, end):
+        for sensor_type in sensor_types:
+            async for rows in self.repo.iter_range(sensor_type, device_id, start, end, self.export_batch_size):
+                yield sensor_type, rows
+
+    def _to_response(self, sensor_type: str, reading) -> dict:
+        """แปลง reading จาก hot window ให้หน้าตาเหมือน document ใน DB"""
+        device_id, timestamp, value = reading
+        return {"device_id": device_id, SENSOR_VALUE_FIELDS[sensor_type]: value, "timestamp": timestamp}
     
     # ---------------------------------------------------------
     # 📊 ส่วนวิเคราะห์และแจ้งเตือน (Analysis) + Snapshot Log
     # ---------------------------------------------------------
-    async def run_hourly_snapshot(self):
+    async def _latest_readings(self) -> Dict[str, Optional[dict]]:
+        """
+        ค่าล่าสุดของทุก sensor ({device_id, value, timestamp} หรือ None)
+        อ่านจาก hot window ก่อน ตัวที่ไม่มีค่อย query DB พร้อมกัน (ไม่ต่อคิวทีละตัว)
         """
-        บันทึก Snapshot รายชั่วโมงลงฐานข้อมูล
+        latest: Dict[str, Optional[dict]] = {}
+        missing = []
+        for sensor_type in SENSOR_VALUE_FIELDS:
+            reading = self.hot_window.latest(sensor_type)
+            if reading:
+                device_id, timestamp, value = reading
+                latest[sensor_type] = {"device_id": device_id, "value": value, "timestamp": timestamp}
+            else:
+                missing.append(sensor_type)
+
+        docs = await asyncio.gather(*(self.repo.get_latest(sensor_type) for sensor_type in missing))
+        for sensor_type, doc in zip(missing, docs):
+            latest[sensor_type] = {
+                "device_id": doc.device_id,
+                "value": getattr(doc, SENSOR_VALUE_FIELDS[sensor_type]),
+                "timestamp": doc.timestamp,
+            } if doc else None
+        return latest
+
+    async def _analysis_snapshot(self) -> tuple:
+        """
+        (latest, values, result) ของค่าล่าสุดทุก sensor แบบ memo + single-flight
+        request ที่เข้ามาพร้อมกันรอผลจากการคำนวณครั้งเดียวกัน ไม่ query ซ้ำคนละรอบ
+        """
+        version = self._analysis_version
+        cached = self._analysis_cache
+        if cached and cached[0] == version and time.monotonic() < cached[1]:
+            metrics.ANALYSIS_LOOKUPS.labels("hit").inc()
+            return cached[2]
+
+        inflight = self._analysis_inflight
+        if inflight and inflight[0] == version and not inflight[1].done():
+            metrics.ANALYSIS_LOOKUPS.labels("joined").inc()
+            return await asyncio.shield(inflight[1])
+
+        metrics.ANALYSIS_LOOKUPS.labels("miss").inc()
+        future = asyncio.ensure_future(self._compute_analysis(version))
+        self._analysis_inflight = (version, future)
+        # shield: client ที่ยกเลิก request ไม่ทำให้คนอื่นที่รอผลเดียวกันล้มไปด้วย
+        return await asyncio.shield(future)
+
+    async def _compute_analysis(self, version: int) -> tuple:
+        from_db = any(self.hot_window.latest(sensor_type) is None for sensor_type in SENSOR_VALUE_FIELDS)
+        latest = await self._latest_readings()
+        values = {sensor_type: reading["value"] if reading else None for sensor_type, reading in latest.items()}
+        device_id = self._single_device(latest.values())
+        # ที่เดียวที่เลื่อนสถานะ hysteresis: ครั้งเดียวต่อ version (memo + single-flight)
+        # คำนวณซ้ำหลัง TTL ด้วยค่าเดิมได้ผลเดิม (Schmitt trigger รับค่าเดิมซ้ำไม่เปลี่ยนสถานะ)
+        snapshot = (latest, values, self._analysis_result(values, device_id, advance=True))
+        expires_at = time.monotonic() + self.analysis_cache_ttl if from_db else float("inf")
+        # ถ้ามี reading ใหม่ระหว่างคำนวณ version จะไม่ตรง และรอบถัดไปจะคำนวณใหม่เอง
+        self._analysis_cache = (version, expires_at, snapshot)
+        return snapshot
+
+    async def run_hourly_snapshot(
+        self,
+        values: Optional[Dict[str, Optional[float]]] = None,
+        at: Optional[datetime] = None,
+        catch_up: bool = False,
+    ):
         """
-        # 1. ดึงค่าล่าสุด
-        ph_data = await self.repo.get_latest("ph")
-        ph_v_data = await self.repo.get_latest("ph_voltage")
-        temp_data = await self.repo.get_latest("temperature")
-        nh3_data = await self.repo.get_latest("nh3")
-        turb_data = await self.repo.get_latest("turbidity")
-        tds_data = await self.repo.get_latest("tds")
+        บันทึก Snapshot รายชั่วโมงลงฐานข้อมูล (เรียกจาก HourlySnapshotScheduler ครั้งเดียวต่อชั่วโมง ดู snapshot.py)
+        at: ต้นชั่วโมงของ Snapshot (unique: บันทึกซ้ำชั่วโมงเดิมจะถูกข้าม)
+        catch_up: ย้อนบันทึกชั่วโมงที่พลาด ใช้ค่าล่าสุด ณ เวลา at จาก DB และไม่แจ้งเตือน
+        """
+        at = at or now_thai()
+        # 1. ดึงค่าล่าสุด (ส่ง values มาได้ถ้าดึงไว้แล้ว)
+        analysis = None
+        device_id = None
+        if values is None:
+            if catch_up:
+                values, device_id = await self._values_at(at)
+            else:
+                latest, values, analysis = await self._analysis_snapshot()
+                device_id = self._single_device(latest.values())
 
         # 2. แปลงค่า
-        ph = ph_data.ph if ph_data else None
-        ph_v = ph_v_data.voltage if ph_v_data else None
-        temp = temp_data.temperature if temp_data else None
-        nh3 = nh3_data.NH3 if nh3_data else None
-        ntu = turb_data.NTU if turb_data else None
-        tds = tds_data.tds if tds_data else None
+        ph, ph_v, temp = values["ph"], values["ph_voltage"], values["temperature"]
+        nh3, ntu, tds = values["nh3"], values["turbidity"], values["tds"]
 
         if not any([ph, ph_v, temp, nh3, ntu, tds]):
-            print("⚠️ No data available for hourly snapshot")
+            logger.warning(f"⚠️ No data available for hourly snapshot {at:%Y-%m-%d %H:%M}")
             return None
 
-        # 3. วิเคราะห์คุณภาพน้ำ
-        status, color, message, issues = self._determine_water_quality(ph, temp, ntu, nh3, tds)
+        # 3. วิเคราะห์คุณภาพน้ำ: ค่าปัจจุบันใช้ผลเดียวกับ Dashboard / SSE
+        #    ย้อนหลังไม่ใช้สถานะ hysteresis ของค่าปัจจุบัน, values ที่ส่งมาเองอ่านสถานะอย่างเดียว
+        if analysis is not None:
+            status, message, issues = analysis["status"], analysis["message"], analysis["issues"]
+        elif catch_up:
+            status, color, message, issues = self.rules.compiled.evaluate(values, device_id)
+        else:
+            status, color, message, issues = self._determine_water_quality(values)
 
         # 4. บันทึกลง DB
         log = WaterAnalysisLog(
-            timestamp=datetime.now(),
+            timestamp=at,
+            slot=at,
+            device_id=device_id,
             status=status,
             issues=issues,
             ph=ph, ph_voltage=ph_v, turbidity=ntu, nh3=nh3, temperature=temp, tds=tds
         )
-        await log.save()
-        print(f"📝 บันทึก Snapshot เรียบร้อย (Backend Task): {status}")
+        try:
+            await log.insert()
+        except DuplicateKeyError:
+            logger.info(f"⏭️ Snapshot {at:%Y-%m-%d %H:%M} already recorded")
+            return None
+        logger.info(f"📝 บันทึก Snapshot เรียบร้อย: {status} @ {at:%Y-%m-%d %H:%M}{' (catch-up)' if catch_up else ''}")
 
         # 5. แจ้งเตือน LINE หากวิกฤต (Cooldown 1 ชม.)
-        if status == "Critical":
+        if status == "Critical" and not catch_up:
             current_time = time.time()
-            if (current_time - SensorUseCase._last_alert_time) > 3600:
+            if (current_time - self._last_alert_time) > 3600:
                 alert_msg = f"🚨 แจ้งเตือนภัยวิกฤต (ระบบตรวจพบอัตโนมัติ)!\nสถานะ: {message}\n"
                 for issue in issues: alert_msg += f"• {issue}\n"
-                await self.line_service.send_alert(alert_msg)
-                SensorUseCase._last_alert_time = current_time
+                await self._send_alert(alert_msg, self._critical_alert_id(at))
+                self._last_alert_time = current_time
 
-        SensorUseCase._last_log_time = time.time()
         return log
 
-    async def analyze_water_quality(self):
-        # 1. ดึงค่าล่าสุด
-        ph_data = await self.repo.get_latest("ph")
-        ph_v_data = await self.repo.get_latest("ph_voltage")
-        temp_data = await self.repo.get_latest("temperature")
-        nh3_data = await self.repo.get_latest("nh3")
-        turb_data = await self.repo.get_latest("turbidity")
-        tds_data = await self.repo.get_latest("tds")
+    async def _send_alert(self, message: str, job_id: Optional[str] = None):
+        """ส่ง LINE ผ่าน worker (job send_line_alert) ถ้ามี JobQueue ไม่อย่างนั้นส่งเอง"""
+        if self.jobs is not None:
+            await self.jobs.enqueue("send_line_alert", message, job_id=job_id)
+        else:
+            await self.line_service.send_alert(message)
+
+    @staticmethod
+    def _critical_alert_id(at: datetime) -> str:
+        # job id เดียวต่อชั่วโมง: ทุก process/worker ส่งแจ้งเตือนวิกฤตได้ชั่วโมงละครั้ง
+        return f"critical-alert:{at:%Y%m%d%H}"
+
+    async def _values_at(
+        self, at: datetime, max_age: timedelta = timedelta(hours=1)
+    ) -> Tuple[Dict[str, Optional[float]], Optional[str]]:
+        """(ค่าล่าสุดของทุก sensor ก่อนเวลา at (ไม่เกิน max_age), บ่อที่ใช้ override) สำหรับย้อนบันทึก Snapshot"""
+        docs = await asyncio.gather(
+            *(self.repo.get_last_before(sensor_type, None, at) for sensor_type in SENSOR_VALUE_FIELDS)
+        )
+        docs = [doc if doc and at - doc["timestamp"] <= max_age else None for doc in docs]
+        values = {
+            sensor_type: doc[field] if doc else None
+            for (sensor_type, field), doc in zip(SENSOR_VALUE_FIELDS.items(), docs)
+        }
+        return values, self._single_device(docs)
+
+    @staticmethod
+    def _single_device(readings) -> Optional[str]:
+        """ใช้ override ของบ่อได้เมื่อค่าล่าสุดทุกตัวมาจาก device เดียวกัน (ไม่อย่างนั้น None = กฎกลาง)"""
+        devices = {reading["device_id"] for reading in readings if reading}
+        return devices.pop() if len(devices) == 1 else None
+
+    def _analysis_result(
+        self, values: Dict[str, Optional[float]], device_id: Optional[str] = None, advance: bool = False
+    ) -> dict:
+        """ผลวิเคราะห์คุณภาพน้ำจากค่าที่ส่งมา (advance=True เลื่อนสถานะ hysteresis ด้วย ดู _compute_analysis)"""
+        ph, temp = values["ph"], values["temperature"]
+        nh3, ntu, tds = values["nh3"], values["turbidity"], values["tds"]
+
+        if not any([ph, values["ph_voltage"], temp, nh3, ntu, tds]):
+            return {"status": "No Data", "message": "Waiting...", "color": "gray", "issues": []}
 
-        # 2. แปลงค่า
-        ph = ph_data.ph if ph_data else None
-        ph_v = ph_v_data.voltage if ph_v_data else None
-        temp = temp_data.temperature if temp_data else None
-        nh3 = nh3_data.NH3 if nh3_data else None
-        ntu = turb_data.NTU if turb_data else None
-        tds = tds_data.tds if tds_data else None
+        status, color, message, issues = self._determine_water_quality(values, device_id, advance)
+        return {
+            "status": status, "message": message, "color": color, "issues": issues,
+            "current_values": { "ph": ph, "temp": temp, "nh3": nh3, "ntu": ntu, "tds": tds }
+        }
 
-        if not any([ph, ph_v, temp, nh3, ntu, tds]):
-            return {"status": "No Data", "message": "Waiting...", "color": "gray", "issues": []}
+    async def analyze_water_quality(self, values: Optional[Dict[str, Optional[float]]] = None):
+        # 1-3. ค่าล่าสุด + ผลวิเคราะห์ (memo จนกว่าจะมีค่าใหม่) หรือวิเคราะห์จาก values ที่ส่งมา
+        if values is None:
+            _, values, result = await self._analysis_snapshot()
+        else:
+            result = self._analysis_result(values)
+        return await self._after_analysis(values, result)
 
-        # 3. วิเคราะห์คุณภาพน้ำ
-        status, color, message, issues = self._determine_water_quality(ph, temp, ntu, nh3, tds)
+    async def _after_analysis(self, values: Dict[str, Optional[float]], result: dict):
+        """แจ้งเตือน LINE ตามผลวิเคราะห์ (มี cooldown ในตัว)"""
+        if result["status"] == "No Data":
+            return result
 
         # 4. แจ้งเตือน LINE (Cooldown) - เฉพาะเมื่อเรียกจาก Dashboard
-        if status == "Critical":
+        if result["status"] == "Critical":
             current_time = time.time()
-            if (current_time - SensorUseCase._last_alert_time) > 3600:
-                alert_msg = f"🚨 แจ้งเตือนภัยวิกฤต!\nสถานะ: {message}\n"
-                for issue in issues: alert_msg += f"• {issue}\n"
-                await self.line_service.send_alert(alert_msg)
-                SensorUseCase._last_alert_time = current_time
+            if (current_time - self._last_alert_time) > 3600:
+                # ตั้งเวลาก่อน await กัน request ที่เข้ามาพร้อมกันส่งซ้ำ
+                self._last_alert_time = current_time
+                alert_msg = f"🚨 แจ้งเตือนภัยวิกฤต!\nสถานะ: {result['message']}\n"
+                for issue in result["issues"]: alert_msg += f"• {issue}\n"
+                await self._send_alert(alert_msg, self._critical_alert_id(now_thai()))
 
-        # ---------------------------------------------------------
-        # ✅ บันทึก Snapshot หากถึงรอบเวลา
-        # ---------------------------------------------------------
-        current_ts = time.time()
-        if (current_ts - SensorUseCase._last_log_time) > 3600:
-            await self.run_hourly_snapshot()
+        # Snapshot รายชั่วโมงบันทึกโดย HourlySnapshotScheduler (ตรงต้นชั่วโมง ครั้งเดียวทุก worker)
+        return result
 
-        return {
-            "status": status, "message": message, "color": color, "issues": issues,
-            "current_values": { "ph": ph, "temp": temp, "nh3": nh3, "ntu": ntu, "tds": tds }
-        }
\ No newline at end of file
+    async def get_dashboard(self, reports: ReportUseCase):
+        """
+        ข้อมูลทั้งหมดของหน้า Dashboard ใน request เดียว
+        (ค่าล่าสุดทุก sensor + ผลวิเคราะห์ + สรุปวันนี้) ดึงแต่ละอย่างครั้งเดียวแบบพร้อมกัน
+        """
+        (latest, values, analysis), summary = await asyncio.gather(
+            self._analysis_snapshot(), reports.get_today_summary()
+        )
+        await self._after_analysis(values, analysis)
+        return {"latest": latest, "analysis": analysis, "summary": summary}
+
+    # ---------------------------------------------------------
+    # 📡 Live stream (SSE) ดู stream.py
+    # ---------------------------------------------------------
+    def open_stream(self):
+        """คืน generator ของ event สำหรับ client ใหม่ (เริ่มด้วย snapshot เต็มครั้งเดียว)"""
+        self.stream.check_capacity()
+        return self.stream.events(self._stream_snapshot)
+
+    async def _stream_snapshot(self) -> str:
+        latest, _, analysis = await self._analysis_snapshot()
+        return format_event("snapshot", {"latest": latest, "analysis": analysis})
+
+    async def _publish_analysis(self):
+        """ส่ง event analysis เฉพาะเมื่อสถานะ/ปัญหาเปลี่ยน (ผลเดียวกับ Dashboard จาก _analysis_snapshot)"""
+        _, _, result = await self._analysis_snapshot()
+        key = (result["status"], tuple(result["issues"]))
+        if key != self.stream.last_analysis:
+            self.stream.last_analysis = key
+            self.stream.publish("analysis", result)
@@ -0,0 +1,351 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from loguru import logger
+from pymongo.errors import BulkWriteError
+
+from apiapp.core.config import PROJECT_ROOT, Settings
+from .model import SENSOR_MODELS
+from .repository import SensorRecord, SensorRepository
+
+# MongoDB duplicate key error (ใช้ตอน replay ข้อมูลที่อาจถูกบันทึกไปแล้วบางส่วน)
+DUPLICATE_KEY_ERROR = 11000
+
+
+class SensorWriteBuffer:
+    """
+    Write-behind buffer ระหว่าง SensorUseCase กับ SensorRepository
+
+    - รวม record ที่ผ่าน Deadband แล้ว flush ด้วย insert_many ทุก flush_interval
+      หรือเมื่อสะสมครบ max_docs (group commit)
+    - ถ้า MongoDB ช้าเกิน flush_timeout หรือล่ม จะเขียนลงไฟล์ spill (append-only, JSON Lines)
+      แล้ว replay กลับเข้า DB ทีละก้อน (replay_chunk, ค่าเริ่มต้น = max_docs) เมื่อ flush ครั้งถัดไปสำเร็จ
+    - flush ที่เหลือทั้งหมดตอน shutdown (เรียก stop() จาก lifespan)
+    - time-series collection (dedupe_replay=True) ไม่มี unique _id: insert ซ้ำไม่เกิด DuplicateKeyError
+      จึงกรอง _id ที่บันทึกไปแล้วออกก่อน replay (flush ที่ timeout อาจบันทึกไปแล้วบางส่วน)
+    """
+
+    def __init__(
+        self,
+        repo: SensorRepository,
+        flush_interval: float,
+        max_docs: int,
+        flush_timeout: float,
+        spill_path: Path,
+        replay_chunk: Optional[int] = None,
+        dedupe_replay: bool = False,
+    ):
+        self.repo = repo
+        self.flush_interval = flush_interval
+        self.max_docs = max_docs
+        self.flush_timeout = flush_timeout
+        self.spill_path = spill_path
+        self.replay_chunk = replay_chunk or max_docs
+        self.dedupe_replay = dedupe_replay
+
+        self._pending: Dict[str, List[SensorRecord]] = defaultdict(list)
+        self._pending_count = 0
+        self._oldest_pending: Optional[float] = None
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._replay_lock = asyncio.Lock()
+        self._spill_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+        # 📈 สถิติสำหรับ monitoring
+        self.flushes = 0
+        self.flushed_docs = 0
+        self.failed_flushes = 0
+        self.last_flush_size = 0
+        self.last_flush_seconds = 0.0
+        self.last_flush_lag_seconds = 0.0
+        self.spill_depth = 0
+        self.spilled_docs = 0
+        self.replayed_docs = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings, repo: SensorRepository) -> "SensorWriteBuffer":
+        spill_path = Path(settings.SENSOR_WRITE_BUFFER_SPILL_PATH)
+        if not spill_path.is_absolute():
+            spill_path = PROJECT_ROOT / spill_path
+        return cls(
+            repo=repo,
+            flush_interval=settings.SENSOR_WRITE_BUFFER_FLUSH_MS / 1000,
+            max_docs=settings.SENSOR_WRITE_BUFFER_MAX_DOCS,
+            flush_timeout=settings.SENSOR_WRITE_BUFFER_FLUSH_TIMEOUT_MS / 1000,
+            spill_path=spill_path,
+            dedupe_replay=settings.SENSOR_TIMESERIES,
+        )
+
+    # ---------------------------------------------------------
+    # 🔌 Lifecycle
+    # ---------------------------------------------------------
+    async def start(self):
+        if self.running:
+            return
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        self.spill_depth = await asyncio.to_thread(self._count_spill_lines)
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"🚀 Sensor write buffer started (flush {self.flush_interval * 1000:.0f} ms / "
+            f"{self.max_docs} docs, spill depth {self.spill_depth})"
+        )
+        await self.replay()
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._wake.set()
+        if self._task:
+            await self._task
+        # flush ที่ค้างอยู่ทั้งหมดก่อนปิด (ถ้า DB ไม่พร้อมจะไปอยู่ในไฟล์ spill)
+        await self.flush()
+        logger.info(f"🛑 Sensor write buffer stopped (spill depth {self.spill_depth})")
+
+    # ---------------------------------------------------------
+    # 📥 รับข้อมูลจาก SensorUseCase
+    # ---------------------------------------------------------
+    def add(self, sensor_type: str, records: List[SensorRecord]):
+        if not records:
+            return
+        if self._oldest_pending is None:
+            self._oldest_pending = time.monotonic()
+        self._pending[sensor_type].extend(records)
+        self._pending_count += len(records)
+        if self._pending_count >= self.max_docs:
+            self._wake.set()
+
+    async def insert_or_spill(self, sensor_type: str, records: List[SensorRecord], retries: int, backoff: float) -> bool:
+        """
+        insert ทันทีโดยไม่ผ่านรอบ flush (ใช้เมื่อ buffer ไม่ได้เปิด) ลองใหม่ retries ครั้งแบบ exponential backoff
+        ยังไม่สำเร็จจะ spill ลงไฟล์ (replay ตอน start ครั้งถัดไป) คืน True ถ้าบันทึกลง DB แล้ว
+        """
+        for attempt in range(retries + 1):
+            try:
+                # record มี _id แล้ว ลองซ้ำหลังบันทึกไปบางส่วนไม่เกิดข้อมูลซ้ำ (เหมือน replay)
+                await self._replay_records(sensor_type, records)
+                return True
+            except Exception as e:
+                error = e
+            if attempt < retries:
+                await asyncio.sleep(backoff * 2 ** attempt)
+        logger.warning(f"⚠️ Insert {sensor_type} failed ({error!r}), spilling {len(records)} docs")
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        await self._spill(sensor_type, records)
+        return False
+
+    # ---------------------------------------------------------
+    # 💾 Flush / Spill / Replay
+    # ---------------------------------------------------------
+    async def _run(self):
+        while self.running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                ok = await self.flush()
+                if ok and self.spill_depth:
+                    await self.replay()
+            except Exception as e:
+                logger.error(f"❌ Sensor write buffer error: {e}")
+
+    async def flush(self) -> bool:
+        """flush ข้อมูลที่ค้างอยู่ คืนค่า False ถ้ามีบาง collection ต้อง spill"""
+        async with self._flush_lock:
+            if not self._pending_count:
+                return True
+
+            pending, self._pending = self._pending, defaultdict(list)
+            size, self._pending_count = self._pending_count, 0
+            oldest, self._oldest_pending = self._oldest_pending, None
+
+            started = time.monotonic()
+            ok = True
+            inserted = 0
+            for sensor_type, records in pending.items():
+                if not ok:
+                    # DB มีปัญหาแล้วในรอบนี้ ไม่ต้องรอ timeout ซ้ำ spill เลย
+                    await self._spill(sensor_type, records)
+                    continue
+                try:
+                    await asyncio.wait_for(
+                        self.repo.add_many(sensor_type, records, ordered=False),
+                        timeout=self.flush_timeout,
+                    )
+                    inserted += len(records)
+                except Exception as e:
+                    ok = False
+                    logger.warning(f"⚠️ Flush {sensor_type} failed ({e!r}), spilling {len(records)} docs")
+                    await self._spill(sensor_type, records)
+
+            finished = time.monotonic()
+            self.flushes += 1
+            self.flushed_docs += inserted
+            self.last_flush_size = size
+            self.last_flush_seconds = finished - started
+            self.last_flush_lag_seconds = finished - oldest if oldest else 0.0
+            if not ok:
+                self.failed_flushes += 1
+            return ok
+
+    async def _spill(self, sensor_type: str, records: List[SensorRecord]):
+        lines = [
+            json.dumps({"sensor_type": sensor_type, "doc": self.repo.dump_record(sensor_type, record)})
+            for record in records
+        ]
+        async with self._spill_lock:
+            await asyncio.to_thread(self._append_spill, lines)
+        self.spill_depth += len(lines)
+        self.spilled_docs += len(lines)
+
+    def _append_spill(self, lines: List[str]):
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @property
+    def _replay_path(self) -> Path:
+        return self.spill_path.with_suffix(self.spill_path.suffix + ".replay")
+
+    def _count_spill_lines(self) -> int:
+        count = 0
+        for path in (self.spill_path, self._replay_path):
+            if path.exists():
+                with open(path, "r", encoding="utf-8") as f:
+                    count += sum(1 for line in f if line.strip())
+        return count
+
+    def _read_chunk(self, f: TextIO) -> Tuple[int, Dict[str, List[SensorRecord]]]:
+        """อ่านไม่เกิน replay_chunk บรรทัดถัดไปจากไฟล์ .replay (รันใน thread) คืน (จำนวนบรรทัด, record ตาม sensor)"""
+        grouped: Dict[str, List[SensorRecord]] = defaultdict(list)
+        count = 0
+        for line in f:
+            if not line.strip():
+                continue
+            count += 1
+            try:
+                item = json.loads(line)
+                sensor_type = item["sensor_type"]
+                if sensor_type in SENSOR_MODELS:
+                    grouped[sensor_type].append(self.repo.load_record(sensor_type, item["doc"]))
+            except Exception:
+                # บรรทัดที่เขียนไม่ครบ (เช่นเครื่องดับระหว่าง spill) ข้ามไป
+                pass
+            if count >= self.replay_chunk:
+                break
+        return count, grouped
+
+    def _move_rest_to_spill(self, f: TextIO) -> int:
+        """ย้ายส่วนที่ยังไม่ได้ replay กลับไปต่อท้ายไฟล์ spill ทีละก้อน (ไม่ต้อง parse, รันใน thread)"""
+        moved = 0
+        with open(self.spill_path, "a", encoding="utf-8") as out:
+            while True:
+                lines = [line for line in f.readlines(1 << 20) if line.strip()]
+                if not lines:
+                    break
+                out.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+                moved += len(lines)
+            out.flush()
+            os.fsync(out.fileno())
+        return moved
+
+    async def _replay_records(self, sensor_type: str, records: List[SensorRecord]) -> int:
+        """insert record จากไฟล์ spill 1 ก้อน คืนจำนวนที่บันทึกใหม่ (raise ถ้า DB ไม่พร้อม)"""
+        try:
+            return await asyncio.wait_for(self._insert_new(sensor_type, records), timeout=self.flush_timeout)
+        except BulkWriteError as e:
+            # ข้าม record ที่เคยบันทึกสำเร็จแล้ว (duplicate _id)
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            return len(records) - len(errors)
+
+    async def _insert_new(self, sensor_type: str, records: List[SensorRecord]) -> int:
+        if self.dedupe_replay:
+            existing = await self.repo.existing_ids(sensor_type, records)
+            records = [record for record in records if record["_id"] not in existing]
+        return await self.repo.add_many(sensor_type, records, ordered=False)
+
+    async def replay(self):
+        """
+        นำข้อมูลในไฟล์ spill กลับเข้า MongoDB (record มี _id อยู่แล้ว จึง replay ซ้ำได้อย่างปลอดภัย)
+
+        อ่านและ insert ทีละ replay_chunk บรรทัด (แต่ละก้อนมี timeout ของตัวเอง) ก้อนที่ล้มเหลว
+        และส่วนที่ยังไม่ได้อ่านจะกลับไปอยู่ในไฟล์ spill ส่วนที่สำเร็จแล้วไม่ต้องทำซ้ำรอบหน้า
+        """
+        async with self._replay_lock:
+            replay_path = self._replay_path
+            # ไฟล์ .replay ที่ค้างจากการปิดระบบกลางคัน จะถูก replay ก่อน
+            if not replay_path.exists():
+                if not self.spill_path.exists():
+                    self.spill_depth = 0
+                    return
+                # rename ก่อน เพื่อให้การ spill ใหม่ระหว่าง replay ไปลงไฟล์ใหม่
+                async with self._spill_lock:
+                    await asyncio.to_thread(os.replace, self.spill_path, replay_path)
+
+            replayed = 0
+            failed = False
+            f = await asyncio.to_thread(open, replay_path, "r", encoding="utf-8")
+            try:
+                while True:
+                    count, grouped = await asyncio.to_thread(self._read_chunk, f)
+                    if not count:
+                        break
+                    self.spill_depth = max(self.spill_depth - count, 0)
+                    for sensor_type, records in grouped.items():
+                        if failed:
+                            await self._spill(sensor_type, records)
+                            continue
+                        try:
+                            replayed += await self._replay_records(sensor_type, records)
+                        except Exception as e:
+                            failed = True
+                            logger.warning(
+                                f"⚠️ Replay {sensor_type} failed ({e!r}), keeping {len(records)} docs in spill"
+                            )
+                            await self._spill(sensor_type, records)
+                    if failed:
+                        # DB ยังไม่พร้อม: ที่เหลือกลับไปรอในไฟล์ spill รอบหน้า
+                        async with self._spill_lock:
+                            await asyncio.to_thread(self._move_rest_to_spill, f)
+                        break
+            finally:
+                await asyncio.to_thread(f.close)
+
+            await asyncio.to_thread(os.remove, replay_path)
+            self.replayed_docs += replayed
+            if replayed:
+                logger.info(f"♻️ Replayed {replayed} spilled sensor docs (spill depth {self.spill_depth})")
+
+    # ---------------------------------------------------------
+    # 📊 Stats
+    # ---------------------------------------------------------
+    def stats(self) -> dict:
+        lag = time.monotonic() - self._oldest_pending if self._oldest_pending else 0.0
+        return {
+            "running": self.running,
+            "pending_docs": self._pending_count,
+            "pending_lag_seconds": round(lag, 3),
+            "flushes": self.flushes,
+            "flushed_docs": self.flushed_docs,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+            "last_flush_lag_seconds": round(self.last_flush_lag_seconds, 3),
+            "spill_depth": self.spill_depth,
+            "spilled_docs": self.spilled_docs,
+            "replayed_docs": self.replayed_docs,
+        }
@@ -6,6 +6,7 @@ from typing import Optional
 from beanie.operators import And, Or
 from beanie.odm.operators.find.evaluation import RegEx
 from ...core.base_repository import BaseRepository
+from ...core.container import container
 from .model import User
 
 
@@ -81,5 +82,5 @@ class UserRepository(BaseRepository[User]):
 
 # Dependency providers
 async def get_user_repository() -> UserRepository:
-    """Get user repository instance"""
-    return UserRepository()
\ No newline at end of file
+    """Get user repository instance from the application container"""
+    return container.resolve(UserRepository)
\ No newline at end of file
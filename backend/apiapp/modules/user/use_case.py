@@ -6,12 +6,12 @@ from datetime import datetime, timezone
 from typing import Optional
 from fastapi_pagination import Page
 from werkzeug.security import generate_password_hash
-from fastapi import Depends
 
 from .model import User
-from .repository import UserRepository, get_user_repository
+from .repository import UserRepository
 from .schemas import CreateUser, UpdateUser, UserResponse, UserRole
 from ...core.base_use_case import BaseUseCase
+from ...core.container import container
 from ...core.exceptions import ValidationError, DuplicatedError, BusinessLogicError
 
 
@@ -150,8 +150,6 @@ class UserUseCase(BaseUseCase[User, UserRepository, UserResponse]):
 
 
 # Dependency providers
-async def get_user_use_case(
-    repository: UserRepository = Depends(get_user_repository),
-) -> UserUseCase:
-    """Get user use case with injected dependencies"""
-    return UserUseCase(repository)
\ No newline at end of file
+async def get_user_use_case() -> UserUseCase:
+    """Get user use case from the application container"""
+    return container.resolve(UserUseCase)
\ No newline at end of file
@@ -1,12 +1,13 @@
 from fastapi import FastAPI
 from fastapi.exceptions import HTTPException, RequestValidationError
 from fastapi_pagination import add_pagination
-import asyncio
 from .core.router import init_routers
 from .core import http_error, validation_error
 from contextlib import asynccontextmanager
 from .middlewares.base import init_all_middlewares
 from .infrastructure.database import init_beanie
+from .infrastructure.container import init_container
+from .core.container import container
 from loguru import logger
 from .core.config import get_settings
 from dotenv import load_dotenv
@@ -46,32 +47,75 @@ def create_app() -> FastAPI:
 async def lifespan(app: FastAPI):
     settings = get_settings()
     await init_beanie(settings)  # เปิด comment นี้ด้วย
+    init_container(settings)
     init_routers(app, settings)
     use_route_names_as_operation_ids(app)
     add_pagination(app)
 
-    # Start background logging task
-    import asyncio
-    asyncio.create_task(start_background_logging())
+    # โหลดสถานะ Deadband ต่อ device จาก DB (กัน write storm หลัง restart)
+    from .modules.sensors.use_case import SensorUseCase
+    from .modules.sensors.write_buffer import SensorWriteBuffer
+    from .modules.sensors.rollup import SensorRollupBuffer
+    from .modules.rules.use_case import RuleUseCase
+    from .modules.sensors.snapshot import HourlySnapshotScheduler
+    from .modules.sensors.stream import SensorStreamBroker
+    from .infrastructure.jobs import JobQueue
+    sensor_use_case = container.resolve(SensorUseCase)
+    sensor_write_buffer = container.resolve(SensorWriteBuffer)
+    sensor_rollups = container.resolve(SensorRollupBuffer)
+    rule_use_case = container.resolve(RuleUseCase)
+    snapshot_scheduler = container.resolve(HourlySnapshotScheduler)
+    sensor_stream = container.resolve(SensorStreamBroker)
+    try:
+        await sensor_use_case.warm_start_deadband()
+    except Exception as e:
+        logger.error(f"❌ Deadband warm start failed: {e}")
+
+    # โหลดกฎคุณภาพน้ำจาก DB (seed กฎเริ่มต้นถ้ายังไม่มี) + ตรวจการแก้ไขเป็นระยะ
+    try:
+        await rule_use_case.start()
+    except Exception as e:
+        logger.error(f"❌ Water quality rules load failed, using defaults: {e}")
+
+    # Snapshot คุณภาพน้ำทุกต้นชั่วโมง: ปกติรันใน arq worker (cron) ตรงนี้ใช้เมื่อไม่ได้รัน worker
+    # (lease ใน Mongo: ทุก uvicorn worker เปิดได้ บันทึกครั้งเดียว)
+    if not settings.WORKER_ENABLED:
+        await snapshot_scheduler.start()
+
+    # Start sensor write-behind buffer
+    if settings.SENSOR_WRITE_BUFFER_ENABLED:
+        await sensor_write_buffer.start()
+    else:
+        # record ที่ spill ไว้ตอน insert ตรงล้มเหลว (ดู SensorUseCase._write)
+        await sensor_write_buffer.replay()
+    if settings.SENSOR_ROLLUP_ENABLED:
+        await sensor_rollups.start()
+    # รับ/ส่ง event ของ /sensors/stream ผ่าน Redis (เฉพาะ SENSOR_STREAM_FANOUT)
+    await sensor_stream.start()
+
+    # Start MQTT sensor ingest (ถ้าไม่ได้รันแยกด้วย scripts/run-ingest)
+    mqtt_ingest = None
+    if settings.MQTT_INGEST_ENABLED:
+        from .modules.sensors.mqtt_ingest import SensorMQTTSubscriber
+        mqtt_ingest = SensorMQTTSubscriber(settings, sensor_use_case)
+        await mqtt_ingest.start()
 
     yield
 
-
-async def start_background_logging():
-    """
-    Background task to periodically log water quality data.
-    """
-    from .modules.sensors.use_case import SensorUseCase
-    use_case = SensorUseCase()
-    logger.info("🚀 Background Water Quality Logging Task Started")
-
-    while True:
-        try:
-            # ทุกๆ 1 ชม. (3600 วิ)
-            await asyncio.sleep(3600)
-            await use_case.run_hourly_snapshot()
-        except Exception as e:
-            logger.error(f"❌ Background Logging Error: {e}")
+    if mqtt_ingest:
+        await mqtt_ingest.stop()
+    # บันทึกจุดที่ compression policy ยังถือไว้ แล้ว drain buffer หลังหยุดรับข้อมูลแล้ว
+    try:
+        await sensor_use_case.flush_pending()
+    except Exception as e:
+        logger.error(f"❌ Flush pending sensor points failed: {e}")
+    await sensor_write_buffer.stop()
+    await sensor_rollups.stop()
+    await rule_use_case.stop()
+    await snapshot_scheduler.stop()
+    await sensor_stream.stop()
+    await container.resolve(JobQueue).close()
+    container.reset()
 
 
 def use_route_names_as_operation_ids(app: FastAPI) -> None:
@@ -1,9 +1,39 @@
 from arq.connections import RedisSettings
-from arq import cron
+from arq import cron, func
 from ..core.config import get_settings
-from .tasks import example_task
+from .tasks import (
+    check_water_quality,
+    example_task,
+    hourly_snapshot,
+    reclassify_water_analysis,
+    send_line_alert,
+    shutdown,
+    startup,
+)
+
+settings = get_settings()
+
 
 class WorkerSettings:
-    functions = [example_task] # put job function in this list
-    redis_settings = RedisSettings.from_dsn(get_settings().REDIS_URL)
+    functions = [
+        example_task,
+        func(send_line_alert, max_tries=3, timeout=60),
+        func(reclassify_water_analysis, max_tries=1, timeout=3600),
+    ] # put job function in this list
+    cron_jobs = [
+        # ต้นชั่วโมง + ตอน worker เริ่ม (ย้อนบันทึกชั่วโมงที่พลาดระหว่าง worker หยุด)
+        cron(hourly_snapshot, minute=0, second=5, run_at_startup=True, max_tries=5, timeout=600),
+        cron(
+            check_water_quality,
+            minute=set(range(0, 60, settings.WORKER_ALERT_CHECK_MINUTES)),
+            second=30,
+            max_tries=1,
+            timeout=120,
+        ),
+    ]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(settings.REDIS_URL)
+    # heartbeat ให้ JobQueue (API) ตรวจว่ามี worker รับงานอยู่
+    health_check_interval = settings.WORKER_HEALTH_CHECK_SECONDS
     job_timeout = 7200  # 2 hr
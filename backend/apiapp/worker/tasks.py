@@ -1,6 +1,15 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from arq import Retry
 from apiapp.infrastructure import database
+from apiapp.infrastructure.container import init_container
 import logging
 from ..core.config import get_settings
+from ..core.container import Container
+from ..modules.notification.service import LineBotService
+from ..modules.rules.use_case import RuleUseCase
+from ..modules.sensors.snapshot import HourlySnapshotScheduler
+from ..modules.sensors.use_case import SensorUseCase
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,67 @@ async def init_jobs_context():
     return settings
 
 
+# ---------------------------------------------------------
+# 🔌 Worker lifecycle: เชื่อม DB + container ครั้งเดียวต่อ process (ใช้ร่วมทุก job ผ่าน ctx)
+# ---------------------------------------------------------
+async def startup(ctx):
+    settings = await init_jobs_context()
+    settings.configure_logging()
+    container = init_container(settings)
+    # กฎคุณภาพน้ำจาก DB + reload เมื่อมีการแก้ไขผ่าน API
+    await container.resolve(RuleUseCase).start()
+    ctx["settings"] = settings
+    ctx["container"] = container
+
+
+async def shutdown(ctx):
+    container: Optional[Container] = ctx.get("container")
+    if container:
+        await container.resolve(RuleUseCase).stop()
+        container.reset()
+    await database.close_beanie()
+
+
 async def example_task(ctx):
     # do something
     return {"message": "Hello World"}
+
+
+# ---------------------------------------------------------
+# ⏰ Cron jobs
+# ---------------------------------------------------------
+async def hourly_snapshot(ctx):
+    """Snapshot คุณภาพน้ำต้นชั่วโมง (+ ย้อนบันทึกชั่วโมงที่พลาด) ทำไม่สำเร็จ arq จะลองใหม่"""
+    scheduler = ctx["container"].resolve(HourlySnapshotScheduler)
+    try:
+        done = await scheduler.tick()
+    except Exception as e:
+        logger.error(f"Hourly snapshot failed (try {ctx['job_try']}): {e}")
+        raise Retry(defer=ctx["job_try"] * 60)
+    return {"snapshots": done}
+
+
+async def check_water_quality(ctx):
+    """วิเคราะห์ค่าล่าสุดตามกฎปัจจุบัน แจ้งเตือนวิกฤตผ่าน send_line_alert (ชั่วโมงละครั้ง)"""
+    result = await ctx["container"].resolve(SensorUseCase).analyze_water_quality()
+    return {"status": result["status"], "issues": result["issues"]}
+
+
+# ---------------------------------------------------------
+# 📨 Jobs ที่ API / ingest ส่งเข้ามา
+# ---------------------------------------------------------
+async def send_line_alert(ctx, message: str):
+    await ctx["container"].resolve(LineBotService).send_alert(message)
+    return {"sent": True}
+
+
+async def reclassify_water_analysis(
+    ctx, start: Optional[datetime] = None, end: Optional[datetime] = None, dry_run: bool = False
+):
+    """จัดระดับ Snapshot ย้อนหลังใหม่ตามกฎปัจจุบัน (ค่าเริ่มต้น: 365 วันล่าสุด)"""
+    use_case = ctx["container"].resolve(RuleUseCase)
+    end = end or datetime.now()
+    start = start or end - timedelta(days=365)
+    result = await use_case.reclassify(start, end, dry_run)
+    logger.info(f"Reclassified {result['scanned']} snapshots, {result['changed']} changed")
+    return result
@@ -0,0 +1,66 @@
+"""
+Benchmark CPU ต่อ request ของ POST /sensors/add/*: เส้นทางเดิม vs fast path
+
+- เดิม: FastAPI json.loads -> validate เป็น Beanie Document (body)
+        -> repository สร้าง Document ตัวที่ 2 ก่อน insert()
+- ใหม่: model_validate_json ของ BaseModel ขนาดเล็ก -> dict ตรงสำหรับ insert_many
+
+วัดเฉพาะ CPU ฝั่ง Python (ไม่รวม round-trip ไป MongoDB)
+Beanie ต้อง init กับ MongoDB จริงก่อนสร้าง Document ได้ จึงใช้ DATABASE_URI จาก config
+
+    cd backend && APP_ENV=dev poetry run python benchmarks/bench_ingest.py -n 50000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import motor.motor_asyncio
+from beanie import init_beanie
+
+from apiapp.core.config import get_settings
+from apiapp.modules.sensors.model import SENSOR_MODELS, SensorPH
+from apiapp.modules.sensors.repository import SensorRepository
+from apiapp.modules.sensors.schemas import SensorPHRequest
+
+BODY = json.dumps({"device_id": "esp32_bench", "ph": 7.12, "timestamp": "2026-01-01T12:00:00"}).encode()
+
+
+def legacy_path():
+    data = SensorPH(**json.loads(BODY))
+    return SensorPH(device_id=data.device_id, ph=data.ph, timestamp=data.timestamp)
+
+
+def fast_path(repo: SensorRepository):
+    data = SensorPHRequest.model_validate_json(BODY)
+    return repo.build_record("ph", data.device_id, data.ph, data.timestamp)
+
+
+def measure(fn, n: int) -> float:
+    for _ in range(min(n, 1000)):  # warm up
+        fn()
+    started = time.process_time()
+    for _ in range(n):
+        fn()
+    return (time.process_time() - started) / n
+
+
+async def main(n: int):
+    settings = get_settings()
+    client = motor.motor_asyncio.AsyncIOMotorClient(settings.DATABASE_URI)
+    await init_beanie(database=client.get_default_database(), document_models=list(SENSOR_MODELS.values()))
+
+    repo = SensorRepository()
+    legacy = measure(legacy_path, n)
+    fast = measure(lambda: fast_path(repo), n)
+
+    print(f"requests     : {n}")
+    print(f"legacy path  : {legacy * 1e6:8.2f} µs/request")
+    print(f"fast path    : {fast * 1e6:8.2f} µs/request")
+    print(f"CPU saving   : {(1 - fast / legacy) * 100:8.1f} %  ({legacy / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=20000, help="จำนวน request ที่จำลอง")
+    asyncio.run(main(parser.parse_args().n))
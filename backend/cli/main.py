@@ -7,6 +7,8 @@ import subprocess
 import os
 from .create_module import app as create_module_app
 from .init_admin import app as init_admin_app
+from .migrate_timeseries import app as migrate_app
+from .rules import app as rules_app
 
 app = typer.Typer(
     name="forge", help="FastAPI Beanie Starter CLI Tools", add_completion=False
@@ -21,6 +23,8 @@ app_commands = typer.Typer(
 app.add_typer(app_commands, name="app")
 app.add_typer(create_module_app, name="module")
 app.add_typer(init_admin_app, name="admin")
+app.add_typer(migrate_app, name="migrate")
+app.add_typer(rules_app, name="rules")
 
 
 @app_commands.command()
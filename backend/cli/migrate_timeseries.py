@@ -0,0 +1,143 @@
+"""
+CLI command to migrate sensor collections to MongoDB time-series collections
+"""
+
+import typer
+import asyncio
+from datetime import timedelta
+from pathlib import Path
+import sys
+
+# Add the parent directory to sys.path to import apiapp
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+app = typer.Typer(
+    name="migrate",
+    help="Database migrations",
+    add_completion=False,
+)
+
+
+async def migrate_collection(db, name: str, batch_size: int, drop_legacy: bool, dry_run: bool):
+    """Move one sensor collection into a time-series collection with the same name"""
+    from apiapp.modules.sensors.model import SENSOR_TIMESERIES_CONFIG, SECONDS_TO_EXPIRE, now_thai
+
+    legacy_name = f"{name}_legacy"
+    existing = {
+        info["name"]: info
+        async for info in await db.list_collections(filter={"name": {"$in": [name, legacy_name]}})
+    }
+    target_info = existing.get(name)
+    is_timeseries = bool(target_info and target_info.get("options", {}).get("timeseries"))
+
+    if is_timeseries and legacy_name not in existing:
+        typer.secho(f"✅ {name}: already a time-series collection", fg=typer.colors.GREEN)
+        return
+
+    count = await db[name].estimated_document_count() if target_info and not is_timeseries else 0
+    typer.echo(f"📦 {name}: {count} documents to migrate")
+    if dry_run:
+        return
+
+    # 1. rename collection เดิมเก็บไว้เป็น *_legacy แล้วสร้าง time-series ด้วยชื่อเดิม
+    if target_info and not is_timeseries:
+        await db[name].rename(legacy_name)
+        target_info = None
+    if not target_info:
+        await db.create_collection(
+            name,
+            timeseries={
+                "timeField": SENSOR_TIMESERIES_CONFIG.time_field,
+                "metaField": SENSOR_TIMESERIES_CONFIG.meta_field,
+                "granularity": SENSOR_TIMESERIES_CONFIG.granularity.value,
+            },
+            expireAfterSeconds=SECONDS_TO_EXPIRE,
+        )
+
+    # 2. copy ข้อมูลที่ยังไม่หมดอายุเป็น batch (ข้อมูลเก่ากว่า 7 วันจะถูกลบอยู่แล้ว)
+    query = {"timestamp": {"$gte": now_thai() - timedelta(seconds=SECONDS_TO_EXPIRE)}}
+    # กรณีรันซ้ำหลังล้มกลางทาง: ต่อจาก timestamp ล่าสุดที่ copy แล้ว
+    last = await db[name].find_one({}, sort=[("timestamp", -1)])
+    skip_ids = set()
+    if last:
+        query = {"timestamp": {"$gte": last["timestamp"]}}
+        skip_ids = {doc["_id"] async for doc in db[name].find({"timestamp": last["timestamp"]}, {"_id": 1})}
+
+    copied = 0
+    batch = []
+    cursor = db[legacy_name].find(query, sort=[("timestamp", 1)], batch_size=batch_size)
+    async for doc in cursor:
+        if doc["_id"] in skip_ids:
+            continue
+        doc.pop("revision_id", None)
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await db[name].insert_many(batch, ordered=False)
+            copied += len(batch)
+            batch = []
+            typer.echo(f"   ... {copied} copied")
+    if batch:
+        await db[name].insert_many(batch, ordered=False)
+        copied += len(batch)
+
+    typer.secho(f"✅ {name}: copied {copied} documents", fg=typer.colors.GREEN)
+
+    if drop_legacy:
+        await db[legacy_name].drop()
+        typer.echo(f"🗑️  dropped {legacy_name}")
+
+
+async def migrate_timeseries(database_uri: str, batch_size: int, drop_legacy: bool, dry_run: bool):
+    import motor.motor_asyncio
+    from apiapp.modules.sensors.model import SENSOR_MODELS
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(database_uri)
+    db = client.get_default_database()
+    try:
+        for model in SENSOR_MODELS.values():
+            await migrate_collection(db, model.Settings.name, batch_size, drop_legacy, dry_run)
+    finally:
+        client.close()
+
+
+@app.command()
+def timeseries(
+    database_uri: str = typer.Option(
+        "mongodb://localhost/appdb",
+        "--database-uri",
+        "-d",
+        help="MongoDB connection URI",
+    ),
+    batch_size: int = typer.Option(5000, "--batch-size", "-b", help="Documents per insert_many"),
+    drop_legacy: bool = typer.Option(
+        False, "--drop-legacy", help="Drop the *_legacy collections after copying"
+    ),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only show what would be migrated"),
+    docker: bool = typer.Option(
+        False, "--docker", help="Use docker MongoDB URI (mongodb://mongodb/aquasense)"
+    ),
+):
+    """Convert sensor collections to time-series collections (then set SENSOR_TIMESERIES=true)"""
+
+    if docker:
+        database_uri = "mongodb://mongodb/aquasense"
+
+    typer.secho("🔧 Migrating sensor collections to time-series...", fg=typer.colors.CYAN, bold=True)
+    typer.echo(f"📍 Database URI: {database_uri}")
+
+    if not dry_run and not typer.confirm("❓ Stop the API before migrating. Proceed?"):
+        typer.secho("❌ Operation cancelled", fg=typer.colors.RED)
+        raise typer.Exit(0)
+
+    try:
+        asyncio.run(migrate_timeseries(database_uri, batch_size, drop_legacy, dry_run))
+    except Exception as e:
+        typer.secho(f"❌ Migration failed: {e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+
+    if not dry_run:
+        typer.secho("🎉 Done. Set SENSOR_TIMESERIES=true and restart the API.", fg=typer.colors.GREEN)
+
+
+if __name__ == "__main__":
+    app()
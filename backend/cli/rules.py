@@ -0,0 +1,71 @@
+"""
+CLI commands for water quality rules
+"""
+
+import typer
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+import sys
+
+# Add the parent directory to sys.path to import apiapp
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+app = typer.Typer(
+    name="rules",
+    help="Water quality rules",
+    add_completion=False,
+)
+
+
+async def run_reclassify(database_uri: Optional[str], start: datetime, end: datetime, dry_run: bool) -> dict:
+    from apiapp.core.config import get_settings
+    from apiapp.infrastructure.container import init_container
+    from apiapp.infrastructure.database import close_beanie, init_beanie
+    from apiapp.modules.rules.use_case import RuleUseCase
+
+    settings = get_settings()
+    if database_uri:
+        settings = settings.model_copy(update={"DATABASE_URI": database_uri})
+    await init_beanie(settings)
+    try:
+        use_case = init_container(settings).resolve(RuleUseCase)
+        count = await use_case.load()
+        typer.echo(f"🧪 Loaded {count} rules")
+        return await use_case.reclassify(start, end, dry_run)
+    finally:
+        await close_beanie()
+
+
+@app.command()
+def reclassify(
+    start: Optional[datetime] = typer.Option(None, "--start", "-s", help="Start of range (default: 365 days ago)"),
+    end: Optional[datetime] = typer.Option(None, "--end", "-e", help="End of range (default: now)"),
+    database_uri: Optional[str] = typer.Option(
+        None, "--database-uri", "-d", help="MongoDB connection URI (default: DATABASE_URI from settings)"
+    ),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only count snapshots whose status would change"),
+):
+    """Re-grade stored water analysis snapshots with the current rules"""
+
+    end = end or datetime.now()
+    start = start or end - timedelta(days=365)
+    typer.secho("🔁 Reclassifying water analysis snapshots...", fg=typer.colors.CYAN, bold=True)
+    typer.echo(f"📅 {start} -> {end}")
+
+    try:
+        result = asyncio.run(run_reclassify(database_uri, start, end, dry_run))
+    except Exception as e:
+        typer.secho(f"❌ Reclassify failed: {e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+
+    typer.echo(f"📦 Scanned: {result['scanned']}")
+    typer.echo(f"✏️  Changed: {result['changed']}" + (" (dry run, nothing written)" if dry_run else f", updated: {result['updated']}"))
+    for status, count in result["statuses"].items():
+        typer.echo(f"   {status}: {count}")
+    typer.secho(f"✅ Done in {result['elapsed_seconds']}s", fg=typer.colors.GREEN)
+
+
+if __name__ == "__main__":
+    app()
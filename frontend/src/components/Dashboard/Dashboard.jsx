@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
@@ -23,6 +23,8 @@ const Dashboard = () => {
   const [selectedMonth, setSelectedMonth] = useState(new Date().toISOString().slice(0, 7)); // YYYY-MM
   const [summaryData, setSummaryData] = useState(null);
   const [summaryLoading, setSummaryLoading] = useState(false);
+  const summaryTypeRef = useRef(summaryType); // ใช้ใน interval ของ fetchLatestData (กัน closure ค้างค่าเก่า)
+  const streamConnectedRef = useRef(false); // ✅ live stream (SSE) เชื่อมต่ออยู่หรือไม่
   const [servoLogs, setServoLogs] = useState({ 1: [], 2: [], 3: [] }); // ✅ เก็บประวัติแยกตามอุปกรณ์ (1: อาหาร, 2: pH Down, 3: pH Up)
 
   // --- Helper: Get Auth Header ---
@@ -46,29 +48,32 @@ const Dashboard = () => {
       navigate('/login');
     }
   };
+  // --- Helper: แปลงค่าที่ได้จาก API ให้อยู่ในรูปแบบที่แสดงบนการ์ด ---
+  const formatSensor = (type, value) => {
+    const num = Number(value || 0);
+    return type === 'temperature' ? num : num.toFixed(2);
+  };
+
+  const applyLatest = (latest) => {
+    setSensors(prev => {
+      const next = { ...prev };
+      Object.keys(next).forEach(type => {
+        next[type] = formatSensor(type, latest[type]?.value);
+      });
+      return next;
+    });
+  };
+
   const fetchLatestData = async () => {
     try {
       const headers = getAuthHeader();
-      const [resTemp, resPh, resPhVoltage, resTurb, resNh3, resTds, resAnalysis] = await Promise.all([
-        axios.get(`${API_BASE_URL}/sensors/latest/temperature`, { headers }),
-        axios.get(`${API_BASE_URL}/sensors/latest/ph`, { headers }),
-        axios.get(`${API_BASE_URL}/sensors/latest/ph_voltage`, { headers }),
-        axios.get(`${API_BASE_URL}/sensors/latest/turbidity`, { headers }),
-        axios.get(`${API_BASE_URL}/sensors/latest/nh3`, { headers }),
-        axios.get(`${API_BASE_URL}/sensors/latest/tds`, { headers }),
-        axios.get(`${API_BASE_URL}/sensors/status/analysis`, { headers })
-      ]);
-
-      setSensors({
-        temperature: Number(resTemp.data.temperature || 0),
-        ph: Number(resPh.data.ph || 0).toFixed(2),
-        ph_voltage: Number(resPhVoltage.data.voltage || 0).toFixed(2),
-        turbidity: Number(resTurb.data.NTU || 0).toFixed(2),
-        nh3: Number(resNh3.data.NH3 || 0).toFixed(2),
-        tds: Number(resTds.data.tds || 0).toFixed(2)
-      });
+      // ดึงค่าล่าสุดทุก sensor + ผลวิเคราะห์ + สรุปวันนี้ ใน request เดียว
+      const res = await axios.get(`${API_BASE_URL}/sensors/dashboard`, { headers });
+      const { latest, analysis: analysisData, summary } = res.data;
 
-      setAnalysis(resAnalysis.data);
+      applyLatest(latest);
+      setAnalysis(analysisData);
+      if (summaryTypeRef.current === 'daily') setSummaryData(summary);
       setIsConnected(true);
     } catch (error) {
       console.error("Error fetching latest data:", error);
@@ -81,7 +86,7 @@ const Dashboard = () => {
     try {
       const headers = getAuthHeader();
       const res = await axios.get(`${API_BASE_URL}/sensors/history/${type}?limit=20`, { headers });
-      const formattedData = res.data.map(item => {
+      const formattedData = res.data.items.map(item => {
         const rawValue = item[type === 'turbidity' ? 'NTU' : (type === 'nh3' ? 'NH3' : (type === 'tds' ? 'tds' : (type === 'ph_voltage' ? 'voltage' : type)))];
         return {
           time: new Date(item.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
@@ -148,13 +153,46 @@ const Dashboard = () => {
     fetchLatestData();
     fetchHistory(selectedGraph);
     const interval = setInterval(() => {
-      fetchLatestData();
+      // ถ้า live stream เชื่อมต่ออยู่ ค่าล่าสุดมาจาก stream แล้ว ไม่ต้อง poll
+      if (!streamConnectedRef.current) fetchLatestData();
       fetchHistory(selectedGraph);
     }, 60000);
     return () => clearInterval(interval);
   }, [selectedGraph]);
 
+  // --- Live stream (SSE): ค่าใหม่/สถานะที่เปลี่ยน ถูก push มาจาก server ---
+  useEffect(() => {
+    const source = new EventSource(`${API_BASE_URL}/sensors/stream`);
+    source.onopen = () => {
+      streamConnectedRef.current = true;
+      setIsConnected(true);
+    };
+    source.onerror = () => {
+      // EventSource จะเชื่อมต่อใหม่เอง ระหว่างนี้กลับไปใช้ polling
+      streamConnectedRef.current = false;
+    };
+    source.addEventListener('snapshot', (e) => {
+      const data = JSON.parse(e.data);
+      applyLatest(data.latest);
+      setAnalysis(data.analysis);
+    });
+    source.addEventListener('reading', (e) => {
+      const data = JSON.parse(e.data);
+      setSensors(prev => {
+        const next = { ...prev };
+        data.readings.forEach(r => {
+          if (r.type in next) next[r.type] = formatSensor(r.type, r.value);
+        });
+        return next;
+      });
+    });
+    source.addEventListener('analysis', (e) => setAnalysis(JSON.parse(e.data)));
+    source.addEventListener('resync', () => fetchLatestData());
+    return () => source.close();
+  }, []);
+
   useEffect(() => {
+    summaryTypeRef.current = summaryType;
     fetchSummary();
     [1, 2, 3].forEach(num => fetchServoLogs(num));
   }, [summaryType, selectedMonth]);